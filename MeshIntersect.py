@@ -14,6 +14,38 @@
 
 import adsk.core, adsk.fusion, traceback
 import math
+import collections
+import concurrent.futures
+import os, sys
+
+# Make the slicing package that's delivered with the add-in importable.  It's imported
+# by name so the worker processes used to compute sections can import it too.
+_appPath = os.path.dirname(os.path.realpath(__file__))
+if not _appPath in sys.path:
+    sys.path.insert(0, _appPath)
+
+from meshslicer.geometry import MyMatrix, getWorldToPlaneMatrix
+from meshslicer.adaptive import calculateSectionMeasures, getAdaptiveOffsets
+from meshslicer.decimation import decimateMesh
+from meshslicer import sketching
+from meshslicer.instrumentation import SectionCancelled, SectionProgress, SectionStats, progressPart, timeStage
+from meshslicer.slicing import (buildTriangleAdjacency, calculatePlaneDistances, calculatePlaneDistancesVectorized,
+                                calculatePlaneSegments, calculatePlaneSegmentsVectorized, createStackLoops,
+                                transformPointArray, transformPointArrayVectorized)
+from meshslicer.intervals import buildDistanceIntervalIndex
+from meshslicer.meshio import mergeMeshes, weldNodes
+from meshslicer.exporting import openSectionWriter, writeStackSections
+from meshslicer.diskcache import MeshDiskCache, getCachedArrays, getMatrixName, getMeshKey
+from meshslicer.instancing import InstanceSections, getBoundingBox, isStackMissed
+from meshslicer.tracing import calculateTracedSections
+from meshslicer.parallel import SectionJobPool
+
+# numpy isn't available in every Python environment the add-in runs in, so
+# the vectorized intersection is only used when it can be imported.
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 handlers = []
 
@@ -27,9 +59,45 @@ _planeCountInput = adsk.core.IntegerSpinnerCommandInput.cast(None)
 _distanceInput = adsk.core.DistanceValueCommandInput.cast(None)
 _resultInput = adsk.core.DropDownCommandInput.cast(None)
 _boolLineInput = adsk.core.BoolValueCommandInput.cast(None)
+_toleranceInput = adsk.core.ValueCommandInput.cast(None)
 _boolArcInput = adsk.core.BoolValueCommandInput.cast(None)
+_boolProcessesInput = adsk.core.BoolValueCommandInput.cast(None)
+_boolPreviewInput = adsk.core.BoolValueCommandInput.cast(None)
+_boolMergeInput = adsk.core.BoolValueCommandInput.cast(None)
+_boolExportInput = adsk.core.BoolValueCommandInput.cast(None)
+_boolDiskCacheInput = adsk.core.BoolValueCommandInput.cast(None)
+_timeLimitInput = adsk.core.IntegerSpinnerCommandInput.cast(None)
 _meshState = []
-_pointTol = 0.000001
+
+# The maximum amount of memory, in bytes, used to cache mesh data between intersections.
+_meshCacheMaxBytes = 512 * 1024 * 1024
+
+# The folder the welded meshes, adjacency, and interval indexes of the meshes are
+# saved in, so they're not computed again when the same mesh is sectioned in another
+# session, and the most disk space in bytes they can use.  The data is only saved
+# once the disk cache is turned on in the dialog.
+_diskCacheFolder = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), 'MeshIntersect', 'Cache')
+_diskCacheMaxBytes = 2 * 1024 * 1024 * 1024
+
+# The number of triangles of the decimated copy of a mesh the preview sections are
+# computed with, and the most planes of a stack that are previewed.  A stack with
+# more planes is previewed with every second, third, or so on plane, so the preview
+# keeps up as the inputs are changed.
+_previewTriangleCount = 50000
+_previewMaxPlanes = 50
+
+# The offsets of the planes of the last few adaptive stacks, keyed by the bodies, the
+# plane, the extent, and the count, so the preview doesn't sample the sections again
+# each time it's refreshed, and the most stacks that are kept.
+_adaptiveOffsets = collections.OrderedDict()
+_adaptiveOffsetsMaxCount = 8
+
+# The SectionStats of the last time the command was executed.
+_lastStats = None
+
+# The debug sink the section loops are written to, like a FileDebugSink.  Nothing is
+# written unless this is set while debugging.
+_debugSink = None
 
 
 
@@ -88,6 +156,9 @@ def stop(context):
         meshInterectCommandDef = ui.commandDefinitions.itemById('meshIntersect')
         if meshInterectCommandDef:
             meshInterectCommandDef.deleteMe()
+
+        # Release the cached mesh data.
+        _meshCache.clear()
     except:
         if ui:
             ui.messageBox('Unexpected failure removing command.', 'Intersect Mesh Body')
@@ -130,6 +201,7 @@ class InputChangedHandler(adsk.core.InputChangedEventHandler):
                     _distanceInput.isVisible = True
                     #_resultInput.isVisible = True
                     _boolLineInput.isVisible = True
+                    _boolProcessesInput.isVisible = True
                     _planeCountInput.isVisible = True
                     #_boolArcInput.isVisible = True
                    
@@ -156,6 +228,7 @@ class InputChangedHandler(adsk.core.InputChangedEventHandler):
                     _distanceInput.isVisible = False
                     #_resultInput.isVisible = True
                     _boolLineInput.isVisible = True
+                    _boolProcessesInput.isVisible = True
                     #_boolArcInput.isVisible = True
                 else:
                     # There are no planes selected so don't show the offset plane options.
@@ -164,27 +237,44 @@ class InputChangedHandler(adsk.core.InputChangedEventHandler):
                     _distanceInput.isVisible = False
                     #_resultInput.isVisible = False
                     _boolLineInput.isVisible = False
+                    _boolProcessesInput.isVisible = False
                     #_boolArcInput.isVisible = False
             else:
                 if _meshSelectInput.selectionCount > 0:
                     _boolLineInput.isVisible = True
+                    _boolProcessesInput.isVisible = True
                     #_boolArcInput.isVisible = True
                 else:
                     _boolLineInput.isVisible = False
                     _boolArcInput.isVisible = False
+                    _boolProcessesInput.isVisible = False
                     
             if changedInput.id == 'optimizeArcs' and changedInput.value == True:
                 allInputs.itemById('optimizeLines').value = True
             elif changedInput.id == 'optimizeLines' and changedInput.value == False:
                 allInputs.itemById('optimizeArcs').value = False
+
+            # The tolerance is only used when lines are combined.
+            _toleranceInput.isVisible = _boolLineInput.isVisible and _boolLineInput.value
+            _boolPreviewInput.isVisible = _meshSelectInput.selectionCount > 0
+            _boolMergeInput.isVisible = _meshSelectInput.selectionCount > 1
+            _boolExportInput.isVisible = not _activeSketch and _meshSelectInput.selectionCount > 0 and _planeSelectInput.selectionCount > 0
+            _timeLimitInput.isVisible = _boolProcessesInput.isVisible
+            _boolDiskCacheInput.isVisible = _meshSelectInput.selectionCount > 0
+
+            if changedInput.id == 'cacheOnDisk':
+                setDiskCacheEnabled(changedInput.value)
                 
         except:
             if ui:
                 #ui.messageBox('Unexpected failure.', 'Intersect Mesh Body')
                 ui.messageBox('command executed failed:\n{}'.format(traceback.format_exc()))
-                
-        
-# Event handler for executePreview event.
+
+
+# Event handler for executePreview event.  The sections are computed with a decimated
+# copy of each mesh and drawn as custom graphics, which Fusion removes along with the
+# rest of the preview, so they're quick to update as the inputs change.  The full
+# sections are only computed when the command is executed.
 class ExecutePreviewHandler(adsk.core.CommandEventHandler):
     def __init__(self):
         super().__init__()
@@ -194,6 +284,9 @@ class ExecutePreviewHandler(adsk.core.CommandEventHandler):
             app = adsk.core.Application.get()
             ui  = app.userInterface
 
+            # Each preview plane is a matrix from world coordinates to the plane and the
+            # spacing and count of a stack of planes offset from it.
+            previewPlanes = []
             if not _activeSketch:
                 # Check that there is a single intersection plane.
                 if _planeSelectInput.selectionCount == 1:
@@ -203,7 +296,25 @@ class ExecutePreviewHandler(adsk.core.CommandEventHandler):
                         count = _planeCountInput.value
                             
                         planeEnt = _planeSelectInput.selection(0).entity
-                        if _distanceTypeInput.selectedItem.name == 'Spacing':
+                        if _distanceTypeInput.selectedItem.name == 'Adaptive':
+                            # Place the planes where the sections change the most.
+                            worldToPlane = getWorldToPlaneEntityMatrix(planeEnt)
+                            offsets = [0]
+                            if math.fabs(distance) > 0.000001:
+                                meshBodies = [_meshSelectInput.selection(i).entity for i in range(0, _meshSelectInput.selectionCount)]
+                                offsets = getAdaptiveStackOffsets(meshBodies, worldToPlane, distance, count)
+
+                            app = adsk.core.Application.get()
+                            des = adsk.fusion.Design.cast(app.activeProduct)
+                            constPlanes = des.rootComponent.constructionPlanes
+                            for offset in offsets[1:]:
+                                constPlaneInput = constPlanes.createInput()
+                                constPlaneInput.setByOffset(planeEnt, adsk.core.ValueInput.createByReal(offset))
+                                constPlanes.add(constPlaneInput)
+
+                            for offset in offsets:
+                                previewPlanes.append((getOffsetPlaneMatrix(worldToPlane, offset), 0, 1))
+                        elif _distanceTypeInput.selectedItem.name == 'Spacing':
                             distance = _distanceInput.value
                         elif _distanceTypeInput.selectedItem.name == 'Total Extent':
                             if count == 1:
@@ -211,16 +322,36 @@ class ExecutePreviewHandler(adsk.core.CommandEventHandler):
                             else:
                                 distance = _distanceInput.value / (count-1)
                             
-                        if math.fabs(distance) > 0.000001:
-                            # Create construction planes for the preview.
-                            app = adsk.core.Application.get()
-                            des = adsk.fusion.Design.cast(app.activeProduct)
-                            constPlanes = des.rootComponent.constructionPlanes
-    
-                            for i in range(1, count):
-                                constPlaneInput = constPlanes.createInput()
-                                constPlaneInput.setByOffset(planeEnt, adsk.core.ValueInput.createByReal(distance * i))
-                                constPlane = constPlanes.add(constPlaneInput)                               
+                        if _distanceTypeInput.selectedItem.name != 'Adaptive':
+                            if math.fabs(distance) > 0.000001:
+                                # Create construction planes for the preview.
+                                app = adsk.core.Application.get()
+                                des = adsk.fusion.Design.cast(app.activeProduct)
+                                constPlanes = des.rootComponent.constructionPlanes
+        
+                                for i in range(1, count):
+                                    constPlaneInput = constPlanes.createInput()
+                                    constPlaneInput.setByOffset(planeEnt, adsk.core.ValueInput.createByReal(distance * i))
+                                    constPlane = constPlanes.add(constPlaneInput)                               
+                            else:
+                                count = 1
+
+                            previewPlanes.append((getWorldToPlaneEntityMatrix(planeEnt), distance, count))
+                elif _planeSelectInput.selectionCount > 1:
+                    for i in range(0, _planeSelectInput.selectionCount):
+                        previewPlanes.append((getWorldToPlaneEntityMatrix(_planeSelectInput.selection(i).entity), 0, 1))
+            else:
+                previewPlanes.append((getWorldToSketchMatrix(_activeSketch), 0, 1))
+
+            if _boolPreviewInput.value and _meshSelectInput.selectionCount > 0 and previewPlanes:
+                graphicsGroup = _des.rootComponent.customGraphicsGroups.add()
+                for i in range(0, _meshSelectInput.selectionCount):
+                    meshBody = _meshSelectInput.selection(i).entity
+                    for worldToPlane, spacing, count in previewPlanes:
+                        # Preview an evenly spaced subset of the planes of a large stack.
+                        step = int(math.ceil(count / _previewMaxPlanes))
+                        stackSegments = calculatePreviewSegments(meshBody, worldToPlane, spacing * step, int(math.ceil(count / step)))
+                        drawPreviewSegments(graphicsGroup, stackSegments, worldToPlane)
         except:
             if ui:
                 #ui.messageBox('Unexpected failure.', 'Intersect Mesh Body')
@@ -249,31 +380,68 @@ class MeshIntersectCommandExecutedEventHandler(adsk.core.CommandEventHandler):
             boolInput = adsk.core.BoolValueCommandInput.cast(cmdInputs.itemById('optimizeLines'))                
             optimizeLines = boolInput.value
 
-            boolInput = adsk.core.BoolValueCommandInput.cast(cmdInputs.itemById('optimizeArcs'))                
+            toleranceInput = adsk.core.ValueCommandInput.cast(cmdInputs.itemById('tolerance'))
+            simplifyTolerance = toleranceInput.value
+
+            boolInput = adsk.core.BoolValueCommandInput.cast(cmdInputs.itemById('optimizeArcs'))
             optimizeArcs = boolInput.value
+
+            boolInput = adsk.core.BoolValueCommandInput.cast(cmdInputs.itemById('useProcesses'))
+            useProcesses = boolInput.value
+
+            timeLimitInput = adsk.core.IntegerSpinnerCommandInput.cast(cmdInputs.itemById('timeLimit'))
+            timeLimit = timeLimitInput.value
+
+            # When the bodies are sectioned together, each job has the list of all of the
+            # bodies instead of a single body, and their sections are computed in one pass.
+            boolInput = adsk.core.BoolValueCommandInput.cast(cmdInputs.itemById('mergeBodies'))
+            jobBodies = meshBodies
+            if boolInput.value and len(meshBodies) > 1:
+                jobBodies = [meshBodies]
+
+            # Get the file to export the sections to, if they're exported instead of drawn.
+            exportFile = None
+            boolInput = adsk.core.BoolValueCommandInput.cast(cmdInputs.itemById('exportSections'))
+            if boolInput.value and not _activeSketch:
+                fileDialog = ui.createFileDialog()
+                fileDialog.title = 'Export Sections'
+                fileDialog.filter = 'DXF files (*.dxf);;SVG files (*.svg);;CSV files (*.csv)'
+                if fileDialog.showSave() != adsk.core.DialogResults.DialogOK:
+                    return
+                exportFile = fileDialog.filename
             
             progDialog = ui.createProgressDialog()
-            progDialog.isCancelButtonShown = False
+            progDialog.isCancelButtonShown = True
             progDialog.show('Intersection Progress', 'Calculating intersections', 0, 100)
             progDialog.progressValue = 0
+            progress = createSectionProgress(progDialog, timeLimit)
+
+            # Exported sections are written to the file as they're computed, without creating
+            # any construction planes or sketches.
+            if exportFile:
+                exportSections(exportFile, jobBodies, getExportPlanes(meshBodies), optimizeLines, optimizeArcs, simplifyTolerance,
+                               progress)
+                progDialog.hide()
+                if progress.isOverBudget:
+                    ui.messageBox('The time limit was reached, so only the sections that were finished were exported.', 'Intersect Mesh Body')
+                return
+
+            # Each job is a mesh body, or a list of mesh bodies that are sectioned together, and
+            # a list of sketches.  The x-y plane of the first sketch is the intersection plane
+            # and any other sketches are a stack of offset planes.
+            sectionJobs = []
+            firstItem = None
+            lastItem = None
+            isEvenlySpaced = True
 
             # Create the sections through the active sketch's x-y plane.
             if _activeSketch:
                 # Process each selected mesh body.
-                sectionCount = 1
-                for meshBody in meshBodies:
-                    if not progDialog.wasCancelled:
-                        loops = calculateIntersection(meshBody, _activeSketch, True, optimizeLines, optimizeArcs)
-                        if loops != None:
-                            drawLoops(_activeSketch, loops)
-                            
-                        progDialog.progressValue = int((sectionCount / len(meshBodies)) * 100)
-                        sectionCount += 1
+                for meshBody in jobBodies:
+                    sectionJobs.append((meshBody, [_activeSketch]))
             else:
                 # Check that there is a single intersection plane.
                 intPlanes = []
-                firstItem = None
-                lastItem = None
                 if _planeSelectInput.selectionCount == 1:
                     # Construct all of the needed construction planes.
                     distance = _distanceInput.value    
@@ -281,7 +449,24 @@ class MeshIntersectCommandExecutedEventHandler(adsk.core.CommandEventHandler):
                         
                     planeEnt = _planeSelectInput.selection(0).entity
                     intPlanes.append(planeEnt)
-                    if _distanceTypeInput.selectedItem.name == 'Spacing':
+                    if _distanceTypeInput.selectedItem.name == 'Adaptive':
+                        # The distance is the total extent and the count is the most planes
+                        # that are placed where the sections change the most.
+                        isEvenlySpaced = False
+                        offsets = [0]
+                        if math.fabs(distance) > 0.000001:
+                            offsets = getAdaptiveStackOffsets(meshBodies, getWorldToPlaneEntityMatrix(planeEnt), distance, count)
+
+                        constPlanes = des.rootComponent.constructionPlanes
+                        for offset in offsets[1:]:
+                            constPlaneInput = constPlanes.createInput()
+                            constPlaneInput.setByOffset(planeEnt, adsk.core.ValueInput.createByReal(offset))
+                            constPlane = constPlanes.add(constPlaneInput)
+                            intPlanes.append(constPlane)
+                            if not firstItem:
+                                firstItem = constPlane.timelineObject
+                        distance = 0
+                    elif _distanceTypeInput.selectedItem.name == 'Spacing':
                         distance = _distanceInput.value
                     elif _distanceTypeInput.selectedItem.name == 'Total Extent':
                         if count == 1:
@@ -305,35 +490,61 @@ class MeshIntersectCommandExecutedEventHandler(adsk.core.CommandEventHandler):
                         intPlanes.append(_planeSelectInput.selection(i).entity)
 
                 root = des.rootComponent
-                sectionCount = 1
-                totalCuts = len(intPlanes) * len(meshBodies)
-                cutCount = 0
-                for intPlane in intPlanes:
-                    if _resultInput.selectedItem.name == 'Each section in new sketch':
+                if _resultInput.selectedItem.name == 'Each section in new sketch':
+                    sketches = []
+                    for intPlane in intPlanes:
                         newSketch = root.sketches.add(intPlane)
                         if not firstItem:
                             firstItem = newSketch.timelineObject
                             
                         lastItem = newSketch.timelineObject
+                        sketches.append(newSketch)
+
+                    if len(sketches) > 1 and _planeSelectInput.selectionCount == 1 and isEvenlySpaced:
+                        # The planes are a stack of offset planes so all of the sections of each body
+                        # are computed in a single pass.  When using multiple processes the stack is
+                        # split up so the processes can work on the same body.
+                        stackSize = len(sketches)
+                        if useProcesses:
+                            stackSize = int(math.ceil(len(sketches) / (os.cpu_count() or 1)))
+
+                        for meshBody in jobBodies:
+                            for i in range(0, len(sketches), stackSize):
+                                sectionJobs.append((meshBody, sketches[i:i + stackSize]))
+                    else:
+                        for newSketch in sketches:
+                            for meshBody in jobBodies:
+                                sectionJobs.append((meshBody, [newSketch]))
+
+            # Compute and draw the sections.
+            pool = None
+            if useProcesses and len(sectionJobs) > 1:
+                try:
+                    pool = SectionJobPool()
+                except:
+                    # Fall back to computing the sections in this process.
+                    pool = None
+
+            stats = SectionStats()
+            if pool:
+                with pool:
+                    runSectionJobsInPool(pool, sectionJobs, optimizeLines, optimizeArcs, simplifyTolerance, progress, stats)
+            else:
+                runSectionJobs(sectionJobs, optimizeLines, optimizeArcs, simplifyTolerance, progress, stats)
 
-                        bodyCount = 1
-                        for meshBody in meshBodies:
-                            if not progDialog.wasCancelled:
-                                loops = calculateIntersection(meshBody, newSketch, True, optimizeLines, optimizeArcs)
-                                if loops != None:
-                                    drawLoops(newSketch, loops)
-                             
-                                cutCount += 1
-                                progDialog.progressValue = int((cutCount / totalCuts) * 100)
-                                bodyCount += 1 
-                        sectionCount += 1
+            global _lastStats
+            _lastStats = stats
 
+            if not _activeSketch:
                 if firstItem and lastItem:
                     if firstItem != lastItem:
                         tlGroup = des.timeline.timelineGroups.add(firstItem.index, lastItem.index)
                         tlGroup.name = 'Mesh Intersection Result'
                         
             progDialog.hide()
+
+            if progress.isOverBudget:
+                ui.messageBox('The time limit was reached, so only the sections that were finished were created.', 'Intersect Mesh Body')
         except:
             if ui:
                 if progDialog:
@@ -354,7 +565,7 @@ class CommandActivatedHandler(adsk.core.CommandEventHandler):
                 _meshState.append([mesh, mesh.isSelectable])
                 if mesh.isSelectable == False:
                     mesh.isSelectable = True
-        
+
 
 class MeshIntersectCommandCreatedEventHandler(adsk.core.CommandCreatedEventHandler):
     def __init__(self):
@@ -425,6 +636,7 @@ class MeshIntersectCommandCreatedEventHandler(adsk.core.CommandCreatedEventHandl
             _distanceTypeInput = inputs.addDropDownCommandInput('distanceType', 'Distance Type', adsk.core.DropDownStyles.LabeledIconDropDownStyle)
             _distanceTypeInput.listItems.add('Total Extent', True, 'Resources/extent')
             _distanceTypeInput.listItems.add('Spacing', False, 'Resources/spacing')
+            _distanceTypeInput.listItems.add('Adaptive', False, '')
             _distanceTypeInput.isVisible = False
 
             # Create the input to get the number of offset planes.  This number includes the original selected plane
@@ -449,887 +661,784 @@ class MeshIntersectCommandCreatedEventHandler(adsk.core.CommandCreatedEventHandl
             global _boolLineInput
             _boolLineInput = inputs.addBoolValueInput('optimizeLines', 'Combine colinear lines', True, '', True) 
             _boolLineInput.isVisible = False
+
+            # Create the input for the tolerance used when combining lines.  The lines of a
+            # section are replaced by fewer lines that are within the tolerance of them, which
+            # greatly simplifies the sections of scanned meshes.  When it's 0 only colinear
+            # lines are combined.
+            global _toleranceInput
+            _toleranceInput = inputs.addValueInput('tolerance', 'Tolerance', _des.unitsManager.defaultLengthUnits,
+                                                   adsk.core.ValueInput.createByReal(0))
+            _toleranceInput.isVisible = False
             
             # Create the check box input to determine if an arc should replace multiple lines that fit through a common arc.
             global _boolArcInput
             _boolArcInput = inputs.addBoolValueInput('optimizeArcs', 'Fit Arcs', True, '', False)            
             _boolArcInput.isVisible = False
 
+            # Create the check box input to determine if the sections are previewed.
+            global _boolPreviewInput
+            _boolPreviewInput = inputs.addBoolValueInput('previewSections', 'Preview sections', True, '', True)
+            _boolPreviewInput.isVisible = False
+
+            # Create the check box input to determine if the sections of all of the selected
+            # bodies are computed together in one pass and drawn at once in each sketch.
+            global _boolMergeInput
+            _boolMergeInput = inputs.addBoolValueInput('mergeBodies', 'Section bodies together', True, '', True)
+            _boolMergeInput.isVisible = False
+
+            # Create the check box input to determine if the sections are written to a DXF, SVG, or CSV
+            # file instead of being drawn in sketches.
+            global _boolExportInput
+            _boolExportInput = inputs.addBoolValueInput('exportSections', 'Export sections to file', True, '', False)
+            _boolExportInput.isVisible = False
+
+            # Create the check box input to determine if the sections are computed using multiple processes.
+            global _boolProcessesInput
+            _boolProcessesInput = inputs.addBoolValueInput('useProcesses', 'Use multiple processes', True, '', False)
+            _boolProcessesInput.isVisible = False
+
+            # Create the input for the time limit, in seconds, after which the sections that are
+            # finished are created and the rest are skipped.  A value of 0 means there's no limit.
+            global _timeLimitInput
+            _timeLimitInput = inputs.addIntegerSpinnerCommandInput('timeLimit', 'Time limit (s)', 0, 86400, 10, 0)
+            _timeLimitInput.isVisible = False
+
+            # Create the check box input to determine if the data computed from the meshes is
+            # saved in the disk cache folder so it's not computed again in another session.
+            # It's off until it's turned on, and then stays on for the session.
+            global _boolDiskCacheInput
+            _boolDiskCacheInput = inputs.addBoolValueInput('cacheOnDisk', 'Cache meshes on disk', True, '',
+                                                           _meshCache.diskCache is not None)
+            _boolDiskCacheInput.isVisible = False
+
 #            msg = '<div align="center">By default, mesh bodies are not selectable in the graphics window. However, they are selectable in the browser.</div>'
 #            txtBox = inputs.addTextBoxCommandInput('message', '', msg, 5, True)
 #            txtBox.isFullWidth = True            
         except:
             if ui:
                 #ui.messageBox('Unexpected failure.', 'Intersect Mesh Body')
-                ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))   
-
+                ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+
+
+# Returns a SectionProgress that updates the progress dialog and lets Fusion process
+# its events, so the dialog can be cancelled while the sections are computed.  A time
+# limit of 0 means there's no time budget.
+def createSectionProgress(progDialog, timeLimit):
+    def updateProgress(fraction):
+        progDialog.progressValue = int(fraction * 100)
+        adsk.doEvents()
+        return progDialog.wasCancelled
+
+    timeBudget = None
+    if timeLimit > 0:
+        timeBudget = timeLimit
+    return SectionProgress(updateProgress, timeBudget)
+
+
+# Computes the sections for each job and draws them, updating the progress as the
+# work is done.  If the progress is cancelled or runs out of time, the sections that
+# were finished are drawn and the rest of the jobs are skipped.  The work done is
+# added to the stats.  The sections of a job whose body is another instance of the
+# mesh of an earlier job, with the planes at the same place on the mesh, are moved
+# from the sections of that job instead of being computed again.
+def runSectionJobs(sectionJobs, optimizeLines, optimizeArcs, simplifyTolerance, progress, stats = None):
+    instances = InstanceSections()
+    for jobIndex in range(0, len(sectionJobs)):
+        meshBody, sketches = sectionJobs[jobIndex]
+        instanceKey, instanceMatrix = getJobInstance(instances, meshBody, sketches)
+        try:
+            with progress.part(jobIndex / len(sectionJobs), (jobIndex + 1) / len(sectionJobs)):
+                progress.checkpoint(0, 1)
+                stackLoops = instances.get(instanceKey, instanceMatrix)
+                if stackLoops is None:
+                    if len(sketches) == 1:
+                        stackLoops = [calculateIntersection(meshBody, sketches[0], True, optimizeLines, optimizeArcs, stats = stats,
+                                                            debugSink = _debugSink, simplifyTolerance = simplifyTolerance,
+                                                            progress = progress)]
+                    else:
+                        stackLoops = calculateStackIntersection(meshBody, sketches[0], getStackSpacing(sketches), len(sketches), True,
+                                                                optimizeLines, optimizeArcs, stats = stats, debugSink = _debugSink,
+                                                                simplifyTolerance = simplifyTolerance, progress = progress)
+                    instances.add(instanceKey, instanceMatrix, stackLoops)
+        except SectionCancelled as err:
+            if err.stackLoops:
+                drawStackLoops(sketches, err.stackLoops, stats)
+            break
 
-def dumpLoops(loops):
-    f = open('C:/Temp/LoopDump.txt','w')
+        drawStackLoops(sketches, stackLoops, stats)
+
+
+# Computes the sections for each job in a pool of processes and draws them as they're
+# finished.  The data of each mesh is published to the pool once and shared by all of
+# the jobs that use it.  The progress is checked while waiting for each job, and if
+# it's cancelled or runs out of time the pool is cancelled, so the processes stop,
+# and only the jobs that are already done are drawn, along with the planes that the
+# jobs that were stopped finished.  The work done by the processes is added to the
+# stats.  Only the first job of each instance of a mesh, the same as for
+# runSectionJobs, is submitted, and the jobs whose planes don't reach the bounding
+# box of the mesh aren't submitted at all.
+def runSectionJobsInPool(pool, sectionJobs, optimizeLines, optimizeArcs, simplifyTolerance, progress, stats = None):
+    instances = InstanceSections()
+    jobInstances = []
+    submittedKeys = set()
+    futures = []
+    isCancelled = False
+    for meshBody, sketches in sectionJobs:
+        # Reading the meshes and sorting their triangles can take a while, so the
+        # progress is checked before each job is submitted too.
+        try:
+            progress.checkpoint(0, len(sectionJobs))
+        except SectionCancelled:
+            pool.cancel()
+            isCancelled = True
+            break
 
-    loopCnt = 0
-    for loop in loops:
-        loopCnt += 1
-        f.write('Loop ' + str(loopCnt) + ', isClosed: ' + str(loop.isClosed) + '\n')
-        
-        pointCnt = 0
-        for point in loop.points:
-            if point.pointType == PointType.lineStart:
-                pntType = 'lineStart'
-            elif point.pointType == PointType.lineEnd:
-                pntType = 'lineEnd'
-            elif point.pointType == PointType.lineStartAndEnd:
-                pntType = 'lineStartAndEnd'
-            elif point.pointType == PointType.arcMid:
-                pntType = 'arcMid'
-            elif point.pointType == PointType.unknown:
-                pntType = 'unknown'
-                
-            f.write('    ' + str(pointCnt) + '. ' + pntType + ', ' + str(point.x) + ', ' + str(point.y) + ', ' + str(point.z) + '\n' )
-            pointCnt += 1
+        cacheEntry = _meshCache.getEntry(meshBody)
+        instanceKey, instanceMatrix = getJobInstance(instances, meshBody, sketches)
+        jobInstances.append((instanceKey, instanceMatrix))
+
+        spacing = getStackSpacing(sketches)
+        if instanceKey in submittedKeys or isStackMissed(cacheEntry.getBoundingBox(), instanceMatrix, spacing, len(sketches)):
+            futures.append(None)
+            continue
+
+        # The workers trace the loops with the adjacency and the order of the distance
+        # index from the cache, the same as runSectionJobs.
+        sharedMesh = pool.publishMesh(cacheEntry, cacheEntry.nodeCoords, cacheEntry.nodeIndices, cacheEntry.getAdjacency(),
+                                      cacheEntry.triangleBodies)
+        distanceOrder = None
+        if len(sketches) > 1:
+            distanceOrder = pool.publishArray((cacheEntry, tuple(instanceMatrix._data)),
+                                              cacheEntry.getDistanceIndex(instanceMatrix).order, 'q')
+        futures.append(pool.submit(sharedMesh, instanceMatrix, spacing, len(sketches), True, optimizeLines, optimizeArcs,
+                                   simplifyTolerance, distanceOrder))
+        submittedKeys.add(instanceKey)
+    if isCancelled:
+        concurrent.futures.wait([pending for pending in futures if pending], timeout = 2 * progress.interval)
+
+    # Draw the results in the same order as the jobs.  Once the pool is cancelled, the
+    # jobs that are running get a moment to stop and return the planes they finished.
+    for jobIndex in range(0, len(futures)):
+        sketches = sectionJobs[jobIndex][1]
+        instanceKey, instanceMatrix = jobInstances[jobIndex]
+        future = futures[jobIndex]
+        if future is None:
+            stackLoops = instances.get(instanceKey, instanceMatrix) or [None] * len(sketches)
+        else:
+            if not isCancelled:
+                try:
+                    while not future.done():
+                        concurrent.futures.wait([future], timeout = progress.interval)
+                        progress.checkpoint(jobIndex, len(sectionJobs))
+                except SectionCancelled:
+                    pool.cancel()
+                    isCancelled = True
+                    concurrent.futures.wait([pending for pending in futures[jobIndex:] if pending], timeout = 2 * progress.interval)
+            if not future.done() or future.cancelled():
+                continue
+
+            try:
+                stackLoops, jobStats = future.result()
+            except SectionCancelled as err:
+                if err.stackLoops:
+                    drawStackLoops(sketches, err.stackLoops, stats)
+                continue
+            if stats is not None:
+                stats.add(jobStats)
+            instances.add(instanceKey, instanceMatrix, stackLoops)
+        drawStackLoops(sketches, stackLoops, stats)
+
+
+# Returns a list with a tuple of the matrix from world coordinates to the first plane,
+# the offset of the first plane from the x-y plane of the matrix, the spacing, and the
+# number of planes for each stack of planes of the inputs that are exported, the same
+# planes that sketches are otherwise created on.
+def getExportPlanes(meshBodies):
+    if _planeSelectInput.selectionCount != 1:
+        return [(getWorldToPlaneEntityMatrix(_planeSelectInput.selection(i).entity), 0, 0, 1)
+                for i in range(0, _planeSelectInput.selectionCount)]
+
+    worldToPlane = getWorldToPlaneEntityMatrix(_planeSelectInput.selection(0).entity)
+    distance = _distanceInput.value
+    count = _planeCountInput.value
+    if math.fabs(distance) <= 0.000001 or count == 1:
+        return [(worldToPlane, 0, 0, 1)]
+    elif _distanceTypeInput.selectedItem.name == 'Adaptive':
+        offsets = getAdaptiveStackOffsets(meshBodies, worldToPlane, distance, count)
+        return [(worldToPlane, offset, 0, 1) for offset in offsets]
+    elif _distanceTypeInput.selectedItem.name == 'Spacing':
+        return [(worldToPlane, 0, distance, count)]
+    else:
+        return [(worldToPlane, 0, distance / (count - 1), count)]
+
+
+# Computes the sections of the stacks of planes from getExportPlanes with each job
+# body, a mesh body or a list of mesh bodies that are sectioned together, and writes
+# them to the file, with the format of its extension, as each batch of planes is
+# finished.  The sections of all of the bodies with a plane are written together.  If
+# the progress is cancelled or runs out of time, the sections that were finished are
+# kept in the file.
+def exportSections(exportFile, jobBodies, exportPlanes, optimizeLines, optimizeArcs, simplifyTolerance, progress):
+    stats = SectionStats()
+
+    def calculateStack(worldToPlane, spacing, count):
+        stackLoops = [None] * count
+        for meshBody in jobBodies:
+            try:
+                bodyLoops = calculatePlaneStackIntersection(meshBody, worldToPlane, spacing, count, True, optimizeLines, optimizeArcs,
+                                                            stats = stats, debugSink = _debugSink,
+                                                            simplifyTolerance = simplifyTolerance, progress = progress)
+            except SectionCancelled as err:
+                # The planes the body finished don't have the sections of the other bodies.
+                if len(jobBodies) > 1:
+                    err.stackLoops = None
+                raise
+
+            for i in range(0, count):
+                if bodyLoops[i] is not None:
+                    stackLoops[i] = (stackLoops[i] or []) + bodyLoops[i]
+        return stackLoops
+
+    with openSectionWriter(exportFile) as writer:
+        try:
+            for i in range(0, len(exportPlanes)):
+                worldToPlane, offset, spacing, count = exportPlanes[i]
+                with progress.part(i / len(exportPlanes), (i + 1) / len(exportPlanes)):
+                    writeStackSections(writer, calculateStack, worldToPlane, offset, spacing, count, writer.sectionCount,
+                                       progress = progress)
+        except SectionCancelled:
+            pass
+
+    global _lastStats
+    _lastStats = stats
+
+
+# Returns the spacing of the planes of a section job's sketches, which is 0 for a
+# single sketch.
+def getStackSpacing(sketches):
+    if len(sketches) == 1:
+        return 0
+    return getSketchToSketchMatrix(sketches[1], sketches[0]).getCell(4, 3)
+
+
+# Returns a tuple with the key of the sections of a section job for the
+# InstanceSections and the matrix that transforms the data of its mesh in the cache
+# into the coordinate system of its first sketch.
+def getJobInstance(instances, meshBody, sketches):
+    matrix = getBodyMatrix(meshBody, getWorldToSketchMatrix(sketches[0]))
+    return instances.getKey(_meshCache.getEntry(meshBody), matrix, getStackSpacing(sketches), len(sketches)), matrix
+
+
+# Draws the loops for a stack of planes, where the loops for every plane are in the
+# coordinate system of the first sketch.
+def drawStackLoops(sketches, stackLoops, stats = None):
+    with timeStage(stats, 'drawLoops'):
+        for i in range(0, len(sketches)):
+            if stackLoops[i] != None:
+                if i > 0:
+                    sketchMatrix = getSketchToSketchMatrix(sketches[0], sketches[i])
+                    for loop in stackLoops[i]:
+                        loop.transformBy(sketchMatrix)
+                drawLoops(sketches[i], stackLoops[i])
 
-    f.close()
 
 def drawLoops(sketch, loops):
-    sketch.isComputeDeferred = True
-    lines = sketch.sketchCurves.sketchLines
-    arcs = adsk.fusion.SketchArcs.cast(sketch.sketchCurves.sketchArcs)
-    for loop in loops:
-        lastPoint = None
-        firstPoint = None
-        arcStartPoint = None
-        arcMidPoint = None
-        isArc = False
-        if loop.isConnected:
-            isFirstPoint = True
-            for point in loop.points:
-                if isFirstPoint == True:
-                    lastPoint = adsk.core.Point3D.create(point.x, point.y, point.z)
-                    isFirstPoint = False
-                else:
-                    # Check to see if the next item in the list is a Point3D or not.
-                    # If it is then a line is defined.  If it's not, then an arc is defined.
-                    if point.pointType != PointType.arcMid and not isArc:                           
-                        newLine = lines.addByTwoPoints(lastPoint, adsk.core.Point3D.create(point.x, point.y, point.z))
-                        lastPoint = newLine.endSketchPoint
-                        
-                        if not firstPoint:
-                            # Save this point to be able to connect the end together.
-                            firstPoint = newLine.startSketchPoint
-                    elif point.pointType == PointType.arcMid or isArc:
-                        if not arcStartPoint and not arcMidPoint:
-                            arcStartPoint = lastPoint
-                            arcMidPoint = point
-                            isArc = True
-                        elif arcStartPoint and arcMidPoint:
-                            newArc = arcs.addByThreePoints(arcStartPoint, asFusionPoint(arcMidPoint), asFusionPoint(point))
-                            
-                            if asFusionPoint(point).isEqualTo(newArc.endSketchPoint.geometry):                                
-                                lastPoint = newArc.endSketchPoint
-                                
-                                if not firstPoint:
-                                    firstPoint = newArc.startSketchPoint
-                            else:
-                                lastPoint = newArc.startSketchPoint
-                                
-                                if not firstPoint:
-                                    firstPoint = newArc.endSketchPoint
-                                    
-                            arcStartPoint = None
-                            arcMidPoint = None
-                            isArc = False
-            if loop.isClosed:
-                if arcMidPoint:
-                    newArc = arcs.addByThreePoints(lastPoint, asFusionPoint(arcMidPoint), firstPoint)
-                else:
-                    newLine = lines.addByTwoPoints(lastPoint, firstPoint)
+    sketching.drawLoops(sketch, loops, adsk.core.Point3D.create)
+
+
+# Returns the offsets from the plane of at most maxCount planes, within the extent,
+# placed where the sections of the mesh bodies change the most.  The sections are
+# sampled with the decimated copies of the meshes that are used for the preview, and
+# the measures of the sections of all of the bodies are added together.  The offsets
+# are kept for the bodies, the plane, the extent, and the count, so they're only
+# computed again when one of them changes.
+def getAdaptiveStackOffsets(meshBodies, worldToPlane, extent, maxCount):
+    bodyEntries = []
+    for meshBody in meshBodies:
+        cacheEntry = _meshCache.getEntry(meshBody).getPreviewEntry(_previewTriangleCount)
+        bodyEntries.append((cacheEntry, getBodyMatrix(meshBody, worldToPlane)))
+    _meshCache.trim()
+
+    key = (tuple((cacheEntry, tuple(matrix._data)) for cacheEntry, matrix in bodyEntries), extent, maxCount)
+    offsets = _adaptiveOffsets.get(key)
+    if offsets is not None:
+        _adaptiveOffsets.move_to_end(key)
+        return list(offsets)
+
+    sampleCount = max(4 * maxCount, 100)
+    spacing = extent / (sampleCount - 1)
+    measures = [(0, 0, 0)] * sampleCount
+    for cacheEntry, matrix in bodyEntries:
+        bodyMeasures = calculateSectionMeasures(cacheEntry.nodeCoords, cacheEntry.nodeIndices, matrix, spacing, sampleCount)
+        measures = [tuple(a + b for a, b in zip(measures[i], bodyMeasures[i])) for i in range(0, sampleCount)]
+
+    offsets = getAdaptiveOffsets(measures, spacing, maxCount)
+    _adaptiveOffsets[key] = offsets
+    if len(_adaptiveOffsets) > _adaptiveOffsetsMaxCount:
+        _adaptiveOffsets.popitem(last = False)
+    return list(offsets)
+
+
+# Returns a list with an array of segments for each plane of a stack where the planes
+# cross a decimated copy of the mesh, to preview the sections.  The segments are in
+# the coordinate system of the first plane, like calculateStackIntersection.
+def calculatePreviewSegments(mesh, worldToPlane, spacing, count):
+    cacheEntry = _meshCache.getEntry(mesh).getPreviewEntry(_previewTriangleCount)
+    worldToPlane = getBodyMatrix(mesh, worldToPlane)
+    distances = cacheEntry.getPlaneDistances(worldToPlane)
+    distanceIndex = None
+    if count > 1:
+        distanceIndex = cacheEntry.getDistanceIndex(worldToPlane)
+    _meshCache.trim()
+
+    if numpy:
+        return calculatePlaneSegmentsVectorized(cacheEntry.nodeCoords, cacheEntry.nodeIndices, worldToPlane, spacing, count,
+                                                distances, distanceIndex)
+    else:
+        return calculatePlaneSegments(cacheEntry.nodeCoords, cacheEntry.nodeIndices, worldToPlane, spacing, count,
+                                      distances, distanceIndex)
+
+
+# Draws the segments of a stack of planes, which are in the coordinate system of the
+# first plane, as custom graphics lines in the group.
+def drawPreviewSegments(graphicsGroup, stackSegments, worldToPlane):
+    coords = []
+    for segments in stackSegments:
+        coords.extend(segments)
+    if not coords:
+        return
+
+    planeToWorld = worldToPlane.copy()
+    planeToWorld.invert()
+    if numpy:
+        worldCoords = transformPointArrayVectorized(numpy.array(coords).reshape(-1, 3), planeToWorld).reshape(-1).tolist()
+    else:
+        worldCoords = transformPointArray(coords, planeToWorld)
+
+    # The coordinates are in pairs, one for each line, so no indices are needed.
+    graphicsGroup.addLines(adsk.fusion.CustomGraphicsCoordinates.create(worldCoords), [], False)
+
+
+# Cache of the data read from mesh bodies that's needed to compute intersections, so
+# repeated intersections with the same mesh don't need to read and process the mesh
+# again.  The entries are keyed by the identity and revision of the mesh body and the
+# least recently used entries are removed when the size goes over the maximum.  When
+# a MeshDiskCache is given the data that's slow to compute is also saved to it.  The
+# entry of a body in an occurrence has the data of the body in its component, so the
+# data is shared by all of the occurrences of the component.
+class MeshCache:
+    def __init__(self, maxBytes, diskCache = None):
+        self.maxBytes = maxBytes
+        self.diskCache = diskCache
+        self._entries = collections.OrderedDict()
+
+    # Returns the MeshCacheEntry for the mesh body, creating it if needed.  For a list of
+    # mesh bodies, it's the entry for their welded meshes combined by mergeMeshes, so
+    # they can be sectioned in one pass.
+    def getEntry(self, mesh):
+        if isinstance(mesh, list):
+            if len(mesh) == 1:
+                return self.getEntry(mesh[0])
+
+            # The combined mesh is in world coordinates, so it changes when an occurrence
+            # is moved.
+            bodyMatrices = [getBodyToWorldMatrix(body) for body in mesh]
+            key = tuple((body.entityToken, _getMeshRevision(_getNativeBody(body)), None if matrix is None else tuple(matrix._data))
+                        for body, matrix in zip(mesh, bodyMatrices))
+        else:
+            mesh = _getNativeBody(mesh)
+            key = (mesh.entityToken, _getMeshRevision(mesh))
+
+        entry = self._entries.get(key)
+        if entry:
+            self._entries.move_to_end(key)
+        elif isinstance(mesh, list):
+            bodyMeshes = []
+            for body, matrix in zip(mesh, bodyMatrices):
+                bodyEntry = self.getEntry(body)
+                nodeCoords = bodyEntry.nodeCoords
+                if matrix is not None:
+                    if numpy:
+                        nodeCoords = transformPointArrayVectorized(nodeCoords.reshape(-1, 3), matrix).reshape(-1)
+                    else:
+                        nodeCoords = transformPointArray(nodeCoords, matrix)
+                bodyMeshes.append((nodeCoords, bodyEntry.nodeIndices))
+            nodeCoords, nodeIndices, triangleBodies = mergeMeshes(bodyMeshes)
+            entry = MeshCacheEntry(nodeCoords, nodeIndices, self.diskCache, False)
+            entry.triangleBodies = triangleBodies
+            self._entries[key] = entry
+            self.trim()
+        else:
+            triangleMesh = mesh.displayMesh
+            entry = MeshCacheEntry(triangleMesh.nodeCoordinatesAsDouble, triangleMesh.nodeIndices, self.diskCache)
+            self._entries[key] = entry
+            self.trim()
+
+        return entry
+
+    # Returns the approximate number of bytes used by the cached data.
+    def byteSize(self):
+        size = 0
+        for entry in self._entries.values():
+            size += entry.byteSize()
+        return size
+
+    # Removes the least recently used entries until the cache is within its maximum
+    # size.  The most recently used entry is always kept.
+    def trim(self):
+        size = self.byteSize()
+        while size > self.maxBytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last = False)
+            size -= entry.byteSize()
+
+    # Sets the MeshDiskCache the data of the meshes is loaded from and saved to, or None
+    # so it's only kept in memory.  The entries are cleared when it's changed, so none
+    # of them keep using the disk cache that was replaced.
+    def setDiskCache(self, diskCache):
+        if getattr(diskCache, 'folder', None) != getattr(self.diskCache, 'folder', None):
+            self.diskCache = diskCache
+            self.clear()
+
+    def clear(self):
+        self._entries.clear()
+
+
+# The cached data for a single mesh.  The coordinates and indices are flat arrays
+# in the same layout as nodeCoordinatesAsDouble and nodeIndices, with the nodes at
+# the same location welded so the triangles share their edges.  Data derived from
+# them is computed the first time it's requested.  When there's a MeshDiskCache, the
+# welded mesh, the adjacency, and the order of the interval indexes are loaded from
+# it, keyed by the contents of the mesh, and saved to it when they're computed.  The
+# nodes aren't welded when weld is False, like for meshes that are already welded.
+# For combined meshes, triangleBodies is the index of the mesh each triangle is from.
+class MeshCacheEntry:
+    # The number of different transforms the plane distances are kept for.
+    maxTransforms = 4
+
+    def __init__(self, nodeCoords, nodeIndices, diskCache = None, weld = True):
+        self.diskCache = diskCache
+        self.meshKey = None
+        if diskCache is not None:
+            self.meshKey = getMeshKey(nodeCoords, nodeIndices)
+
+        if weld:
+            self.nodeCoords, self.nodeIndices = getCachedArrays(diskCache, self.meshKey, [('nodeCoords', 'd'), ('nodeIndices', 'q')],
+                                                                lambda: weldNodes(nodeCoords, nodeIndices))
         else:
-            for i in range(0, int(len(loop.points)/2)-1):
-                pnt1 = loop.points[i*2]
-                pnt2 = loop.points[i*2+1]
-                lines.addByTwoPoints(adsk.core.Point3D.create(pnt1.x, pnt1.y, pnt1.z),
-                                     adsk.core.Point3D.create(pnt2.x, pnt2.y, pnt2.z))               
-                                    
-    sketch.isComputeDeferred = False
+            self.nodeCoords = nodeCoords
+            self.nodeIndices = nodeIndices
+        self.triangleBodies = None
+
+        self._boundingBox = None
+        self._transforms = collections.OrderedDict()
+        self._adjacency = None
+        self._previewEntry = None
+
+    # Returns the distance of each node from the x-y plane of the matrix, which is a
+    # third of the size of the coordinates of the mesh transformed into its system.
+    def getPlaneDistances(self, matrix):
+        transform = self._getTransform(matrix)
+        if not 'distances' in transform:
+            if numpy:
+                transform['distances'] = calculatePlaneDistancesVectorized(self.nodeCoords.reshape(-1, 3), matrix)
+            else:
+                transform['distances'] = calculatePlaneDistances(self.nodeCoords, matrix)
+        return transform['distances']
+
+    # Returns a HeightIntervalIndex of the distances of the triangles from the x-y
+    # plane of the matrix.
+    def getDistanceIndex(self, matrix):
+        transform = self._getTransform(matrix)
+        if not 'distanceIndex' in transform:
+            distances = self.getPlaneDistances(matrix)
+            transform['distanceIndex'] = self._getIntervalIndex('distanceOrder', matrix,
+                                                                lambda order: buildDistanceIntervalIndex(distances, self.nodeIndices, order))
+        return transform['distanceIndex']
+
+    # Returns a tuple with the minimum and maximum x, y, and z of the nodes, or None if
+    # there aren't any nodes.
+    def getBoundingBox(self):
+        if self._boundingBox is None:
+            self._boundingBox = (getBoundingBox(self.nodeCoords),)
+        return self._boundingBox[0]
+
+    # Returns the index of the neighboring triangle across each edge of each triangle.
+    def getAdjacency(self):
+        if self._adjacency is None:
+            self._adjacency = getCachedArrays(self.diskCache, self.meshKey, [('adjacency', 'q')],
+                                              lambda: [buildTriangleAdjacency(self.nodeIndices)])[0]
+        return self._adjacency
+
+    # Returns a MeshCacheEntry for a decimated copy of the mesh with about the number
+    # of triangles, used to preview the sections, or this entry if the mesh doesn't
+    # have more triangles than that.
+    def getPreviewEntry(self, triangleCount):
+        if self._previewEntry is None:
+            nodeCoords, nodeIndices = decimateMesh(self.nodeCoords, self.nodeIndices, triangleCount)
+            if nodeIndices is self.nodeIndices:
+                self._previewEntry = self
+            else:
+                self._previewEntry = MeshCacheEntry(nodeCoords, nodeIndices)
+        return self._previewEntry
+
+    # Returns the HeightIntervalIndex built by the build function for the matrix.  With
+    # a disk cache the order of the triangles, which takes the longest to compute, is
+    # loaded from it and passed to the build function, or saved to it once the index is
+    # built.  The sorted heights are quickly gathered again from the order.  The order
+    # of an index for a matrix that's only offset from the matrix along its z axis is
+    # used before either.
+    def _getIntervalIndex(self, name, matrix, build):
+        order = self._getOffsetOrder(matrix)
+        if order is not None or self.diskCache is None:
+            return build(order)
+
+        name = getMatrixName(name, matrix)
+        order = self.diskCache.load(self.meshKey, name, 'q')
+        index = build(order)
+        if order is None:
+            self.diskCache.save(self.meshKey, name, index.order, 'q')
+        return index
+
+    # Returns the order of the triangles of an interval index built for a matrix with
+    # the same z axis as the matrix, or None if there isn't one.  The heights of the
+    # triangles for the two matrices only differ by an offset, like for the batches of
+    # planes of a stack that's exported, so their order is the same.
+    def _getOffsetOrder(self, matrix):
+        zRow = tuple(matrix._data[8:11])
+        for key, transform in self._transforms.items():
+            if key[8:11] == zRow:
+                if 'distanceIndex' in transform:
+                    return transform['distanceIndex'].order
+        return None
 
+    # Returns the dictionary of the data computed for the matrix, which is filled in
+    # as each kind of data is requested.
+    def _getTransform(self, matrix):
+        key = tuple(matrix._data)
+        transform = self._transforms.get(key)
+        if transform is not None:
+            self._transforms.move_to_end(key)
+        else:
+            transform = {}
+            self._transforms[key] = transform
+            if len(self._transforms) > self.maxTransforms:
+                self._transforms.popitem(last = False)
+        return transform
+
+    # Returns the approximate number of bytes used by the data of this entry.
+    def byteSize(self):
+        size = _getByteSize(self.nodeCoords) + _getByteSize(self.nodeIndices)
+        if self.triangleBodies is not None:
+            size += _getByteSize(self.triangleBodies)
+        for transform in self._transforms.values():
+            if 'distances' in transform:
+                size += _getByteSize(transform['distances'])
+            if 'distanceIndex' in transform:
+                size += transform['distanceIndex'].byteSize()
+        if self._adjacency is not None:
+            size += _getByteSize(self._adjacency)
+        if self._previewEntry is not None and self._previewEntry is not self:
+            size += self._previewEntry.byteSize()
+        return size
+
+
+# Returns a value that changes when the mesh body is modified.  Not all versions of
+# the API support a revision ID for mesh bodies so the size of the mesh and the
+# corners of its bounding box are used when it's not available, which change when
+# nodes are added or removed or when the nodes are moved, like by a transform, except
+# for moves that keep the extent of the mesh.
+def _getMeshRevision(mesh):
+    revisionId = getattr(mesh, 'revisionId', None)
+    if revisionId:
+        return revisionId
 
-def asFusionPoint(myPoint):
-    return adsk.core.Point3D.create(myPoint.x, myPoint.y, myPoint.z)
+    triangleMesh = mesh.displayMesh
+    revision = (triangleMesh.nodeCount, triangleMesh.triangleCount)
+    boundingBox = getattr(mesh, 'boundingBox', None)
+    if boundingBox:
+        revision += tuple(boundingBox.minPoint.asArray()) + tuple(boundingBox.maxPoint.asArray())
+    return revision
 
 
-def pntFromArray(array, index):
-    return [array[index*3], array[index*3+1], array[index*3+2]]
+# Returns the mesh body in its component for a body in an occurrence, or the body.
+def _getNativeBody(mesh):
+    if getattr(mesh, 'assemblyContext', None):
+        return mesh.nativeObject
+    return mesh
 
 
-def transformPointArray(coords, matrix):
-    # Create a copy of the array.
-    newCoords = list(coords)
-    
-    # Transform each of the points.
-    for i in range(0, int(len(newCoords)/3)):
-        # Load the point coordinates into an array.
-        pnt = MyPoint(newCoords[i*3], newCoords[i*3+1], newCoords[i*3+2])
-
-        # Mulitply the point by the matrix.
-        pnt.transformBy(matrix)
+# Returns the approximate number of bytes used by a numpy array or a list of numbers.
+def _getByteSize(data):
+    if numpy and isinstance(data, numpy.ndarray):
+        return data.nbytes
+    else:
+        # A list stores a pointer to each Python number, which is at least 24 bytes.
+        return len(data) * 32
+
+
+_meshCache = MeshCache(_meshCacheMaxBytes)
+
+
+# Turns saving the data of the meshes in the disk cache folder on or off.
+def setDiskCacheEnabled(isEnabled):
+    diskCache = None
+    if isEnabled:
+        diskCache = MeshDiskCache(_diskCacheFolder, _diskCacheMaxBytes)
+    _meshCache.setDiskCache(diskCache)
+
+
+# Returns loops of coordinates.  The mesh isn't transformed into the coordinate system
+# of the sketch.  Instead the distance of each node from the sketch plane is computed,
+# and kept in the cache, and only the triangles that cross the plane are transformed.
+# When connectLoops is True the loops are traced across the edges shared by the
+# triangles, using the adjacency of the triangles from the cache, and otherwise the
+# lines are joined by matching their end points.  When the simplify tolerance is
+# greater than 0 it's used to combine the lines instead of only combining colinear
+# lines.  The work done is added to the stats and the loops are passed to the debug
+# sink, when they're given.  When a SectionProgress is given it's checked as the work
+# is done, so the calculation can be cancelled.
+def calculateIntersection(mesh, sketch, connectLoops, optimizeLines, optimizeArcs, stats = None, debugSink = None,
+                          simplifyTolerance = 0, progress = None):
+    stackLoops = calculateStackIntersection(mesh, sketch, 0, 1, connectLoops, optimizeLines, optimizeArcs, stats, debugSink,
+                                            simplifyTolerance, progress)
+    return stackLoops[0]
+
+
+# Computes the intersections of a stack of evenly spaced planes with the mesh in a
+# single pass through the mesh.  The first plane is the x-y plane of the sketch and
+# each following plane is offset by the spacing along the sketch z axis.  Returns a
+# list with an entry for each plane that is either a list of loops or None if the
+# plane doesn't intersect the mesh.  The loops are in the coordinate system of the
+# input sketch, so the points of the loops for plane i have a z value of spacing * i.
+# The simplify tolerance and the progress are the same as for calculateIntersection.
+# If the progress stops the calculation, the loops of the planes that were finished
+# are saved in the SectionCancelled that's raised.  The mesh can also be a list of
+# mesh bodies, whose sections are computed together in one pass.  The bodyId of each
+# traced loop is then the index of the body it's on.  The sections of a body in an
+# occurrence are computed from the data of the body in its component, and a body
+# whose bounding box isn't reached by any of the planes isn't sectioned.
+def calculateStackIntersection(mesh, sketch, spacing, count, connectLoops, optimizeLines, optimizeArcs, stats = None,
+                               debugSink = None, simplifyTolerance = 0, progress = None):
+    return calculatePlaneStackIntersection(mesh, getWorldToSketchMatrix(sketch), spacing, count, connectLoops, optimizeLines,
+                                           optimizeArcs, stats, debugSink, simplifyTolerance, progress)
+
+
+# Computes the intersections of a stack of evenly spaced planes with the mesh the same
+# way as calculateStackIntersection, where the first plane is the x-y plane of the
+# coordinate system that the matrix transforms world coordinates into, and the loops
+# are in that coordinate system.
+def calculatePlaneStackIntersection(mesh, sketchToWorld, spacing, count, connectLoops, optimizeLines, optimizeArcs, stats = None,
+                                    debugSink = None, simplifyTolerance = 0, progress = None):
+    with timeStage(stats, 'readMesh'):
+        cacheEntry = _meshCache.getEntry(mesh)
+    nodeCoords = cacheEntry.nodeCoords
+    nodeIndices = cacheEntry.nodeIndices
+    sketchToWorld = getBodyMatrix(mesh, sketchToWorld)
+
+    if isStackMissed(cacheEntry.getBoundingBox(), sketchToWorld, spacing, count):
+        return [None] * count
+
+    # Get the distances, and for a stack the index of the triangle distances, from the
+    # cache, so only the triangles that cross each plane are visited.
+    with timeStage(stats, 'transform'):
+        distances = cacheEntry.getPlaneDistances(sketchToWorld)
+        heightIndex = None
+        if count > 1:
+            heightIndex = cacheEntry.getDistanceIndex(sketchToWorld)
+
+    if connectLoops:
+        with timeStage(stats, 'adjacency'):
+            adjacency = cacheEntry.getAdjacency()
+        _meshCache.trim()
+
+        return calculateTracedSections(nodeCoords, nodeIndices, adjacency, sketchToWorld, spacing, count, optimizeLines, optimizeArcs,
+                                       distances, heightIndex, stats, debugSink, simplifyTolerance, progress,
+                                       cacheEntry.triangleBodies)
+
+    # Compute the lines where the triangles cross the planes.  The vectorized version
+    # is used when numpy is available and the pure-Python version is kept as the
+    # reference implementation.
+    with timeStage(stats, 'intersect'), progressPart(progress, 0, 0.5):
+        if numpy:
+            stackSegments = calculatePlaneSegmentsVectorized(nodeCoords, nodeIndices, sketchToWorld, spacing, count,
+                                                             distances, heightIndex, stats, progress)
+        else:
+            stackSegments = calculatePlaneSegments(nodeCoords, nodeIndices, sketchToWorld, spacing, count,
+                                                   distances, heightIndex, stats, progress)
+    _meshCache.trim()
 
-        # Save the results back into the original array.
-        newCoords[i*3] = pnt.x
-        newCoords[i*3+1] = pnt.y
-        newCoords[i*3+2] = pnt.z
+    with progressPart(progress, 0.5, 1):
+        return createStackLoops(stackSegments, connectLoops, optimizeLines, optimizeArcs, stats, debugSink, simplifyTolerance,
+                                progress)
 
-    return newCoords
 
+# Returns a MyMatrix that transforms the data of a mesh body in the cache into world
+# coordinates, or None when it's already in world coordinates.  The data of a body in
+# an occurrence is in the coordinate system of its component.
+def getBodyToWorldMatrix(mesh):
+    occurrence = getattr(mesh, 'assemblyContext', None)
+    if not occurrence:
+        return None
 
-def getCoordinate(coordIndex, vertices):
-    x = vertices[coordIndex * 3]
-    y = vertices[coordIndex * 3 + 1]
-    z = vertices[coordIndex * 3 + 2]
+    transform = getattr(occurrence, 'transform2', None) or occurrence.transform
+    bodyToWorld = MyMatrix()
+    bodyToWorld.setWithArray(transform.asArray())
+    return bodyToWorld
 
-    coordinate = [x, y, z]
 
-    return coordinate
+# Returns a MyMatrix that transforms the data of a mesh body, or a list of mesh bodies,
+# in the cache the same way that the matrix transforms world coordinates.
+def getBodyMatrix(mesh, worldToPlane):
+    if isinstance(mesh, list):
+        if len(mesh) != 1:
+            return worldToPlane
+        mesh = mesh[0]
 
+    bodyToWorld = getBodyToWorldMatrix(mesh)
+    if bodyToWorld is None:
+        return worldToPlane
+    bodyToWorld.transformBy(worldToPlane)
+    return bodyToWorld
 
 
-# Returns loops of coordinates.
-def calculateIntersection(mesh, sketch, connectLoops, optimizeLines, optimizeArcs):
-    intersectionLines = []
-    
-    # Get the triangular mesh from the body.
-    triangleMesh = mesh.displayMesh
-    
-    # Get the coordinate data from the mesh.
-    nodeCoords = triangleMesh.nodeCoordinatesAsDouble
-    nodeIndices = triangleMesh.nodeIndices
-    
-    # Build up the transform to transform the points so the
-    # position of the sketch plane will be the x-y model plane.
+# Returns a MyMatrix that transforms world coordinates into the coordinate system
+# of the sketch, so the sketch x-y plane becomes the x-y model plane.
+def getWorldToSketchMatrix(sketch):
     tempSketchToWorld = sketch.transform
     tempSketchToWorld.invert()
     
-    # Create a MyMatrix object.
     sketchToWorld = MyMatrix()
     sketchToWorld.setWithArray(tempSketchToWorld.asArray())
+    return sketchToWorld
 
-    # Transform the points so the intersection plane is the x-y model plane.        
-    transCoords = transformPointArray(nodeCoords, sketchToWorld)
-
-    # Iterate through the triangles to identify which ones overlap the x-y plane.
-    intCount = 0
-    for i in range(0, int(len(nodeIndices)/3)):
-        # Get the three coordinates of the current triangle.      
-        point1 = getCoordinate(nodeIndices[i*3], transCoords)
-        point2 = getCoordinate(nodeIndices[i*3+1], transCoords)
-        point3 = getCoordinate(nodeIndices[i*3+2], transCoords)
-
-        isAboveZ = False
-        isBelowZ = False
-
-        if point1[2] >= 0 or point2[2] >= 0 or point3[2] >= 0:
-            isAboveZ = True
-
-        if point1[2] < 0 or point2[2] < 0 or point3[2] < 0:
-            isBelowZ = True
-
-        # Check to see if the triangle intersects the plane.
-        if isAboveZ and isBelowZ:
-            # This triangle overlaps the input plane, increase the intersection count.
-            intCount += 1
-
-            # Get the two points that are on one side and the single point on the other side.
-            sideOnePoint1 = []
-            sideOnePoint2 = []
-            sideTwoPoint = []
-            if point1[2] >= 0 and point2[2] >= 0:
-                sideOnePoint1 = MyPoint(point1[0], point1[1], point1[2])
-                sideOnePoint2 = MyPoint(point2[0], point2[1], point2[2])
-                sideTwoPoint = MyPoint(point3[0], point3[1], point3[2])
-            elif point1[2] >= 0 and point3[2] >= 0:
-                sideOnePoint1 = MyPoint(point1[0], point1[1], point1[2])
-                sideOnePoint2 = MyPoint(point3[0], point3[1], point3[2])
-                sideTwoPoint = MyPoint(point2[0], point2[1], point2[2])
-            elif point2[2] >= 0 and point3[2] >= 0:
-                sideOnePoint1 = MyPoint(point2[0], point2[1], point2[2])
-                sideOnePoint2 = MyPoint(point3[0], point3[1], point3[2])
-                sideTwoPoint = MyPoint(point1[0], point1[1], point1[2])
-            elif point1[2] < 0 and point2[2] < 0:
-                sideOnePoint1 = MyPoint(point1[0], point1[1], point1[2])
-                sideOnePoint2 = MyPoint(point2[0], point2[1], point2[2])
-                sideTwoPoint = MyPoint(point3[0], point3[1], point3[2])
-            elif point1[2] < 0 and point3[2] < 0:
-                sideOnePoint1 = MyPoint(point1[0], point1[1], point1[2])
-                sideOnePoint2 = MyPoint(point3[0], point3[1], point3[2])
-                sideTwoPoint = MyPoint(point2[0], point2[1], point2[2])
-            elif point2[2] < 0 and point3[2] < 0:
-                sideOnePoint1 = MyPoint(point2[0], point2[1], point2[2])
-                sideOnePoint2 = MyPoint(point3[0], point3[1], point3[2])
-                sideTwoPoint = MyPoint(point1[0], point1[1], point1[2])
-
-            # Create the two lines that represent sides of the triangle that overlap the plane.
-            lineSeg1 = MyLine(sideOnePoint1, sideTwoPoint)
-            lineSeg2 = MyLine(sideOnePoint2, sideTwoPoint)
-            
-            # Intersect the lines with the X-Y plane.
-            intResult1 = lineSeg1.intersectWithXYPlane()
-            intResult2 = lineSeg2.intersectWithXYPlane()
-            
-            # Skip any zero length segments.
-            if intResult1.distanceTo(intResult2) > 0.000001:
-                intersectionLines.append(MyLine(intResult1, intResult2))
-
-    if len(intersectionLines) == 0:
-        return None
-    elif connectLoops:
-        # Process the lines so they're in a nice connected order and grouped
-        # by loops.
-        intersectionLoops = createSectionLoops(intersectionLines, optimizeLines, optimizeArcs)
-    else:
-        loop = SectionLoop()
-        loop.isConnected = False
-        
-        for line in intersectionLines:
-            loop.addPoint(line.startPoint, True)
-            loop.addPoint(line.endPoint, True)
-        
-        intersectionLoops = []
-        intersectionLoops.append(loop)
-        
-    return intersectionLoops
 
+# Returns the matrix from world coordinates to the coordinate system of the plane
+# offset from the x-y plane of the matrix along its z axis.
+def getOffsetPlaneMatrix(worldToPlane, offset):
+    matrix = worldToPlane.copy()
+    matrix.setCell(4, 3, matrix.getCell(4, 3) - offset)
+    return matrix
 
 
-# Given a list of lines that represent the intersection this cleans them up so they're
-# in head-to-tail connected loops.  It returns a list of sectionLoop objects.
-def createSectionLoops(intersectionLines, optimizeLines, optimizeArcs):
-    # Initialize the list that will contain the section loops.
-    sectionLoops = []
-    
-    currentLoop = SectionLoop()
-
-    # Initialize the loop with the points from the first line.
-    currentLoop.addPoint(intersectionLines[0].startPoint, True)
-    currentLoop.addPoint(intersectionLines[0].endPoint, True)
-    
-    # Set this line to Empty indicating it's been processed.
-    intersectionLines[0] = None
-    
-    # Begin processing the lines.
-    for i in range(0, len(intersectionLines)):
-        foundPoint = False
-        for j in range(1, len(intersectionLines)):
-            currentLine = intersectionLines[j]
-            newPoint = None
-            isAtEnd = True
-
-            if i != j and currentLine != None:
-                # Check to see if the end points of the current line match the check line.
-                if currentLine.startPoint.isEqualTo(currentLoop.startPoint):
-                    newPoint = currentLine.endPoint
-                    isAtEnd = False
-                    intersectionLines[j] = None
-                elif currentLine.startPoint.isEqualTo(currentLoop.endPoint):
-                    newPoint = currentLine.endPoint
-                    isAtEnd = True
-                    intersectionLines[j] = None
-                elif currentLine.endPoint.isEqualTo(currentLoop.startPoint):
-                    newPoint = currentLine.startPoint
-                    isAtEnd = False
-                    intersectionLines[j] = None
-                elif currentLine.endPoint.isEqualTo(currentLoop.endPoint):
-                    newPoint = currentLine.startPoint
-                    isAtEnd = True
-                    intersectionLines[j] = None
-
-                # If a point was found, check to see if this point closes the loop.
-                if newPoint != None:
-                    foundPoint = True
-
-                    if (isAtEnd and newPoint.isEqualTo(currentLoop.startPoint)) or (not isAtEnd and newPoint.isEqualTo(currentLoop.endPoint)):
-                        currentLoop.isClosed = True
-
-                        # Clean this loop of colinear lines.
-                        if optimizeLines:
-                            currentLoop.optimizeLines()
-                            
-                            if optimizeArcs:
-                                currentLoop.optimizeArcs()
-                            
-                        # Save this loop and start a new loop.
-                        sectionLoops.append(currentLoop)
-                        currentLoop = SectionLoop()
-
-                        # Find the next unused line and use it to start the next loop.
-                        for k in range(0, len(intersectionLines)):
-                            if intersectionLines[k] != None:
-                                # Add the two points to the end of the loop.
-                                currentLoop.addPoint(intersectionLines[k].startPoint, True)
-                                currentLoop.addPoint(intersectionLines[k].endPoint, True)
-                                intersectionLines[k] = None
-                                break
-                    else:
-                        # Check that the new point is far enough away from the previous point for a line to be valid.
-                        if isAtEnd:
-                            if newPoint.distanceTo(currentLoop.endPoint) > 0.000001:
-                                # Add the point to the end of the loop.
-                                currentLoop.addPoint(newPoint, True)
-                        elif not isAtEnd:
-                            if newPoint.distanceTo(currentLoop.startPoint) > 0.000001:
-                                # Add the point to the start of the loop.
-                                currentLoop.addPoint(newPoint, False)
-
-                    break
-
-        noMoreLines = False
-        if not foundPoint:
-            if currentLoop.pointCount() > 0:
-                # Clean this loop of colinear lines.
-                if optimizeLines:
-                    currentLoop.optimizeLines()
-                    
-                    if optimizeArcs:
-                        currentLoop.optimizeArcs()
+# Returns a MyMatrix that transforms world coordinates into a coordinate system whose
+# x-y plane is the plane of a construction plane or planar face.
+def getWorldToPlaneEntityMatrix(planeEnt):
+    planeGeom = adsk.core.Plane.cast(planeEnt.geometry)
+    origin = planeGeom.origin
+    normal = planeGeom.normal
+    return getWorldToPlaneMatrix((origin.x, origin.y, origin.z), (normal.x, normal.y, normal.z))
 
-                # Save this loop and start a new loop.
-                sectionLoops.append(currentLoop)
 
-            noMoreLines = True
-            currentLoop = SectionLoop()
-            for k in range(0, len(intersectionLines)):
-                if intersectionLines[k] != None:
-                    noMoreLines = False
+# Returns a MyMatrix that transforms coordinates in the coordinate system of one
+# sketch into the coordinate system of another sketch.
+def getSketchToSketchMatrix(fromSketch, toSketch):
+    worldToSketch = toSketch.transform
+    worldToSketch.invert()
 
-                    # Add the two points to the end of the loop.
-                    currentLoop.addPoint(intersectionLines[k].startPoint, True)
-                    currentLoop.addPoint(intersectionLines[k].endPoint, True)
-                    intersectionLines[k] = None
-                    break
+    tempMatrix = fromSketch.transform
+    tempMatrix.transformBy(worldToSketch)
 
-        if noMoreLines:
-            break
-
-    # Save the current loop.
-    if currentLoop.pointCount() > 0:
-        # Clean this loop of colinear lines.
-        if optimizeLines:
-            currentLoop.optimizeLines()
-
-        if optimizeArcs:
-            currentLoop.optimizeArcs()
-            
-        # Add this loop to the collection.
-        sectionLoops.append(currentLoop)
-            
-    return sectionLoops
-
-
-class MyLine:
-    def __init__(self, start, end):
-        self.startPoint = start
-        self.endPoint = end
-
-    def asString(self):
-            return '(' + str(self.startPoint.x) + ', ' + str(self.startPoint.y) + ', ' + str(self.startPoint.z) + ')-(' + str(self.endPoint.x) + ', ' + str(self.endPoint.y) + ', ' + str(self.endPoint.z) + ')'
-            
-    # Multiply the point by the matrix.
-    def transformBy(self, matrix):
-        try:
-            self.start.transformBy(matrix)
-            self.end.transformBy(matrix)
-        except:
-            raise ArithmeticError('Point transform failed.')
-
-    def intersectWithLine(self, otherLine):
-        a = [self.endPoint.x - self.startPoint.x, self.endPoint.y - self.startPoint.y]
-        b = [otherLine.startPoint.x - otherLine.endPoint.x, otherLine.startPoint.y - otherLine.endPoint.y]
-        c = [self.startPoint.x - otherLine.startPoint.x, self.startPoint.y - otherLine.startPoint.y]
-        
-        # Compute alpha
-        denominator = (a[1] * b[0]) - (a[0] * b[1])
-        if denominator == 0:
-            return None
-
-        numerator = (b[1] * c[0]) - (b[0] * c[1])
-        alpha = numerator / denominator
-
-        dX = self.startPoint.x + (alpha * (self.endPoint.x - self.startPoint.x))
-        dY = self.startPoint.y + (alpha * (self.endPoint.y - self.startPoint.y))
-        return MyPoint(dX, dY, 0)
-        
-        
-    # Calculate the intersection point of the line and the x-y plane
-    # This assumes the line does intersect, which in this case
-    # has already been validated.
-    def intersectWithXYPlane(self):
-        # Get the length of the line the Z direction.
-        zLength = abs(self.startPoint.z) + abs(self.endPoint.z)     
-    
-        # Compute the length factor of the start point to the z plane.
-        factor = abs(self.startPoint.z) / zLength
-    
-        # Create a vector along the line and scale it by the factor.    
-        lineVec = self.startPoint.vectorTo(self.endPoint)
-        lineVec.scaleBy(factor)
-        
-        # Move the line start point along the vector the scaled distance
-        # and that will be the intersection point.
-        intPoint = self.startPoint.copy()
-        intPoint.translateBy(lineVec)
-        
-        return intPoint
-                       
-
-class MyCircle:
-    # Create a circle through three points.
-    def __init__(self, startPoint, midPoint, endPoint):
-        try:
-            # Create two perpendiculars for the intersection.
-            x = (startPoint.x + midPoint.x) / 2
-            y = (startPoint.y + midPoint.y) / 2
-            sideMid = MyPoint(x, y, 0)
-    
-            angle = startPoint.bearingTo(midPoint) + (math.pi / 2)
-            x = x + math.cos(angle)
-            y = y + math.sin(angle)
-            perpPoint = MyPoint(x, y, 0)
-            perpLine1 = MyLine(sideMid, perpPoint)
-    
-            x = (endPoint.x + midPoint.x) / 2
-            y = (endPoint.y + midPoint.y) / 2
-            sideMid = MyPoint(x, y, 0)
-    
-            angle = midPoint.bearingTo(endPoint) + (math.pi / 2)
-            x = x + math.cos(angle)
-            y = y + math.sin(angle)
-            perpPoint = MyPoint(x, y, 0)
-            perpLine2 = MyLine(sideMid, perpPoint)
-    
-            # Compute the center of the circle.
-            self.center = perpLine1.intersectWithLine(perpLine2)
-            if not self.center:
-                return None
-    
-            # Compute the radius of the circle.
-            self.radius = startPoint.distanceTo(self.center)
-        except:
-            return None
-
-    def asString(self):
-            return '(' + str(self.center.x) + ', ' + str(self.center.y) + ', ' + str(self.center.z) + ')-(' + str(self.radius) + ')'
-            
-    # Multiply the point by the matrix.
-    def transformBy(self, matrix):
-        try:
-            self.center.transformBy(matrix)
-        except:
-            raise ArithmeticError('Circle transform failed.')
-
-
-# Enum of point types.
-class PointType():
-     unknown = 1
-     lineStart = 2
-     lineEnd = 3
-     lineStartAndEnd = 4
-     arcMid = 5
-
-
-class MyPoint:
-    def __init__(self, x=0, y=0, z=0, type=PointType.unknown):
-        self.x = x
-        self.y = y
-        self.z = z
-        self.pointType = type
- 
-    # Multiply the point by the matrix.
-    def transformBy(self, matrix):
-        try:
-            newX = self.x * matrix.getCell(1, 1) + self.y * matrix.getCell(2, 1) + self.z * matrix.getCell(3, 1) + matrix.getCell(4, 1)
-            newY = self.x * matrix.getCell(1, 2) + self.y * matrix.getCell(2, 2) + self.z * matrix.getCell(3, 2) + matrix.getCell(4, 2)
-            newZ = self.x * matrix.getCell(1, 3) + self.y * matrix.getCell(2, 3) + self.z * matrix.getCell(3, 3) + matrix.getCell(4, 3)
-            self.x = newX
-            self.y = newY
-            self.z = newZ
-        except:
-            raise ArithmeticError('Point transform failed.')
-
-    def vectorTo(self, point):
-        return MyVector(point.x - self.x, point.y - self.y, point.z - self.z)            
-    
-    def asString(self):
-        return str(self.x) + ', ' + str(self.y) + ', ' + str(self.z)
-            
-    def translateBy(self, vector):
-        self.x += vector.x
-        self.y += vector.y
-        self.z += vector.z
-        
-    def copy(self):
-        return MyPoint(self.x, self.y, self.z)
-        
-    def distanceTo(self, point):
-        return math.sqrt(((point.x - self.x) ** 2) + ((point.y - self.y) ** 2) + ((point.z - self.z) ** 2))
-        
-    def bearingTo(self, point):        
-        pointDist = self.distanceTo(point)
-        if pointDist < _pointTol:
-            raise ValueError('The points are at the same location.')
-
-        # Determine which quadrant the point is in.
-        if point.x >= self.x and point.y >= self.y:
-            # First quadrant
-            return math.acos((point.x - self.x) / pointDist)
-        elif point.x < self.x and point.y >= self.y:
-            # Second quadrant
-            return math.acos((point.x - self.x) / pointDist)
-        elif point.x >= self.x and point.y < self.y:
-            # Third quadrant
-            return (math.pi * 2) - math.acos((point.x - self.x) / pointDist)
-        else:
-            # Fourth quadrant
-            return (math.pi * 2) - math.acos((point.x - self.x) / pointDist)
-            
-    def isEqualTo(self, point):
-            if self.distanceTo(point) <= 0.000001:
-                return True
-            else:
-                return False  
-
-
-class MyVector:
-    def __init__(self, x=0, y=0, z=0):
-        self.x = x
-        self.y = y
-        self.z = z
- 
-    # Multiply the point by the matrix.
-    def transformBy(self, matrix):
-        try:
-            newX = self.x * matrix.getCell(1, 1) + self.y * matrix.getCell(2, 1) + self.z * matrix.getCell(3, 1) + matrix.getCell(4, 1)
-            newY = self.x * matrix.getCell(1, 2) + self.y * matrix.getCell(2, 2) + self.z * matrix.getCell(3, 2) + matrix.getCell(4, 2)
-            newZ = self.x * matrix.getCell(1, 3) + self.y * matrix.getCell(2, 3) + self.z * matrix.getCell(3, 3) + matrix.getCell(4, 3)
-            self.x = newX
-            self.y = newY
-            self.z = newZ
-        except:
-            raise ArithmeticError('Point transform failed.')
-            
-    def asString(self):
-            return str(self.x) + ', ' + str(self.y) + ', ' + str(self.z)
-    
-    def scaleBy(self, scale):
-        self.x = self.x * scale
-        self.y = self.y * scale
-        self.z = self.z * scale
-        
-    # Calculate the dot product of two vectors.
-    def dotProduct(self, vec):
-        return (self.x * vec.x + self.y * vec.y + self.z * vec.z)
-
-    # Calculate the angle between two vectors.        
-    def angleTo(self, vec):
-        dotProd = self.dotProduct(vec)
-        val = dotProd / (self.length() * vec.length())
-        if val < -1.0:
-            val = -1.0
-        elif val > 1.0:
-            val = 1.0
-        return math.acos(val)
-
-    # Add two vectors.
-    def add(self, vec):
-        return MyVector(self.x + vec.x, self.y + vec.y, self.z + vec.z)
-        
-    # Subtract two vectors.
-    def subtract(self, vec):
-        return MyVector(self.x - vec.x, self.y - vec.y, self.z - vec.z)
-
-    # Multiply the vectory by a value.
-    def multiply(self, val):
-        self.x *= val
-        self.y *= val
-        self.z *= val
-    
-    def length(self):
-        return math.sqrt((self.x * self.x) + (self.y * self.y) + (self.z * self.z))
-        
-    def normalize(self):
-        lng = self.length()
-        self.x = self.x / lng
-        self.y = self.y / lng
-        self.z = self.z / lng
-    
-
-
-class MyMatrix:
-    def __init__(self):
-        self._data = [1,0,0,0,0,1,0,0,0,0,1,0,0,0,0,1]
-        
-    def copy(self):
-        newMatrix = MyMatrix()
-        for i in range(0,16):
-            newMatrix._data[i] = self._data[i]
-        return newMatrix
-        
-    def setWithArray(self, array):
-        for i in range(0,16):
-            self._data[i] = array[i]
-                
-    def setToIdenty(self):
-        self._data = [1,0,0,0,0,1,0,0,0,0,1,0,0,0,0,1]
-                
-    def getCell(self, column, row):
-        return self._data[(row - 1) * 4 + (column - 1)]
-                        
-    def setCell(self, column, row, value):
-        self._data[(row - 1) * 4 + (column - 1)] = value
-       
-    def transformBy(self, trans):
-        newMatrix = MyMatrix()
-        
-        for i in range(1,5):
-            for j in range(1,5):
-                newMatrix.setCell(i, j, str(self.getCell(i, 1)) * trans.getCell(1, j) + self.getCell(i, 2) * trans.getCell(2, j) + self.getCell(i, 3) * trans.getCell(3, j) + self.getCell(i, 4) * trans.getCell(4, j))
-
-        for i in range(0,16):
-            self._data[i] = newMatrix._data[i]
-
-    def invert(self): 
-        # Create a new matrix with the translation portion stripped off.
-        newMatrix = self.copy() 
-        newMatrix.setCell(4, 1, 0)
-        newMatrix.setCell(4, 2, 0)
-        newMatrix.setCell(4, 3, 0)
-
-        # Invert the matrix by swapping the cells along the diagonal.  This only
-        # works for orthogonal matrices, which is all we need here.
-        newMatrix.setCell(1, 2, self.getCell(2, 1))
-        newMatrix.setCell(1, 3, self.getCell(3, 1))
-        newMatrix.setCell(2, 3, self.getCell(3, 2))
-        newMatrix.setCell(2, 1, self.getCell(1, 2))
-        newMatrix.setCell(3, 1, self.getCell(1, 3))
-        newMatrix.setCell(3, 2, self.getCell(2, 3))
-
-        # Reverse the direction of the translation component.
-        trans = self.translation()
-        trans.transformBy(newMatrix)
-        trans.scaleBy(-1)
-
-        # Put the translation back into the matrix.
-        newMatrix.setCell(4, 1, trans.x)
-        newMatrix.setCell(4, 2, trans.y)
-        newMatrix.setCell(4, 3, trans.z)
-
-        for i in range(0,16):
-            self._data[i] = newMatrix._data[i]
-    
-    def translation(self):
-        return MyVector(self.getCell(4,1), self.getCell(4,2), self.getCell(4,3))
-       
-    def asString(self):
-        result = ''
-        for row in range(1, 5):
-            if row == 1:
-                result = str(self.getCell(1, row)) + ', ' + str(self.getCell(2, row)) + ', ' + str(self.getCell(3, row)) + ', ' + str(self.getCell(4, row))
-            else:
-                result += '\n' + str(self.getCell(1, row)) + ', ' + str(self.getCell(2, row)) + ', ' + str(self.getCell(3, row)) + ', ' + str(self.getCell(4, row))
-            
-        return result
-
-
-class SectionLoop:
-    def __init__(self):
-        self.points = []
-        self.isClosed = False
-        self.startPoint = None
-        self.endPoint = None
-        self.isConnected = True
-
-
-    def _setStartAndEndPoints(self):
-        self.startPoint = self.points[0]
-        self.endPoint = self.points[len(self.points)-1]
-
-    def pointCount(self):
-        return len(self.points)
-
-    def replacePoint(self, index, newPoint):
-        self.points[index-1] = newPoint
-        self._setStartAndEndPoints()
-
-    def addPoint(self, newPoint, addToEnd):
-        if addToEnd:
-            self.points.append(newPoint)
-        else:
-            self.points.insert(0, newPoint)
-        self._setStartAndEndPoints()
-        cnt = len(self.points)
-        print(str(cnt))
-            
-    def removePoint(self, index):
-        if index < len(self.points):
-            self.points.pop(index)
-            self._setStartAndEndPoints()        
-        
-    def optimizeLines(self):
-        # Declare a list to store the point indices that will be removed.
-        extraPoints = []
-
-        # Initialize the start and mid points.
-        startCheckPoint = self.points[0]
-        midCheckPoint = self.points[1]
-        endCheckPoint = None
-
-        # Iterate over the points in the loop.  This overshoots
-        # the length of the list so it will overlap to the beginning
-        # so that the connecting points can be checked for colinearity.
-        for i in range(2, len(self.points) + 2):
-            # Special case when the index is the length plus 1 or 2
-            # so that the start points are also considered.
-            if i == len(self.points):
-                endCheckPoint = self.points[0]
-            elif i == len(self.points) + 1:
-                endCheckPoint = self.points[1]
-            else:
-                endCheckPoint = self.points[i]
-
-            # Calculate the angle defined by the three points.  If it's within a tolerance
-            # of pi then they're colinear.
-            vector1 = MyVector(startCheckPoint.x - midCheckPoint.x, startCheckPoint.y - midCheckPoint.y, startCheckPoint.z - midCheckPoint.z)
-            vector1.normalize()
-            vector2 = MyVector(endCheckPoint.x - midCheckPoint.x, endCheckPoint.y - midCheckPoint.y, endCheckPoint.z - midCheckPoint.z)
-            vector2.normalize()
-            angle = vector1.angleTo(vector2)
- 
-            # Check to see if the angle is within tolerance to 180 degrees.
-            if math.fabs(math.pi - angle) < 0.0001:
-                # Special case for last point.
-                if i == len(self.points) + 2:
-                    extraPoints.append(0)
-#                elif i == len(self.points) + 1:
-#                    extraPoints.append(1)
-                else:
-                    extraPoints.append(i-1)
-
-                if startCheckPoint.pointType == PointType.lineEnd:
-                    startCheckPoint.pointType = PointType.lineStartAndEnd
-                else:
-                    startCheckPoint.pointType = PointType.lineStart
-
-                if endCheckPoint.pointType == PointType.lineStart:
-                    endCheckPoint.pointType = PointType.lineStartAndEnd
-                else:                    
-                    endCheckPoint.pointType = PointType.lineEnd
-
-                midCheckPoint = endCheckPoint
-            else:
-                startCheckPoint = midCheckPoint
-                midCheckPoint = endCheckPoint
-
-        # Sort the points to be removed.
-        extraPoints.sort()
-        extraPoints.reverse()
-
-        for i in range(0, len(extraPoints)):
-            self.removePoint(extraPoints[i])
-        
-        self._setStartAndEndPoints()
-        
-        
-    def optimizeArcs(self):
-        dumpPoints(self.points)        
-        
-        tolerance = 0.001
-        
-        # Declare a list to store the point indices that will be removed.
-        extraPoints = []
-
-        startPoint = self.points[0]
-        midPoint = self.points[1]
-        endPoint = self.points[2]
-        currentCircle = MyCircle(startPoint, midPoint, endPoint)
-        
-        lastEndIndex = -1
-
-        # Specify the minimum number of points that define an arc.
-        minArcPoints = 6
-        
-        # Iterate over the points in the loop.
-        goodPointCount = 0
-        for i in range(3, len(self.points)+1):
-            # Special case for the last point.
-            if i == len(self.points):
-                nextPoint = self.points[0]
-            else:
-                nextPoint = self.points[i]
-
-            # Check to see if this point lies on the circle.            
-            if currentCircle:
-                if math.fabs(currentCircle.radius - nextPoint.distanceTo(currentCircle.center)) < tolerance:
-                    goodPointCount += 1
-                    if goodPointCount == minArcPoints - 3:
-                        extraPoints.append(i-2)
-                        extraPoints.append(i-1)
-                    elif goodPointCount > minArcPoints - 3:
-                        extraPoints.append(i-1)
-
-                    if i == len(self.points) and goodPointCount >= minArcPoints - 3:
-                        extraPoints.append(lastEndIndex-1)
-                else:
-                    # The point isn't on a circle so create any current arc info 
-                    # and create a new circle to check
-                    # A value of 1 indicates that the circle must pass through 5 points.
-                    if goodPointCount > minArcPoints - 3:  
-                        midPoint.pointType = PointType.arcMid
-                        goodPointCount = 0
-                        startPoint = nextPoint
-                        midPoint = None
-                        endPoint = None
-                        currentCircle = None
-                    else:    
-                        goodPointCount = 0
-                        startPoint = midPoint
-                        midPoint = endPoint
-                        endPoint = nextPoint
-                        currentCircle = MyCircle(startPoint, midPoint, endPoint)
-                        lastEndIndex = i
-            else:
-                if not midPoint:
-                    midPoint = nextPoint
-                elif not endPoint:
-                    endPoint = nextPoint
-                    currentCircle = MyCircle(startPoint, midPoint, endPoint)
-
-        if goodPointCount > minArcPoints - 3:  
-            midPoint.pointType = PointType.arcMid
-            goodPointCount = 0
-
-        # Sort the points to be removed.
-        extraPoints.sort()
-        extraPoints.reverse()
-
-        for i in range(0, len(extraPoints)):
-            self.removePoint(extraPoints[i])
-        
-        self._setStartAndEndPoints()
-        
-
-def dumpPoints(points):
-    f = open('C:/Temp/PointsDump.txt','w')
-
-    pointCnt = 0
-    for point in points:
-        if point.pointType == PointType.lineStart:
-            pntType = 'lineStart'
-        elif point.pointType == PointType.lineEnd:
-            pntType = 'lineEnd'
-        elif point.pointType == PointType.lineStartAndEnd:
-            pntType = 'lineStartAndEnd'
-        elif point.pointType == PointType.arcMid:
-            pntType = 'arcMid'
-        elif point.pointType == PointType.unknown:
-            pntType = 'unknown'
-            
-        f.write(str(pointCnt) + '. ' + pntType + ', ' + str(point.x) + ', ' + str(point.y) + ', ' + str(point.z) + '\n' )
-        pointCnt += 1
-    f.close()        
\ No newline at end of file
+    sketchToSketch = MyMatrix()
+    sketchToSketch.setWithArray(tempMatrix.asArray())
+    return sketchToSketch
@@ -0,0 +1,172 @@
+# Generates the meshes used by the benchmarks.  Each mesh is built from a fixed seed
+# so the same size always results in the same mesh, and the size is the approximate
+# number of triangles.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import math
+
+import numpy
+
+
+# A generated mesh and the plane it's sectioned with.  The coordinates and indices
+# are flat arrays in the same layout as the data of a Fusion mesh.
+class BenchmarkMesh:
+    def __init__(self, name, nodeCoords, nodeIndices, origin, normal):
+        self.name = name
+        self.nodeCoords = nodeCoords
+        self.nodeIndices = nodeIndices
+        self.origin = origin
+        self.normal = normal
+
+    def triangleCount(self):
+        return int(len(self.nodeIndices)/3)
+
+    def nodeCount(self):
+        return int(len(self.nodeCoords)/3)
+
+
+# Sphere with a radius of 10 made of rings of quads with a triangle fan at each pole.
+def uvSphere(triangleCount):
+    segments = max(int(math.sqrt(triangleCount)), 4)
+    rings = max(int(triangleCount / (2 * segments)) + 1, 3)
+
+    theta = numpy.linspace(0, math.pi, rings + 1)[1:-1]
+    phi = numpy.linspace(0, 2 * math.pi, segments, endpoint = False)
+    points = _sphericalGrid(theta, phi, 10.0)
+    return BenchmarkMesh('uvSphere', *_closeWithPoles(points, 10.0), origin = (0.0, 0.0, 0.3), normal = (0.1, 0.2, 1.0))
+
+
+# Torus with a major radius of 10 and a minor radius of 3.
+def torus(triangleCount):
+    around = max(int(math.sqrt(triangleCount)), 4)
+    across = max(int(triangleCount / (2 * around)), 3)
+
+    u = numpy.linspace(0, 2 * math.pi, around, endpoint = False)[:, None]
+    v = numpy.linspace(0, 2 * math.pi, across, endpoint = False)[None, :]
+    points = numpy.stack(((10 + 3 * numpy.cos(v)) * numpy.cos(u),
+                          (10 + 3 * numpy.cos(v)) * numpy.sin(u),
+                          3 * numpy.sin(v) + 0 * u), axis = 2)
+
+    indices = _gridIndices(around, across, True, True)
+    return BenchmarkMesh('torus', points.reshape(-1), indices, origin = (0.0, 0.0, 0.5), normal = (0.05, 0.1, 1.0))
+
+
+# Sphere whose surface has low frequency bumps and per vertex noise, like a scan of a
+# cast or hand made part.  The triangles are shuffled because scanning software doesn't
+# write the triangles in any particular order.
+def scannedSurface(triangleCount, seed = 1):
+    random = numpy.random.default_rng(seed)
+    segments = max(int(math.sqrt(triangleCount)), 4)
+    rings = max(int(triangleCount / (2 * segments)) + 1, 3)
+
+    theta = numpy.linspace(0, math.pi, rings + 1)[1:-1]
+    phi = numpy.linspace(0, 2 * math.pi, segments, endpoint = False)
+    radius = (10.0 + 0.4 * numpy.sin(3 * theta)[:, None] * numpy.cos(5 * phi)[None, :]
+              + random.normal(0, 0.01, (len(theta), len(phi))))
+    points = _sphericalGrid(theta, phi, radius)
+    nodeCoords, nodeIndices = _closeWithPoles(points, 10.0)
+
+    triangles = nodeIndices.reshape(-1, 3)[random.permutation(int(len(nodeIndices)/3))]
+    return BenchmarkMesh('scannedSurface', nodeCoords, triangles.reshape(-1), origin = (0.0, 0.0, 0.3), normal = (0.1, 0.2, 1.0))
+
+
+# Square plate, 100 wide and 1 thick, with a grid of square holes through it.  A third
+# of the cells in each direction are holes.  The plane cuts across the plate at an
+# angle to the rows of holes, so the section has many small loops.
+def perforatedPlate(triangleCount):
+    cells = max(int(math.sqrt(triangleCount / 4.5)), 3)
+    isSolid = numpy.ones((cells, cells), dtype = bool)
+    isSolid[1::3, 1::3] = False
+
+    # The nodes of the bottom and then the top of the plate.
+    x, y = numpy.meshgrid(numpy.linspace(0, 100, cells + 1), numpy.linspace(0, 100, cells + 1), indexing = 'ij')
+    bottom = numpy.stack((x, y, numpy.zeros_like(x)), axis = 2).reshape(-1, 3)
+    top = bottom + (0, 0, 1.0)
+    nodeCoords = numpy.concatenate((bottom, top)).reshape(-1)
+    topOffset = (cells + 1) * (cells + 1)
+
+    def node(i, j):
+        return i * (cells + 1) + j
+
+    # The faces of the solid cells on the bottom and top.
+    i, j = numpy.nonzero(isSolid)
+    faces = numpy.stack((node(i, j), node(i + 1, j), node(i + 1, j + 1), node(i, j + 1)), axis = 1)
+    quads = [faces, faces[:, ::-1] + topOffset]
+
+    # A wall for each cell edge that's between a solid cell and a hole or the outside.
+    padded = numpy.pad(isSolid, 1)
+    for di, dj in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+        neighborIsSolid = padded[1 + di:cells + 1 + di, 1 + dj:cells + 1 + dj]
+        i, j = numpy.nonzero(isSolid & ~neighborIsSolid)
+        if di == 1:
+            edge = (node(i + 1, j), node(i + 1, j + 1))
+        elif di == -1:
+            edge = (node(i, j + 1), node(i, j))
+        elif dj == 1:
+            edge = (node(i + 1, j + 1), node(i, j + 1))
+        else:
+            edge = (node(i, j), node(i + 1, j))
+        quads.append(numpy.stack((edge[0], edge[1], edge[1] + topOffset, edge[0] + topOffset), axis = 1))
+
+    nodeIndices = _splitQuads(numpy.concatenate(quads))
+    return BenchmarkMesh('perforatedPlate', nodeCoords, nodeIndices, origin = (50.0, 50.0, 0.5), normal = (0.3, 1.0, 0.0))
+
+
+# The functions that generate each kind of mesh, by name.
+generators = {'uvSphere': uvSphere, 'torus': torus, 'scannedSurface': scannedSurface, 'perforatedPlate': perforatedPlate}
+
+
+# Returns an (n, m, 3) array of points on a sphere for each theta and phi.  The radius
+# is a single value or an (n, m) array.
+def _sphericalGrid(theta, phi, radius):
+    theta = theta[:, None]
+    phi = phi[None, :]
+    return numpy.stack((radius * numpy.sin(theta) * numpy.cos(phi),
+                        radius * numpy.sin(theta) * numpy.sin(phi),
+                        radius * numpy.cos(theta) + 0 * phi), axis = 2)
+
+
+# Returns the coordinates and indices of a closed surface made from an (n, m, 3) grid
+# of points, where each row is a ring, and a node at each pole.
+def _closeWithPoles(points, radius):
+    rings, segments = points.shape[0], points.shape[1]
+    nodeCoords = numpy.concatenate((points.reshape(-1), (0.0, 0.0, radius, 0.0, 0.0, -radius)))
+    northPole = rings * segments
+    southPole = northPole + 1
+
+    column = numpy.arange(segments)
+    nextColumn = (column + 1) % segments
+    lastRing = (rings - 1) * segments
+    north = numpy.stack((numpy.full(segments, northPole), nextColumn, column), axis = 1)
+    south = numpy.stack((numpy.full(segments, southPole), lastRing + column, lastRing + nextColumn), axis = 1)
+
+    sides = _gridIndices(rings, segments, False, True).reshape(-1, 3)
+    return nodeCoords, numpy.concatenate((north, sides, south)).reshape(-1).astype(numpy.int64)
+
+
+# Returns the indices of the triangles of an n by m grid of nodes, which can be closed
+# in either direction.
+def _gridIndices(rows, columns, wrapRows, wrapColumns):
+    rowCount = rows if wrapRows else rows - 1
+    columnCount = columns if wrapColumns else columns - 1
+    i, j = numpy.meshgrid(numpy.arange(rowCount), numpy.arange(columnCount), indexing = 'ij')
+    nextI = (i + 1) % rows
+    nextJ = (j + 1) % columns
+    quads = numpy.stack((i * columns + j, nextI * columns + j, nextI * columns + nextJ, i * columns + nextJ), axis = 2)
+    return _splitQuads(quads.reshape(-1, 4))
+
+
+# Splits each quad of an (n, 4) array into two triangles and returns the flat indices.
+def _splitQuads(quads):
+    triangles = numpy.concatenate((quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]), axis = 1)
+    return triangles.reshape(-1).astype(numpy.int64)
@@ -0,0 +1,141 @@
+# Stand-in for a Fusion sketch that records the lines and arcs that are added to it,
+# and counts the calls made to it, so the code that draws section loops can be timed
+# and the calls it would make to Fusion counted without Fusion.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+class RecordingPoint:
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def isEqualTo(self, point):
+        return abs(self.x - point.x) < 0.000001 and abs(self.y - point.y) < 0.000001 and abs(self.z - point.z) < 0.000001
+
+
+# Counts of the calls made to the sketch and its objects, by name.  Reading a property
+# of a Fusion object is a call too, so the properties that are read are counted.
+class RecordingCalls:
+    def __init__(self):
+        self.counts = {}
+
+    def add(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def total(self):
+        return sum(self.counts.values())
+
+
+class RecordingSketchPoint:
+    def __init__(self, point, calls):
+        self._geometry = point
+        self._calls = calls
+
+    @property
+    def geometry(self):
+        self._calls.add('SketchPoint.geometry')
+        return self._geometry
+
+
+class RecordingSketchCurve:
+    def __init__(self, typeName, points, calls):
+        self.points = [point._geometry for point in points]
+        self._startSketchPoint = points[0]
+        self._endSketchPoint = points[-1]
+        self._typeName = typeName
+        self._calls = calls
+
+    @property
+    def startSketchPoint(self):
+        self._calls.add(self._typeName + '.startSketchPoint')
+        return self._startSketchPoint
+
+    @property
+    def endSketchPoint(self):
+        self._calls.add(self._typeName + '.endSketchPoint')
+        return self._endSketchPoint
+
+
+class RecordingSketchLines:
+    def __init__(self, sketch):
+        self._sketch = sketch
+
+    def addByTwoPoints(self, startPoint, endPoint):
+        self._sketch.calls.add('SketchLines.addByTwoPoints')
+        line = RecordingSketchCurve('SketchLine', [self._sketch.getSketchPoint(startPoint), self._sketch.getSketchPoint(endPoint)],
+                                    self._sketch.calls)
+        self._sketch.curves.append(('line', line))
+        return line
+
+
+class RecordingSketchArcs:
+    def __init__(self, sketch):
+        self._sketch = sketch
+
+    # Like Fusion, an arc is always counter-clockwise around the z axis, so the start
+    # and end of an arc through clockwise points are swapped.
+    def addByThreePoints(self, startPoint, midPoint, endPoint):
+        self._sketch.calls.add('SketchArcs.addByThreePoints')
+        startSketchPoint = self._sketch.getSketchPoint(startPoint)
+        endSketchPoint = self._sketch.getSketchPoint(endPoint)
+        start = startSketchPoint._geometry
+        end = endSketchPoint._geometry
+        if (midPoint.x - start.x) * (end.y - start.y) - (midPoint.y - start.y) * (end.x - start.x) < 0:
+            startSketchPoint, endSketchPoint = endSketchPoint, startSketchPoint
+        points = [startSketchPoint, RecordingSketchPoint(midPoint, self._sketch.calls), endSketchPoint]
+        arc = RecordingSketchCurve('SketchArc', points, self._sketch.calls)
+        self._sketch.curves.append(('arc', arc))
+        return arc
+
+
+class RecordingSketchCurves:
+    def __init__(self, sketch):
+        self.sketchLines = RecordingSketchLines(sketch)
+        self.sketchArcs = RecordingSketchArcs(sketch)
+
+
+# The sketch.  Each curve that's added is saved in the curves list as a tuple of its
+# type, 'line' or 'arc', and the curve, and each sketch point that's created for the
+# end of a curve is saved in the sketch points list.  A sketch point that's passed to
+# a curve is shared with it, like it is in Fusion.  createPoint is used in place of
+# adsk.core.Point3D.create so the points that are created are counted too.
+class RecordingSketch:
+    def __init__(self):
+        self.curves = []
+        self.sketchPoints = []
+        self.calls = RecordingCalls()
+        self._isComputeDeferred = False
+        self.sketchCurves = RecordingSketchCurves(self)
+
+    @property
+    def isComputeDeferred(self):
+        return self._isComputeDeferred
+
+    @isComputeDeferred.setter
+    def isComputeDeferred(self, value):
+        self.calls.add('Sketch.isComputeDeferred')
+        self._isComputeDeferred = value
+
+    def createPoint(self, x, y, z):
+        self.calls.add('Point3D.create')
+        return RecordingPoint(x, y, z)
+
+    def getSketchPoint(self, point):
+        if isinstance(point, RecordingSketchPoint):
+            return point
+        sketchPoint = RecordingSketchPoint(point, self.calls)
+        self.sketchPoints.append(sketchPoint)
+        return sketchPoint
+
+    def curveCount(self, curveType):
+        return sum(1 for curve in self.curves if curve[0] == curveType)
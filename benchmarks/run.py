@@ -0,0 +1,283 @@
+# Times each stage of computing and drawing a section for generated meshes of various
+# sizes and writes the results as JSON, so the results of different versions can be
+# compared.
+#
+#   python benchmarks/run.py --sizes 10000 100000 1000000 -o results.json
+#
+# The stages are timed separately, using the same functions the add-in uses, and the
+# peak memory allocated by each stage is measured in an additional run with
+# tracemalloc, so tracing doesn't affect the times.  drawLoops draws to a
+# RecordingSketch instead of a Fusion sketch, which counts the calls that would be
+# made to Fusion.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import os, sys
+import argparse
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+# Make the meshslicer package importable when this is run as a script.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy
+
+import meshes
+from recording import RecordingSketch
+from meshslicer.geometry import getWorldToPlaneMatrix
+from meshslicer import nesting, sketching, slicing, tracing
+
+
+stageNames = ['adjacency', 'transform', 'classify', 'createSectionLoops', 'optimizeLines', 'optimizeArcs', 'nestLoops', 'planLoops', 'drawLoops']
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmarks the stages of computing mesh sections.')
+    parser.add_argument('--meshes', nargs = '+', choices = sorted(meshes.generators), default = sorted(meshes.generators),
+                        help = 'kinds of mesh to benchmark')
+    parser.add_argument('--sizes', nargs = '+', type = int, default = [10000, 100000],
+                        help = 'approximate triangle counts of the meshes, from 10000 to 10000000')
+    parser.add_argument('--kernel', choices = ['vectorized', 'python'], default = 'vectorized',
+                        help = 'use the numpy kernels the add-in uses or the pure-Python reference kernels')
+    parser.add_argument('--reference-loops', action = 'store_true',
+                        help = 'use createSectionLoops instead of the hashed version the add-in uses')
+    parser.add_argument('--traced-loops', action = 'store_true',
+                        help = 'trace the loops across the edges of the triangles instead of creating them from lines, '
+                               'in which case the kernel isn\'t used')
+    parser.add_argument('--simplify', type = float, default = 0, metavar = 'TOLERANCE',
+                        help = 'simplify the loops to within the tolerance in the optimizeLines stage, instead of only '
+                               'removing colinear points')
+    parser.add_argument('--arc-tolerance', type = float, default = 0.001, metavar = 'TOLERANCE',
+                        help = 'how far the points of a loop can be from an arc that replaces them')
+    parser.add_argument('--min-arc-points', type = int, default = 6, metavar = 'N',
+                        help = 'fewest points of a loop that can be replaced with an arc')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'number of timed runs of each mesh')
+    parser.add_argument('--no-memory', action = 'store_true', help = 'skip the run that measures memory')
+    parser.add_argument('--label', default = '', help = 'label saved with the results, like a version or commit')
+    parser.add_argument('-o', '--output', help = 'JSON file to write, instead of writing to the standard output')
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.meshes:
+        for size in args.sizes:
+            mesh = meshes.generators[name](size)
+            print('{} {} triangles'.format(mesh.name, mesh.triangleCount()), file = sys.stderr)
+            results.append(benchmarkMesh(mesh, args))
+
+    report = {'label': args.label,
+              'python': platform.python_version(),
+              'numpy': numpy.__version__,
+              'platform': platform.platform(),
+              'kernel': args.kernel,
+              'referenceLoops': args.reference_loops,
+              'tracedLoops': args.traced_loops,
+              'simplify': args.simplify,
+              'arcTolerance': args.arc_tolerance,
+              'minArcPoints': args.min_arc_points,
+              'repeat': args.repeat,
+              'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 1)
+    else:
+        json.dump(report, sys.stdout, indent = 1)
+        print()
+
+    return 0
+
+
+# Runs the pipeline for the mesh and returns a dictionary with the timing and memory
+# of each stage.
+def benchmarkMesh(mesh, args):
+    if args.kernel == 'python':
+        nodeCoords = mesh.nodeCoords.tolist()
+        nodeIndices = mesh.nodeIndices.tolist()
+    else:
+        nodeCoords = mesh.nodeCoords
+        nodeIndices = mesh.nodeIndices
+
+    timings = []
+    for i in range(0, args.repeat):
+        timer = StageTimer(False)
+        counts = runPipeline(mesh, nodeCoords, nodeIndices, args, timer)
+        timings.append(timer)
+
+    memory = None
+    if not args.no_memory:
+        memory = StageTimer(True)
+        tracemalloc.start()
+        try:
+            runPipeline(mesh, nodeCoords, nodeIndices, args, memory)
+        finally:
+            tracemalloc.stop()
+
+    stages = {}
+    for name in stageNames:
+        times = [timer.seconds[name] for timer in timings if name in timer.seconds]
+        stage = {}
+        if times:
+            stage['seconds'] = min(times)
+            stage['medianSeconds'] = statistics.median(times)
+            stage['items'] = timings[0].items[name]
+            if stage['seconds'] > 0:
+                stage['itemsPerSecond'] = stage['items'] / stage['seconds']
+        if memory and name in memory.peakBytes:
+            stage['peakBytes'] = memory.peakBytes[name]
+        if name in timings[0].errors:
+            stage['error'] = timings[0].errors[name]
+        stages[name] = stage
+
+    return {'mesh': mesh.name,
+            'triangles': mesh.triangleCount(),
+            'nodes': mesh.nodeCount(),
+            'counts': counts,
+            'stages': stages}
+
+
+# Runs each stage for the mesh, using the timer to run and measure them, and returns
+# a dictionary with the number of things each stage produced.  The items of a stage
+# are what its throughput is measured in: nodes for the transform, triangles for the
+# adjacency and the classification, segments for the loops, and points for the rest.
+def runPipeline(mesh, nodeCoords, nodeIndices, args, timer):
+    counts = {}
+    matrix = getWorldToPlaneMatrix(mesh.origin, mesh.normal)
+
+    if args.traced_loops:
+        loops = _traceLoops(mesh, nodeCoords, nodeIndices, matrix, timer, counts)
+    else:
+        loops = _createLoops(mesh, nodeCoords, nodeIndices, matrix, args, timer, counts)
+    if loops is None:
+        return counts
+    counts['loops'] = len(loops)
+    counts['closedLoops'] = sum(1 for loop in loops if loop.isClosed)
+    counts['points'] = _pointCount(loops)
+
+    if args.simplify > 0:
+        timer.run('optimizeLines', counts['points'], _optimizeLoops, loops, 'simplify', args.simplify)
+    else:
+        timer.run('optimizeLines', counts['points'], _optimizeLoops, loops, 'optimizeLines')
+    counts['pointsAfterOptimizeLines'] = _pointCount(loops)
+
+    timer.run('optimizeArcs', counts['pointsAfterOptimizeLines'], _optimizeLoops, loops, 'optimizeArcs',
+              None, args.arc_tolerance, args.min_arc_points)
+    counts['pointsAfterOptimizeArcs'] = _pointCount(loops)
+
+    # The loops are nested after the arcs are fitted, so a section whose loops are
+    # nested wrongly because of its arcs, like a torus with a hole at depth 0, shows
+    # up in the counts.
+    timer.run('nestLoops', counts['pointsAfterOptimizeArcs'], nesting.nestLoops, loops)
+    counts['outerLoops'] = sum(1 for loop in loops if getattr(loop, 'depth', None) == 0)
+    counts['holes'] = sum(1 for loop in loops if getattr(loop, 'depth', None) is not None and loop.depth % 2 == 1)
+
+    plan = timer.run('planLoops', counts['pointsAfterOptimizeArcs'], sketching.planLoops, loops)
+    if plan is None:
+        return counts
+
+    sketch = RecordingSketch()
+    timer.run('drawLoops', counts['pointsAfterOptimizeArcs'], sketching.drawPlan, sketch, plan, sketch.createPoint)
+    counts['sketchLines'] = sketch.curveCount('line')
+    counts['sketchArcs'] = sketch.curveCount('arc')
+    counts['sketchPoints'] = len(sketch.sketchPoints)
+    counts['sketchCalls'] = sketch.calls.total()
+    counts['sketchCallsByName'] = dict(sketch.calls.counts)
+
+    return counts
+
+
+# Runs the stages that slice the mesh and create the loops from the lines, and
+# returns the loops, or None if a stage failed.
+def _createLoops(mesh, nodeCoords, nodeIndices, matrix, args, timer, counts):
+    if args.kernel == 'python':
+        distances = timer.run('transform', mesh.nodeCount(), slicing.calculatePlaneDistances, nodeCoords, matrix)
+        stackSegments = timer.run('classify', mesh.triangleCount(), slicing.calculatePlaneSegments,
+                                  nodeCoords, nodeIndices, matrix, 0, 1, distances)
+    else:
+        distances = timer.run('transform', mesh.nodeCount(), slicing.calculatePlaneDistancesVectorized, nodeCoords.reshape(-1, 3), matrix)
+        stackSegments = timer.run('classify', mesh.triangleCount(), slicing.calculatePlaneSegmentsVectorized,
+                                  nodeCoords, nodeIndices, matrix, 0, 1, distances)
+    if not stackSegments:
+        return None
+    segments = stackSegments[0]
+    counts['segments'] = int(len(segments)/6)
+    if args.reference_loops:
+        return timer.run('createSectionLoops', counts['segments'], slicing.createSectionLoops, slicing.getSegmentLines(segments),
+                         False, False)
+    return timer.run('createSectionLoops', counts['segments'], slicing.createSectionLoopsFromSegments, segments, False, False)
+
+
+# Runs the stages that find the triangles that cross the plane and trace the loops
+# across their edges, and returns the loops, or None if a stage failed.
+def _traceLoops(mesh, nodeCoords, nodeIndices, matrix, timer, counts):
+    adjacency = timer.run('adjacency', mesh.triangleCount(), slicing.buildTriangleAdjacency, nodeIndices)
+    if isinstance(nodeCoords, list):
+        distances = timer.run('transform', mesh.nodeCount(), slicing.calculatePlaneDistances, nodeCoords, matrix)
+    else:
+        distances = timer.run('transform', mesh.nodeCount(), slicing.calculatePlaneDistancesVectorized, nodeCoords.reshape(-1, 3), matrix)
+    if adjacency is None or distances is None:
+        return None
+
+    stackTriangles = timer.run('classify', mesh.triangleCount(), tracing.getStackCrossingTriangles, nodeIndices, distances, 0, 1)
+    if stackTriangles is None or len(stackTriangles[0]) == 0:
+        return None
+    counts['segments'] = len(stackTriangles[0])
+    return timer.run('createSectionLoops', counts['segments'], tracing.traceSectionLoops, nodeCoords, nodeIndices, adjacency, matrix,
+                     distances, 0, stackTriangles[0])
+
+
+# Runs the stages and saves the time or the peak memory of each.  A stage that fails
+# has its error saved and returns None.
+class StageTimer:
+    def __init__(self, traceMemory):
+        self.traceMemory = traceMemory
+        self.seconds = {}
+        self.items = {}
+        self.peakBytes = {}
+        self.errors = {}
+
+    def run(self, name, items, function, *args):
+        if self.traceMemory:
+            tracemalloc.reset_peak()
+            startBytes = tracemalloc.get_traced_memory()[0]
+
+        startTime = time.perf_counter()
+        try:
+            result = function(*args)
+        except Exception as err:
+            self.errors[name] = '{}: {}'.format(type(err).__name__, err)
+            return None
+        seconds = time.perf_counter() - startTime
+
+        if self.traceMemory:
+            self.peakBytes[name] = tracemalloc.get_traced_memory()[1] - startBytes
+        else:
+            self.seconds[name] = seconds
+            self.items[name] = items
+        return result
+
+
+# Optimizes each of the loops the same way createSectionLoops does.
+def _optimizeLoops(loops, methodName, *args):
+    for loop in loops:
+        if loop.pointCount() > 2:
+            getattr(loop, methodName)(*args)
+
+
+def _pointCount(loops):
+    return sum(loop.pointCount() for loop in loops)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
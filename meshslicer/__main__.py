@@ -0,0 +1,261 @@
+# Command line interface to compute the sections of mesh files without Fusion.
+#
+#   python -m meshslicer part.stl --plane 0 0 1 0 0 1 -o part.json
+#   python -m meshslicer scans/*.ply --stack 0 0 0 0 0 1 0.5 40 -o sections/
+#
+# The sections of each mesh are written as a JSON file that contains the polylines
+# of each plane in world coordinates.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import os, sys
+import argparse
+import json
+
+from .geometry import getWorldToPlaneMatrix
+from .diskcache import MeshDiskCache, getCachedArrays, getMeshKey
+from .exporting import openSectionWriter, writeStackSections
+from .instrumentation import SectionStats
+from .meshio import readMesh, readStlChunks
+from .nesting import nestLoops
+from .slicing import buildTriangleAdjacency, calculateSections, calculateStreamedSections
+from .tracing import calculateTracedSections
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = 'python -m meshslicer',
+                                     description = 'Computes the sections of STL, OBJ, and PLY meshes with planes.')
+    parser.add_argument('meshes', nargs = '+', metavar = 'MESH', help = 'mesh file to section')
+    parser.add_argument('-o', '--output', required = True,
+                        help = 'file to write, or an existing folder to write a file per mesh to')
+    parser.add_argument('--export', choices = ('dxf', 'svg', 'csv'),
+                        help = 'write the lines and arcs of the sections, in the coordinate system of each plane, to a '
+                               'DXF, SVG, or CSV file as they\'re computed instead of writing JSON')
+    parser.add_argument('--plane', nargs = 6, type = float, action = 'append', default = [],
+                        metavar = ('X', 'Y', 'Z', 'NX', 'NY', 'NZ'), help = 'plane defined by an origin and normal')
+    parser.add_argument('--stack', nargs = 8, type = float, action = 'append', default = [],
+                        metavar = ('X', 'Y', 'Z', 'NX', 'NY', 'NZ', 'SPACING', 'COUNT'),
+                        help = 'stack of COUNT planes offset by SPACING along the normal')
+    parser.add_argument('--combine-lines', action = 'store_true', help = 'replace connected colinear lines with a single line')
+    parser.add_argument('--simplify', type = float, default = 0, metavar = 'TOLERANCE',
+                        help = 'replace connected lines with fewer lines that are within TOLERANCE of them')
+    parser.add_argument('--unconnected', action = 'store_true', help = 'write each intersection line separately')
+    parser.add_argument('--trace', action = 'store_true',
+                        help = 'connect the lines by tracing them across the edges shared by the triangles instead of '
+                               'matching their end points')
+    parser.add_argument('--cache', metavar = 'FOLDER',
+                        help = 'save the adjacency of the traced meshes in FOLDER so it\'s only computed once for each mesh')
+    parser.add_argument('--nest', action = 'store_true',
+                        help = 'write the depth and parent of each closed polyline, and make the outer boundaries '
+                               'counterclockwise and the holes clockwise about the normal')
+    parser.add_argument('--plane-coordinates', action = 'store_true',
+                        help = 'write the points in the coordinate system of each plane instead of world coordinates')
+    parser.add_argument('--processes', type = int, default = 0, metavar = 'N',
+                        help = 'compute the sections in a pool of N processes')
+    parser.add_argument('--stream', action = 'store_true',
+                        help = 'read binary STL files in chunks from a memory map instead of loading them')
+    parser.add_argument('--stats', action = 'store_true',
+                        help = 'include the time of each stage and counts of the work done in the output')
+    args = parser.parse_args(argv)
+
+    planes = []
+    for plane in args.plane:
+        planes.append((plane[0:3], plane[3:6], 0, 1))
+    for stack in args.stack:
+        if stack[7] < 1 or stack[7] != int(stack[7]):
+            parser.error('The COUNT of a stack must be a positive integer.')
+        if stack[6] == 0 and stack[7] > 1:
+            parser.error('The SPACING of a stack of more than one plane can\'t be 0.')
+        planes.append((stack[0:3], stack[3:6], stack[6], int(stack[7])))
+    if not planes:
+        parser.error('At least one --plane or --stack is required.')
+
+    if args.simplify < 0:
+        parser.error('The --simplify TOLERANCE can\'t be negative.')
+    if args.stream and args.processes > 0:
+        parser.error('--stream can\'t be used with --processes.')
+    if args.trace and (args.stream or args.unconnected):
+        parser.error('--trace can\'t be used with --stream or --unconnected.')
+    if args.export and (args.processes > 0 or args.stats):
+        parser.error('--export can\'t be used with --processes or --stats.')
+    if args.nest and args.unconnected:
+        parser.error('--nest can\'t be used with --unconnected.')
+    if len(args.meshes) > 1 and not os.path.isdir(args.output):
+        parser.error('The output must be an existing folder when more than one mesh is sectioned.')
+
+    try:
+        if args.export:
+            exportMeshes(args, planes)
+        elif args.processes > 0:
+            from .parallel import SectionJobPool
+            with SectionJobPool(args.processes) as pool:
+                sectionMeshes(args, planes, pool)
+        else:
+            sectionMeshes(args, planes, None)
+    except (OSError, ValueError) as err:
+        print('meshslicer: ' + str(err), file = sys.stderr)
+        return 1
+
+    return 0
+
+
+# Computes the sections of each of the meshes and writes them to the output.  When
+# a pool is given all of the meshes are submitted before any of the results are
+# written so the processes are kept busy.
+def sectionMeshes(args, planes, pool):
+    diskCache = MeshDiskCache(args.cache) if args.cache else None
+    results = []
+    for meshFile in args.meshes:
+        stats = SectionStats()
+
+        mesh = readMeshData(args, meshFile, diskCache, stats)
+
+        planeResults = []
+        if pool:
+            sharedMesh = pool.publishMesh(meshFile, mesh[0], mesh[1], mesh[2])
+        for origin, normal, spacing, count in planes:
+            worldToPlane = getWorldToPlaneMatrix(origin, normal)
+            if pool:
+                stackLoops = pool.submit(sharedMesh, worldToPlane, spacing, count, not args.unconnected,
+                                         args.combine_lines or args.simplify > 0, False, args.simplify)
+            else:
+                stackLoops = calculateMeshSections(args, meshFile, mesh, worldToPlane, spacing, count, stats)
+            planeResults.append((worldToPlane, spacing, stackLoops))
+
+        results.append((meshFile, planeResults, stats))
+
+    for meshFile, planeResults, stats in results:
+        sections = []
+        for worldToPlane, spacing, stackLoops in planeResults:
+            if pool:
+                stackLoops, jobStats = stackLoops.result()
+                stats.add(jobStats)
+
+            planeToWorld = worldToPlane.copy()
+            planeToWorld.invert()
+            for i in range(0, len(stackLoops)):
+                sections.append(getSectionData(planeToWorld, spacing * i, stackLoops[i], args.plane_coordinates,
+                                               args.nest, stats))
+
+        if os.path.isdir(args.output):
+            outputFile = os.path.join(args.output, os.path.splitext(os.path.basename(meshFile))[0] + '.json')
+        else:
+            outputFile = args.output
+
+        meshData = {'mesh': meshFile, 'sections': sections}
+        if args.stats:
+            meshData['stats'] = stats.asDict()
+
+        with open(outputFile, 'w') as f:
+            json.dump(meshData, f)
+
+
+# Computes the sections of each of the meshes and writes them to the output file of
+# the export format as each batch of planes is finished, so only the sections of one
+# batch are kept.  The sections of all of the planes and stacks of a mesh are written
+# to the same file, numbered in order.
+def exportMeshes(args, planes):
+    diskCache = MeshDiskCache(args.cache) if args.cache else None
+    for meshFile in args.meshes:
+        stats = SectionStats()
+        mesh = readMeshData(args, meshFile, diskCache, stats)
+
+        if os.path.isdir(args.output):
+            outputFile = os.path.join(args.output, os.path.splitext(os.path.basename(meshFile))[0] + '.' + args.export)
+        else:
+            outputFile = args.output
+
+        def calculateStack(matrix, spacing, count):
+            stackLoops = calculateMeshSections(args, meshFile, mesh, matrix, spacing, count, stats)
+            if args.nest:
+                for loops in stackLoops:
+                    nestLoops(loops or [], True, stats)
+            return stackLoops
+
+        with openSectionWriter(outputFile) as writer:
+            for origin, normal, spacing, count in planes:
+                writeStackSections(writer, calculateStack, getWorldToPlaneMatrix(origin, normal), 0, spacing, count,
+                                   writer.sectionCount)
+
+
+# Returns a tuple of the coordinates, indices, and for --trace the adjacency of the
+# triangles of the mesh file, or None when the mesh is streamed.  A streamed mesh is
+# read again for each stack of planes, which is mostly from the operating system's
+# cache after the first time.
+def readMeshData(args, meshFile, diskCache, stats):
+    if args.stream and meshFile.lower().endswith('.stl'):
+        return None
+
+    with stats.timeStage('readMesh'):
+        nodeCoords, nodeIndices = readMesh(meshFile)
+    adjacency = None
+    if args.trace:
+        with stats.timeStage('adjacency'):
+            meshKey = getMeshKey(nodeCoords, nodeIndices) if diskCache else None
+            adjacency = getCachedArrays(diskCache, meshKey, [('adjacency', 'q')],
+                                        lambda: [buildTriangleAdjacency(nodeIndices)])[0]
+    return nodeCoords, nodeIndices, adjacency
+
+
+# Returns the loops of each plane of a stack where it crosses the mesh data from
+# readMeshData, computed with the options in the arguments.
+def calculateMeshSections(args, meshFile, mesh, worldToPlane, spacing, count, stats):
+    optimizeLines = args.combine_lines or args.simplify > 0
+    if mesh is None:
+        return calculateStreamedSections(readStlChunks(meshFile), worldToPlane, spacing, count,
+                                         not args.unconnected, optimizeLines, False, stats,
+                                         simplifyTolerance = args.simplify)
+
+    nodeCoords, nodeIndices, adjacency = mesh
+    if args.trace:
+        return calculateTracedSections(nodeCoords, nodeIndices, adjacency, worldToPlane, spacing, count,
+                                       optimizeLines, False, stats = stats, simplifyTolerance = args.simplify)
+    else:
+        return calculateSections(nodeCoords, nodeIndices, worldToPlane, spacing, count,
+                                 not args.unconnected, optimizeLines, False, stats,
+                                 simplifyTolerance = args.simplify)
+
+
+# Returns a dictionary that describes the plane at the offset and its section
+# polylines.  An unconnected loop is written as a separate polyline for each line.
+# When nest is True the loops are nested before they're moved out of the plane, and
+# each closed polyline has its depth and the index of its parent polyline, or None
+# for an outer boundary.
+def getSectionData(planeToWorld, offset, loops, usePlaneCoordinates, nest = False, stats = None):
+    if nest:
+        nestLoops(loops or [], True, stats)
+        indices = {id(loops[i]): i for i in range(0, len(loops or []))}
+
+    polylines = []
+    for loop in loops or []:
+        if not usePlaneCoordinates:
+            loop.transformBy(planeToWorld)
+
+        points = [[point.x, point.y, point.z] for point in loop.points]
+        if nest:
+            polylines.append({'closed': loop.isClosed, 'points': points, 'depth': loop.depth,
+                              'parent': None if loop.parent is None else indices[id(loop.parent)]})
+        elif loop.isConnected:
+            polylines.append({'closed': loop.isClosed, 'points': points})
+        else:
+            for i in range(0, len(points) - 1, 2):
+                polylines.append({'closed': False, 'points': points[i:i+2]})
+
+    origin = planeToWorld.translation()
+    normal = [planeToWorld.getCell(3, 1), planeToWorld.getCell(3, 2), planeToWorld.getCell(3, 3)]
+    return {'origin': [origin.x + normal[0] * offset, origin.y + normal[1] * offset, origin.z + normal[2] * offset],
+            'normal': normal,
+            'polylines': polylines}
+
+
+if __name__ == '__main__':
+    sys.exit(main())
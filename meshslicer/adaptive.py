@@ -0,0 +1,113 @@
+# Functions to place the planes of a stack where the sections of a mesh change the
+# most, instead of evenly, so a few planes capture the features of the mesh that
+# many evenly spaced planes would.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import heapq
+
+from .instrumentation import progressPart, timeStage
+from .slicing import calculateSections
+
+
+# Returns the offsets, from the x-y plane of the matrix along its z axis, of at most
+# maxCount planes between 0 and the extent where the sections of the mesh change the
+# most.  The mesh is first swept with sampleCount evenly spaced planes, which is
+# cheap when it's done with a decimated copy of the mesh, and the planes are then
+# chosen from those by getAdaptiveOffsets.  By default there are four samples for
+# each plane, and at least 100.
+def calculateAdaptiveOffsets(nodeCoords, nodeIndices, matrix, extent, maxCount, sampleCount = None, tolerance = 0.01,
+                             stats = None, progress = None):
+    if sampleCount is None:
+        sampleCount = max(4 * maxCount, 100)
+
+    spacing = extent / (sampleCount - 1)
+    measures = calculateSectionMeasures(nodeCoords, nodeIndices, matrix, spacing, sampleCount, stats, progress)
+    return getAdaptiveOffsets(measures, spacing, maxCount, tolerance)
+
+
+# Returns a list with a tuple of the number of loops, the area, and the length of the
+# section of each plane of a stack, from getSectionMeasures.  The spacing and count
+# of the stack are the same as for slicing.calculateSections.
+def calculateSectionMeasures(nodeCoords, nodeIndices, matrix, spacing, count, stats = None, progress = None):
+    with progressPart(progress, 0, 0.9):
+        stackLoops = calculateSections(nodeCoords, nodeIndices, matrix, spacing, count, True, False, False, stats,
+                                       progress = progress)
+
+    with timeStage(stats, 'measure'):
+        return [getSectionMeasures(loops) for loops in stackLoops]
+
+
+# Returns a tuple of the number of loops of a section, the area enclosed by its
+# closed loops, and the total length of its loops.  The area of each loop is added
+# whatever its direction, so it measures the size of the section rather than its
+# solid area.
+def getSectionMeasures(loops):
+    area = 0
+    length = 0
+    for loop in loops or []:
+        if loop.isClosed:
+            area += abs(loop.area())
+        length += loop.length()
+    return (len(loops or []), area, length)
+
+
+# Returns the offsets of at most maxCount of the evenly spaced planes the measures
+# are for where the sections change the most.  Each measure is scaled by its largest
+# value so they count the same.  The first and last planes are always used, and a
+# plane is added at a time where the measures are the farthest from the values
+# interpolated between the planes on either side of it, which places the planes at
+# the changes in the number of loops and where the area and length curve the most.
+# Planes are no longer added once the measures are within the tolerance, a fraction
+# of their largest values, of the interpolated values, so a mesh with sections that
+# don't change gets just the first and last plane.
+def getAdaptiveOffsets(measures, spacing, maxCount, tolerance = 0.01):
+    count = len(measures)
+    if count <= maxCount:
+        return [spacing * i for i in range(0, count)]
+    elif maxCount < 2:
+        return [0]
+
+    profiles = []
+    for j in range(0, 3):
+        values = [measure[j] for measure in measures]
+        scale = max(abs(value) for value in values)
+        if scale > 0:
+            profiles.append([value / scale for value in values])
+
+    # Returns a tuple for the heap of the negated largest error between the first and
+    # last plane, the index of the plane it's at, and the first and last plane.
+    def getSplit(first, last):
+        maxError = 0
+        maxIndex = -1
+        for i in range(first + 1, last):
+            fraction = (i - first) / (last - first)
+            for profile in profiles:
+                error = abs(profile[i] - (profile[first] + (profile[last] - profile[first]) * fraction))
+                if error > maxError:
+                    maxError = error
+                    maxIndex = i
+        return (-maxError, maxIndex, first, last)
+
+    planes = [0, count - 1]
+    splits = [getSplit(0, count - 1)]
+    while len(planes) < maxCount and splits:
+        error, index, first, last = heapq.heappop(splits)
+        if -error <= tolerance:
+            break
+
+        planes.append(index)
+        heapq.heappush(splits, getSplit(first, index))
+        heapq.heappush(splits, getSplit(index, last))
+
+    planes.sort()
+    return [spacing * i for i in planes]
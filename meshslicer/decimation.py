@@ -0,0 +1,111 @@
+# Function to make a coarse copy of a triangle mesh, used to quickly preview the
+# sections of large meshes.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Returns a tuple with the node coordinates and node indices of a copy of the mesh
+# with about the number of triangles, or the mesh itself if it doesn't have more
+# triangles than that.  The nodes are clustered on a grid whose cells are sized so a
+# surface of the same area has about that many triangles, and the nodes in each cell
+# are replaced by a node at their average.  The triangles that have two corners in
+# the same cell are removed.  This doesn't keep the shape of features smaller than a
+# cell but it's fast, and the sections it gives are close enough to preview.
+def decimateMesh(nodeCoords, nodeIndices, triangleCount):
+    if len(nodeIndices) <= triangleCount * 3:
+        return nodeCoords, nodeIndices
+
+    if numpy:
+        coords = numpy.asarray(nodeCoords, dtype = numpy.float64).reshape(-1, 3)
+        triangles = numpy.asarray(nodeIndices, dtype = numpy.int64).reshape(-1, 3)
+
+        corners = coords[triangles]
+        area = numpy.sqrt((numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]) ** 2).sum(axis = 1)).sum() / 2
+        cellSize = _getCellSize(area, triangleCount)
+        if cellSize == 0:
+            return nodeCoords, nodeIndices
+
+        # Number the cells and give each node the index of the cluster of its cell.
+        cells = numpy.floor((coords - coords.min(axis = 0)) / cellSize).astype(numpy.int64)
+        cellCounts = cells.max(axis = 0) + 1
+        cellKeys = (cells[:, 0] * cellCounts[1] + cells[:, 1]) * cellCounts[2] + cells[:, 2]
+        cellKeys, nodeClusters = numpy.unique(cellKeys, return_inverse = True)
+        nodeClusters = nodeClusters.reshape(-1)
+
+        clusterSizes = numpy.bincount(nodeClusters, minlength = len(cellKeys))
+        clusterCoords = numpy.empty((len(cellKeys), 3))
+        for axis in range(0, 3):
+            clusterCoords[:, axis] = numpy.bincount(nodeClusters, weights = coords[:, axis], minlength = len(cellKeys)) / clusterSizes
+
+        clusterTriangles = nodeClusters[triangles]
+        isKept = ((clusterTriangles[:, 0] != clusterTriangles[:, 1]) & (clusterTriangles[:, 1] != clusterTriangles[:, 2]) &
+                  (clusterTriangles[:, 2] != clusterTriangles[:, 0]))
+        return clusterCoords.reshape(-1), clusterTriangles[isKept].reshape(-1)
+    else:
+        area = 0
+        for i in range(0, int(len(nodeIndices)/3)):
+            a = nodeIndices[i*3] * 3
+            b = nodeIndices[i*3+1] * 3
+            c = nodeIndices[i*3+2] * 3
+            u = [nodeCoords[b+j] - nodeCoords[a+j] for j in range(0, 3)]
+            v = [nodeCoords[c+j] - nodeCoords[a+j] for j in range(0, 3)]
+            area += math.sqrt((u[1] * v[2] - u[2] * v[1]) ** 2 + (u[2] * v[0] - u[0] * v[2]) ** 2 +
+                              (u[0] * v[1] - u[1] * v[0]) ** 2) / 2
+        cellSize = _getCellSize(area, triangleCount)
+        if cellSize == 0:
+            return nodeCoords, nodeIndices
+
+        minCoords = [min(nodeCoords[j::3]) for j in range(0, 3)]
+        clusters = {}
+        clusterSums = []
+        nodeClusters = []
+        for i in range(0, int(len(nodeCoords)/3)):
+            point = nodeCoords[i*3:i*3+3]
+            key = tuple(math.floor((point[j] - minCoords[j]) / cellSize) for j in range(0, 3))
+            cluster = clusters.get(key)
+            if cluster is None:
+                cluster = len(clusterSums)
+                clusters[key] = cluster
+                clusterSums.append([0.0, 0.0, 0.0, 0])
+            sums = clusterSums[cluster]
+            sums[0] += point[0]
+            sums[1] += point[1]
+            sums[2] += point[2]
+            sums[3] += 1
+            nodeClusters.append(cluster)
+
+        clusterCoords = []
+        for sums in clusterSums:
+            clusterCoords.extend((sums[0] / sums[3], sums[1] / sums[3], sums[2] / sums[3]))
+
+        clusterIndices = []
+        for i in range(0, int(len(nodeIndices)/3)):
+            a = nodeClusters[nodeIndices[i*3]]
+            b = nodeClusters[nodeIndices[i*3+1]]
+            c = nodeClusters[nodeIndices[i*3+2]]
+            if a != b and b != c and c != a:
+                clusterIndices.extend((a, b, c))
+        return clusterCoords, clusterIndices
+
+
+# Returns the size of the grid cells that give about the number of triangles for a
+# surface with the area.  A cell that the surface passes through has a node, and the
+# nodes of a surface are connected by about twice as many triangles.
+def _getCellSize(area, triangleCount):
+    return math.sqrt(2 * area / triangleCount)
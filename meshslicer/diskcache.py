@@ -0,0 +1,187 @@
+# Cache in a folder of the data derived from meshes that's slow to compute for large
+# meshes, like the adjacency of the triangles, so it's only computed once for a mesh
+# and not again each time the mesh is loaded.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import os, sys
+import array
+import hashlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# The version of the cached data, which is part of every key.  It must be changed
+# whenever the functions that compute the cached data change what they return, so the
+# data cached by earlier versions isn't used.
+cacheVersion = 2
+
+# The numpy types of the array typecodes the data is saved with.  The data is always
+# saved little endian.
+if numpy:
+    _numpyTypes = {'d': numpy.dtype('<f8'), 'q': numpy.dtype('<i8')}
+
+
+# Returns a key that identifies the mesh by the contents of its coordinates and
+# indices and the version of the cached data.
+def getMeshKey(nodeCoords, nodeIndices):
+    digest = hashlib.blake2b(digest_size = 20)
+    digest.update(('meshslicer ' + str(cacheVersion) + ' ' + str(len(nodeCoords)) + ' ' + str(len(nodeIndices))).encode('ascii'))
+    digest.update(_getBytes(nodeCoords, 'd'))
+    digest.update(_getBytes(nodeIndices, 'q'))
+    return digest.hexdigest()
+
+
+# Returns a name for data that depends on a MyMatrix as well as on the mesh.
+def getMatrixName(name, matrix):
+    return name + '-' + hashlib.blake2b(_getBytes(matrix._data, 'd'), digest_size = 8).hexdigest()
+
+
+# Cache of arrays in a folder, where each array is saved as a file of the raw little
+# endian values so it can be memory mapped.  The least recently used files are removed
+# when the size of the files goes over the maximum.
+class MeshDiskCache:
+    def __init__(self, folder, maxBytes = 4 * 1024 * 1024 * 1024):
+        self.folder = folder
+        self.maxBytes = maxBytes
+
+    # Returns the array with the name and typecode that was saved for the key, or None
+    # if there isn't one.  With numpy it's a read only array that's memory mapped from
+    # the file, otherwise it's an array.array.
+    def load(self, key, name, typecode):
+        path = self._getPath(key, name, typecode)
+        try:
+            if numpy:
+                if os.path.getsize(path) == 0:
+                    data = numpy.zeros(0, dtype = _numpyTypes[typecode])
+                else:
+                    data = numpy.memmap(path, dtype = _numpyTypes[typecode], mode = 'r')
+            else:
+                data = array.array(typecode)
+                with open(path, 'rb') as f:
+                    data.frombytes(f.read())
+                if sys.byteorder == 'big':
+                    data.byteswap()
+
+            # Mark the file as used so it's kept over the files that weren't.
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        return data
+
+    # Saves the array with the name and typecode for the key.  The file is written under
+    # a temporary name and then renamed, so a partly written file is never loaded.
+    # Failing to write the cache isn't an error, since the data can be computed again.
+    def save(self, key, name, data, typecode):
+        path = self._getPath(key, name, typecode)
+        tempPath = path + '.' + str(os.getpid()) + '.tmp'
+        try:
+            os.makedirs(self.folder, exist_ok = True)
+            with open(tempPath, 'wb') as f:
+                f.write(_getBytes(data, typecode))
+            os.replace(tempPath, path)
+        except OSError:
+            try:
+                os.remove(tempPath)
+            except OSError:
+                pass
+            return
+
+        self.trim()
+
+    # Returns the arrays with the names and typecodes of the list of (name, typecode)
+    # tuples for the key.  If any of them aren't in the cache, the build function is
+    # called to compute all of them and they're saved.
+    def getArrays(self, key, names, build):
+        arrays = [self.load(key, name, typecode) for name, typecode in names]
+        if all(data is not None for data in arrays):
+            return arrays
+
+        arrays = build()
+        for i in range(0, len(names)):
+            self.save(key, names[i][0], arrays[i], names[i][1])
+        return arrays
+
+    # Returns the total size in bytes of the files in the cache.
+    def byteSize(self):
+        return sum(size for path, size, time in self._getFiles())
+
+    # Removes the least recently used files until the cache is within its maximum size.
+    # Files that can't be removed, like those that are still mapped on Windows, are
+    # skipped.
+    def trim(self):
+        files = sorted(self._getFiles(), key = lambda file: file[2])
+        size = sum(file[1] for file in files)
+        for path, fileSize, time in files:
+            if size <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+                size -= fileSize
+            except OSError:
+                pass
+
+    # Removes all of the files in the cache that can be removed.
+    def clear(self):
+        for path, size, time in self._getFiles():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Returns a list with a tuple of the path, size, and modification time of each of
+    # the files in the cache.
+    def _getFiles(self):
+        files = []
+        try:
+            entries = list(os.scandir(self.folder))
+        except OSError:
+            return files
+
+        for entry in entries:
+            if entry.name.endswith(('.d', '.q')):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _getPath(self, key, name, typecode):
+        return os.path.join(self.folder, key + '-' + name + '.' + typecode)
+
+
+# Returns the arrays from the disk cache the same way as MeshDiskCache.getArrays, or
+# just calls the build function when the disk cache is None.
+def getCachedArrays(diskCache, key, names, build):
+    if diskCache is None:
+        return build()
+    else:
+        return diskCache.getArrays(key, names, build)
+
+
+# Returns the little endian bytes of the values of a numpy array, array.array, or
+# list as the type of the typecode.
+def _getBytes(data, typecode):
+    if numpy and isinstance(data, numpy.ndarray):
+        return numpy.ascontiguousarray(data, dtype = _numpyTypes[typecode]).tobytes()
+
+    if not (isinstance(data, array.array) and data.typecode == typecode):
+        data = array.array(typecode, data)
+    if sys.byteorder == 'big':
+        data = array.array(typecode, data)
+        data.byteswap()
+    return data.tobytes()
@@ -0,0 +1,256 @@
+# Classes to write the sections of a stack of planes to DXF, SVG, or CSV files as
+# they're computed, for when the sections are only needed for inspection and drawing
+# them in sketches would be much slower than computing them.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import os
+import csv
+import math
+
+from .geometry import MyCircle, MyPoint
+from .instrumentation import SectionCancelled, progressPart
+from .sketching import SketchOperationType, planLoops
+
+
+# The number of characters saved at the start of an SVG file for its view box, which
+# is only known once all of the sections are written.
+_svgViewBoxWidth = 120
+
+# The group codes and values of the DXF entities, which are written for every curve
+# so they're formatted with a single call.
+_dxfLineFormat = '0\nLINE\n8\n{}\n10\n{!r}\n20\n{!r}\n30\n{!r}\n11\n{!r}\n21\n{!r}\n31\n{!r}\n'
+_dxfArcFormat = '0\nARC\n8\n{}\n10\n{!r}\n20\n{!r}\n30\n{!r}\n40\n{!r}\n50\n{!r}\n51\n{!r}\n'
+
+
+# Returns a writer for the file with the format of its extension, .dxf, .svg, or .csv.
+def openSectionWriter(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.dxf':
+        return DxfSectionWriter(path)
+    elif extension == '.svg':
+        return SvgSectionWriter(path)
+    elif extension == '.csv':
+        return CsvSectionWriter(path)
+    else:
+        raise ValueError('The sections can only be exported to .dxf, .svg, or .csv files.')
+
+
+# Computes the sections of count evenly spaced planes, the first at the offset from
+# the x-y plane of the matrix, and writes them to the writer.  The planes are computed
+# in batches of batchSize planes with calculateStack, which is passed a matrix, a
+# spacing, and a count like slicing.calculateSections and returns the loops of each
+# plane, and each batch is written before the next one is computed so only the loops
+# of one batch are kept.  The sections are numbered from firstIndex.  If the progress
+# stops the calculation, the sections that were finished are written before
+# SectionCancelled is raised again.  Returns the number of sections.
+def writeStackSections(writer, calculateStack, matrix, offset, spacing, count, firstIndex = 0, batchSize = 100,
+                       progress = None):
+    for first in range(0, count, batchSize):
+        batchCount = min(batchSize, count - first)
+        batchMatrix = matrix.copy()
+        batchMatrix.setCell(4, 3, matrix.getCell(4, 3) - offset - spacing * first)
+
+        try:
+            with progressPart(progress, first / count, (first + batchCount) / count):
+                stackLoops = calculateStack(batchMatrix, spacing, batchCount)
+        except SectionCancelled as err:
+            for i in range(0, len(err.stackLoops or [])):
+                if err.stackLoops[i] is not None:
+                    writer.writeSection(firstIndex + first + i, offset + spacing * (first + i), err.stackLoops[i])
+            raise
+
+        for i in range(0, batchCount):
+            writer.writeSection(firstIndex + first + i, offset + spacing * (first + i), stackLoops[i])
+
+    return count
+
+
+# Base class of the section writers.  The loops of each section are written in the
+# coordinate system of its plane, so the x and y of the points are their x and y on
+# the plane and the z is the offset of the plane.  The file is written as the
+# sections are added and finished when the writer is closed.
+class _SectionWriter:
+    def __init__(self, path):
+        self.path = path
+        self.sectionCount = 0
+        self._file = open(path, 'w', newline = '')
+        self._writeStart()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    # Writes the loops of the section with the index, whose plane is at the offset.
+    # The loops can be None for a plane that doesn't cross the mesh.
+    def writeSection(self, index, offset, loops):
+        self.sectionCount += 1
+        self._writeSection(index, offset, loops or [])
+
+    def close(self):
+        if self._file:
+            self._writeEnd()
+            self._file.close()
+            self._file = None
+
+    def _writeStart(self):
+        pass
+
+    def _writeEnd(self):
+        pass
+
+
+# Writes the sections as the LINE and ARC entities of an R12 DXF file, which almost
+# any CAD application can read, with a layer for each section.
+class DxfSectionWriter(_SectionWriter):
+    def _writeStart(self):
+        self._file.write('0\nSECTION\n2\nHEADER\n9\n$ACADVER\n1\nAC1009\n0\nENDSEC\n0\nSECTION\n2\nENTITIES\n')
+
+    def _writeSection(self, index, offset, loops):
+        layer = 'SECTION_' + str(index + 1)
+        offset = float(offset)
+        for loop in loops:
+            for start, mid, end, isReversed in getLoopCurves(loop):
+                circle = None
+                if mid:
+                    circle = MyCircle(start, mid, end)
+                if getattr(circle, 'center', None) is None:
+                    self._file.write(_dxfLineFormat.format(layer, start.x, start.y, offset, end.x, end.y, offset))
+                else:
+                    # DXF arcs are counterclockwise from the start to the end angle.
+                    if isReversed:
+                        start, end = end, start
+                    center = circle.center
+                    startAngle = math.degrees(math.atan2(start.y - center.y, start.x - center.x))
+                    endAngle = math.degrees(math.atan2(end.y - center.y, end.x - center.x))
+                    self._file.write(_dxfArcFormat.format(layer, center.x, center.y, offset, circle.radius, startAngle % 360,
+                                                          endAngle % 360))
+
+    def _writeEnd(self):
+        self._file.write('0\nENDSEC\n0\nEOF\n')
+
+
+# Writes the sections as the paths of an SVG file, with a group for each section and
+# a path for each loop, seen from above the planes.  Space is left for the view box at
+# the start of the file, which is filled in with the bounds of the sections when the
+# writer is closed.
+class SvgSectionWriter(_SectionWriter):
+    def _writeStart(self):
+        self._bounds = None
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n<svg xmlns="http://www.w3.org/2000/svg" viewBox="')
+        self._viewBoxPosition = self._file.tell()
+        self._file.write(' ' * _svgViewBoxWidth + '">\n')
+
+        # The y axis of SVG points down, so it's flipped to keep the sections as they're
+        # seen from above the planes.
+        self._file.write('<style>path { vector-effect: non-scaling-stroke; }</style>\n')
+        self._file.write('<g transform="scale(1,-1)" fill="none" stroke="black" stroke-width="1">\n')
+
+    def _writeSection(self, index, offset, loops):
+        self._file.write('<g id="section-' + str(index + 1) + '" data-offset="' + repr(float(offset)) + '">\n')
+        for loop in loops:
+            path = []
+            lastPoint = None
+            for start, mid, end, isReversed in getLoopCurves(loop):
+                if start is not lastPoint:
+                    path.append('M' + self._getPoint(start))
+                    self._addBounds(start.x, start.y, 0)
+
+                circle = None
+                if mid:
+                    circle = MyCircle(start, mid, end)
+                if getattr(circle, 'center', None) is None:
+                    path.append('L' + self._getPoint(end))
+                    self._addBounds(end.x, end.y, 0)
+                else:
+                    # The arc is the long way around the circle when the mid point is on
+                    # the same side of the line between the ends as the center.
+                    center = circle.center
+                    midSide = (end.x - start.x) * (mid.y - start.y) - (end.y - start.y) * (mid.x - start.x)
+                    centerSide = (end.x - start.x) * (center.y - start.y) - (end.y - start.y) * (center.x - start.x)
+                    isLarge = midSide * centerSide > 0
+                    radius = repr(float(circle.radius))
+                    path.append('A' + radius + ' ' + radius + ' 0 ' + ('1' if isLarge else '0') + ' ' +
+                                ('0' if isReversed else '1') + ' ' + self._getPoint(end))
+                    self._addBounds(center.x, center.y, circle.radius)
+                lastPoint = end
+
+            if path:
+                if loop.isClosed and loop.isConnected:
+                    path.append('Z')
+                self._file.write('<path d="' + ' '.join(path) + '"/>\n')
+        self._file.write('</g>\n')
+
+    def _writeEnd(self):
+        self._file.write('</g>\n</svg>\n')
+
+        # The y of the view box is flipped like the sections.
+        minX, minY, maxX, maxY = self._bounds or (0, 0, 0, 0)
+        viewBox = ' '.join(repr(float(value)) for value in (minX, -maxY, maxX - minX, maxY - minY))
+        self._file.seek(self._viewBoxPosition)
+        self._file.write(viewBox.ljust(_svgViewBoxWidth)[:_svgViewBoxWidth])
+
+    def _getPoint(self, point):
+        return repr(float(point.x)) + ',' + repr(float(point.y))
+
+    # Adds the square of the size around the point to the bounds of the sections.
+    def _addBounds(self, x, y, size):
+        if self._bounds is None:
+            self._bounds = (x - size, y - size, x + size, y + size)
+        else:
+            minX, minY, maxX, maxY = self._bounds
+            self._bounds = (min(minX, x - size), min(minY, y - size), max(maxX, x + size), max(maxY, y + size))
+
+
+# Writes the sections as a CSV file with a row for each line and arc of each loop.
+# The mid point of an arc is a point on the arc between its ends, and is empty for a
+# line.
+class CsvSectionWriter(_SectionWriter):
+    def _writeStart(self):
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(['section', 'offset', 'loop', 'closed', 'curve', 'type',
+                               'startX', 'startY', 'midX', 'midY', 'endX', 'endY'])
+
+    def _writeSection(self, index, offset, loops):
+        for loopIndex in range(0, len(loops)):
+            loop = loops[loopIndex]
+            isClosed = loop.isClosed and loop.isConnected
+            curves = getLoopCurves(loop)
+            for curveIndex in range(0, len(curves)):
+                start, mid, end, isReversed = curves[curveIndex]
+                if mid:
+                    row = [index + 1, offset, loopIndex + 1, int(isClosed), curveIndex + 1, 'arc',
+                           start.x, start.y, mid.x, mid.y, end.x, end.y]
+                else:
+                    row = [index + 1, offset, loopIndex + 1, int(isClosed), curveIndex + 1, 'line',
+                           start.x, start.y, '', '', end.x, end.y]
+                self._writer.writerow(row)
+
+
+# Returns a list with a tuple of the start, mid, and end point and whether the points
+# are clockwise for each curve of the loop, in the order of the loop, the same as
+# they'd be drawn by sketching.drawLoops.  The mid point of a line is None.  The end
+# point of each curve is the same object as the start point of the next curve when
+# they're connected.
+def getLoopCurves(loop):
+    plan = planLoops([loop])
+    points = [MyPoint(*plan.getVertex(i)) for i in range(0, plan.vertexCount())]
+
+    curves = []
+    for operationType, startIndex, midIndex, endIndex, isReversed in plan.operations:
+        if operationType == SketchOperationType.line:
+            curves.append((points[startIndex], None, points[endIndex], False))
+        else:
+            curves.append((points[startIndex], points[midIndex], points[endIndex], isReversed))
+    return curves
@@ -0,0 +1,1157 @@
+# Basic geometry classes used to compute and represent the sections through a mesh.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form 
+# for any purpose and without fee is hereby granted, provided that the above copyright 
+# notice appears in all copies and that both that copyright notice and the limited  
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY 
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE. 
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE 
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import array
+import math
+
+# numpy isn't available in every Python environment the add-in runs in, so loops are
+# only simplified with it when it can be imported.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Tolerance used to decide if two points are at the same location.
+_pointTol = 0.000001
+
+
+class MyLine:
+    def __init__(self, start, end):
+        self.startPoint = start
+        self.endPoint = end
+
+    def asString(self):
+            return '(' + str(self.startPoint.x) + ', ' + str(self.startPoint.y) + ', ' + str(self.startPoint.z) + ')-(' + str(self.endPoint.x) + ', ' + str(self.endPoint.y) + ', ' + str(self.endPoint.z) + ')'
+            
+    # Multiply the point by the matrix.
+    def transformBy(self, matrix):
+        try:
+            self.start.transformBy(matrix)
+            self.end.transformBy(matrix)
+        except:
+            raise ArithmeticError('Point transform failed.')
+
+    def intersectWithLine(self, otherLine):
+        a = [self.endPoint.x - self.startPoint.x, self.endPoint.y - self.startPoint.y]
+        b = [otherLine.startPoint.x - otherLine.endPoint.x, otherLine.startPoint.y - otherLine.endPoint.y]
+        c = [self.startPoint.x - otherLine.startPoint.x, self.startPoint.y - otherLine.startPoint.y]
+        
+        # Compute alpha
+        denominator = (a[1] * b[0]) - (a[0] * b[1])
+        if denominator == 0:
+            return None
+
+        numerator = (b[1] * c[0]) - (b[0] * c[1])
+        alpha = numerator / denominator
+
+        dX = self.startPoint.x + (alpha * (self.endPoint.x - self.startPoint.x))
+        dY = self.startPoint.y + (alpha * (self.endPoint.y - self.startPoint.y))
+        return MyPoint(dX, dY, 0)
+        
+        
+    # Calculate the intersection point of the line and the x-y plane
+    # This assumes the line does intersect, which in this case
+    # has already been validated.
+    def intersectWithXYPlane(self):
+        # Get the length of the line the Z direction.
+        zLength = abs(self.startPoint.z) + abs(self.endPoint.z)     
+    
+        # Compute the length factor of the start point to the z plane.
+        factor = abs(self.startPoint.z) / zLength
+    
+        # Create a vector along the line and scale it by the factor.    
+        lineVec = self.startPoint.vectorTo(self.endPoint)
+        lineVec.scaleBy(factor)
+        
+        # Move the line start point along the vector the scaled distance
+        # and that will be the intersection point.
+        intPoint = self.startPoint.copy()
+        intPoint.translateBy(lineVec)
+        
+        return intPoint
+
+
+class MyCircle:
+    # Create a circle through three points.
+    def __init__(self, startPoint, midPoint, endPoint):
+        try:
+            # Create two perpendiculars for the intersection.
+            x = (startPoint.x + midPoint.x) / 2
+            y = (startPoint.y + midPoint.y) / 2
+            sideMid = MyPoint(x, y, 0)
+    
+            angle = startPoint.bearingTo(midPoint) + (math.pi / 2)
+            x = x + math.cos(angle)
+            y = y + math.sin(angle)
+            perpPoint = MyPoint(x, y, 0)
+            perpLine1 = MyLine(sideMid, perpPoint)
+    
+            x = (endPoint.x + midPoint.x) / 2
+            y = (endPoint.y + midPoint.y) / 2
+            sideMid = MyPoint(x, y, 0)
+    
+            angle = midPoint.bearingTo(endPoint) + (math.pi / 2)
+            x = x + math.cos(angle)
+            y = y + math.sin(angle)
+            perpPoint = MyPoint(x, y, 0)
+            perpLine2 = MyLine(sideMid, perpPoint)
+    
+            # Compute the center of the circle.
+            self.center = perpLine1.intersectWithLine(perpLine2)
+            if not self.center:
+                return None
+    
+            # Compute the radius of the circle.
+            self.radius = startPoint.distanceTo(self.center)
+        except:
+            return None
+
+    def asString(self):
+            return '(' + str(self.center.x) + ', ' + str(self.center.y) + ', ' + str(self.center.z) + ')-(' + str(self.radius) + ')'
+            
+    # Multiply the point by the matrix.
+    def transformBy(self, matrix):
+        try:
+            self.center.transformBy(matrix)
+        except:
+            raise ArithmeticError('Circle transform failed.')
+
+
+# Enum of point types.
+class PointType():
+     unknown = 1
+     lineStart = 2
+     lineEnd = 3
+     lineStartAndEnd = 4
+     arcMid = 5
+
+
+class MyPoint:
+    def __init__(self, x=0, y=0, z=0, type=PointType.unknown):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.pointType = type
+ 
+    # Multiply the point by the matrix.
+    def transformBy(self, matrix):
+        try:
+            newX = self.x * matrix.getCell(1, 1) + self.y * matrix.getCell(2, 1) + self.z * matrix.getCell(3, 1) + matrix.getCell(4, 1)
+            newY = self.x * matrix.getCell(1, 2) + self.y * matrix.getCell(2, 2) + self.z * matrix.getCell(3, 2) + matrix.getCell(4, 2)
+            newZ = self.x * matrix.getCell(1, 3) + self.y * matrix.getCell(2, 3) + self.z * matrix.getCell(3, 3) + matrix.getCell(4, 3)
+            self.x = newX
+            self.y = newY
+            self.z = newZ
+        except:
+            raise ArithmeticError('Point transform failed.')
+
+    def vectorTo(self, point):
+        return MyVector(point.x - self.x, point.y - self.y, point.z - self.z)            
+    
+    def asString(self):
+        return str(self.x) + ', ' + str(self.y) + ', ' + str(self.z)
+            
+    def translateBy(self, vector):
+        self.x += vector.x
+        self.y += vector.y
+        self.z += vector.z
+        
+    def copy(self):
+        return MyPoint(self.x, self.y, self.z)
+        
+    def distanceTo(self, point):
+        return math.sqrt(((point.x - self.x) ** 2) + ((point.y - self.y) ** 2) + ((point.z - self.z) ** 2))
+        
+    def bearingTo(self, point):        
+        pointDist = self.distanceTo(point)
+        if pointDist < _pointTol:
+            raise ValueError('The points are at the same location.')
+
+        # Determine which quadrant the point is in.
+        if point.x >= self.x and point.y >= self.y:
+            # First quadrant
+            return math.acos((point.x - self.x) / pointDist)
+        elif point.x < self.x and point.y >= self.y:
+            # Second quadrant
+            return math.acos((point.x - self.x) / pointDist)
+        elif point.x >= self.x and point.y < self.y:
+            # Third quadrant
+            return (math.pi * 2) - math.acos((point.x - self.x) / pointDist)
+        else:
+            # Fourth quadrant
+            return (math.pi * 2) - math.acos((point.x - self.x) / pointDist)
+            
+    def isEqualTo(self, point):
+            if self.distanceTo(point) <= 0.000001:
+                return True
+            else:
+                return False
+
+
+class MyVector:
+    def __init__(self, x=0, y=0, z=0):
+        self.x = x
+        self.y = y
+        self.z = z
+ 
+    # Multiply the point by the matrix.
+    def transformBy(self, matrix):
+        try:
+            newX = self.x * matrix.getCell(1, 1) + self.y * matrix.getCell(2, 1) + self.z * matrix.getCell(3, 1) + matrix.getCell(4, 1)
+            newY = self.x * matrix.getCell(1, 2) + self.y * matrix.getCell(2, 2) + self.z * matrix.getCell(3, 2) + matrix.getCell(4, 2)
+            newZ = self.x * matrix.getCell(1, 3) + self.y * matrix.getCell(2, 3) + self.z * matrix.getCell(3, 3) + matrix.getCell(4, 3)
+            self.x = newX
+            self.y = newY
+            self.z = newZ
+        except:
+            raise ArithmeticError('Point transform failed.')
+            
+    def asString(self):
+            return str(self.x) + ', ' + str(self.y) + ', ' + str(self.z)
+    
+    def scaleBy(self, scale):
+        self.x = self.x * scale
+        self.y = self.y * scale
+        self.z = self.z * scale
+        
+    # Calculate the dot product of two vectors.
+    def dotProduct(self, vec):
+        return (self.x * vec.x + self.y * vec.y + self.z * vec.z)
+
+    # Calculate the angle between two vectors.        
+    def angleTo(self, vec):
+        dotProd = self.dotProduct(vec)
+        val = dotProd / (self.length() * vec.length())
+        if val < -1.0:
+            val = -1.0
+        elif val > 1.0:
+            val = 1.0
+        return math.acos(val)
+
+    # Add two vectors.
+    def add(self, vec):
+        return MyVector(self.x + vec.x, self.y + vec.y, self.z + vec.z)
+        
+    # Subtract two vectors.
+    def subtract(self, vec):
+        return MyVector(self.x - vec.x, self.y - vec.y, self.z - vec.z)
+
+    # Multiply the vectory by a value.
+    def multiply(self, val):
+        self.x *= val
+        self.y *= val
+        self.z *= val
+    
+    def length(self):
+        return math.sqrt((self.x * self.x) + (self.y * self.y) + (self.z * self.z))
+        
+    def normalize(self):
+        lng = self.length()
+        self.x = self.x / lng
+        self.y = self.y / lng
+        self.z = self.z / lng
+
+
+class MyMatrix:
+    def __init__(self):
+        self._data = [1,0,0,0,0,1,0,0,0,0,1,0,0,0,0,1]
+        
+    def copy(self):
+        newMatrix = MyMatrix()
+        for i in range(0,16):
+            newMatrix._data[i] = self._data[i]
+        return newMatrix
+        
+    def setWithArray(self, array):
+        for i in range(0,16):
+            self._data[i] = array[i]
+                
+    def setToIdenty(self):
+        self._data = [1,0,0,0,0,1,0,0,0,0,1,0,0,0,0,1]
+                
+    def getCell(self, column, row):
+        return self._data[(row - 1) * 4 + (column - 1)]
+                        
+    def setCell(self, column, row, value):
+        self._data[(row - 1) * 4 + (column - 1)] = value
+       
+    def transformBy(self, trans):
+        newMatrix = MyMatrix()
+        
+        for i in range(1,5):
+            for j in range(1,5):
+                newMatrix.setCell(i, j, self.getCell(i, 1) * trans.getCell(1, j) + self.getCell(i, 2) * trans.getCell(2, j) + self.getCell(i, 3) * trans.getCell(3, j) + self.getCell(i, 4) * trans.getCell(4, j))
+
+        for i in range(0,16):
+            self._data[i] = newMatrix._data[i]
+
+    def invert(self): 
+        # Create a new matrix with the translation portion stripped off.
+        newMatrix = self.copy() 
+        newMatrix.setCell(4, 1, 0)
+        newMatrix.setCell(4, 2, 0)
+        newMatrix.setCell(4, 3, 0)
+
+        # Invert the matrix by swapping the cells along the diagonal.  This only
+        # works for orthogonal matrices, which is all we need here.
+        newMatrix.setCell(1, 2, self.getCell(2, 1))
+        newMatrix.setCell(1, 3, self.getCell(3, 1))
+        newMatrix.setCell(2, 3, self.getCell(3, 2))
+        newMatrix.setCell(2, 1, self.getCell(1, 2))
+        newMatrix.setCell(3, 1, self.getCell(1, 3))
+        newMatrix.setCell(3, 2, self.getCell(2, 3))
+
+        # Reverse the direction of the translation component.
+        trans = self.translation()
+        trans.transformBy(newMatrix)
+        trans.scaleBy(-1)
+
+        # Put the translation back into the matrix.
+        newMatrix.setCell(4, 1, trans.x)
+        newMatrix.setCell(4, 2, trans.y)
+        newMatrix.setCell(4, 3, trans.z)
+
+        for i in range(0,16):
+            self._data[i] = newMatrix._data[i]
+    
+    def translation(self):
+        return MyVector(self.getCell(4,1), self.getCell(4,2), self.getCell(4,3))
+       
+    def asString(self):
+        result = ''
+        for row in range(1, 5):
+            if row == 1:
+                result = str(self.getCell(1, row)) + ', ' + str(self.getCell(2, row)) + ', ' + str(self.getCell(3, row)) + ', ' + str(self.getCell(4, row))
+            else:
+                result += '\n' + str(self.getCell(1, row)) + ', ' + str(self.getCell(2, row)) + ', ' + str(self.getCell(3, row)) + ', ' + str(self.getCell(4, row))
+            
+        return result
+
+
+# Returns a MyMatrix that transforms world coordinates into the coordinate system of
+# the plane defined by the origin and normal, so the plane becomes the x-y model plane.
+# The x axis of the plane is chosen using the same arbitrary axis rule as DXF, so the
+# same plane always results in the same coordinate system.
+def getWorldToPlaneMatrix(origin, normal):
+    zAxis = MyVector(normal[0], normal[1], normal[2])
+    if zAxis.length() <= _pointTol:
+        raise ValueError('The normal of the plane has a length of zero.')
+    zAxis.normalize()
+
+    if abs(zAxis.x) < 1.0/64 and abs(zAxis.y) < 1.0/64:
+        xAxis = MyVector(zAxis.z, 0, -zAxis.x)
+    else:
+        xAxis = MyVector(-zAxis.y, zAxis.x, 0)
+    xAxis.normalize()
+    yAxis = MyVector(zAxis.y * xAxis.z - zAxis.z * xAxis.y,
+                     zAxis.z * xAxis.x - zAxis.x * xAxis.z,
+                     zAxis.x * xAxis.y - zAxis.y * xAxis.x)
+
+    originVec = MyVector(origin[0], origin[1], origin[2])
+    worldToPlane = MyMatrix()
+    worldToPlane.setWithArray([xAxis.x, xAxis.y, xAxis.z, -xAxis.dotProduct(originVec),
+                               yAxis.x, yAxis.y, yAxis.z, -yAxis.dotProduct(originVec),
+                               zAxis.x, zAxis.y, zAxis.z, -zAxis.dotProduct(originVec),
+                               0, 0, 0, 1])
+    return worldToPlane
+
+
+# Number of points a new section loop has room for before its arrays are grown.
+_loopInitialCapacity = 16
+
+
+# A connected series of points.  The coordinates of the points are stored as x, y, z
+# values in one array and their point types in a parallel array, which takes much
+# less memory than a MyPoint object for each point.  The arrays have free space at
+# both ends so a point can be added to either end without moving the others, and the
+# points of the loop are the ones from _first up to _last.  When the sections of
+# several meshes are computed together, bodyId is the index of the mesh the loop is
+# on, if it's known.  The parent, children, and depth of the loop are set by
+# nesting.nestLoops, where the depth is 0 for an outer boundary, 1 for a hole in it,
+# and so on.
+class SectionLoop:
+    def __init__(self):
+        self.isClosed = False
+        self.isConnected = True
+        self.bodyId = None
+        self.parent = None
+        self.children = []
+        self.depth = None
+        self._coords = array.array('d', bytes(24 * _loopInitialCapacity))
+        self._types = array.array('b', bytes(_loopInitialCapacity))
+        self._first = int(_loopInitialCapacity / 2)
+        self._last = self._first
+
+    # The points of the loop as a list of new MyPoint objects.  Changing them doesn't
+    # change the loop.
+    @property
+    def points(self):
+        coords = self._coords
+        types = self._types
+        return [MyPoint(coords[i*3], coords[i*3+1], coords[i*3+2], types[i]) for i in range(self._first, self._last)]
+
+    @property
+    def startPoint(self):
+        if self._last == self._first:
+            return None
+        return self.getPoint(0)
+
+    @property
+    def endPoint(self):
+        if self._last == self._first:
+            return None
+        return self.getPoint(-1)
+
+    def pointCount(self):
+        return self._last - self._first
+
+    # Returns a new MyPoint for the point at the index, which counts from the end
+    # when it's negative like a list index.
+    def getPoint(self, index):
+        i = self._getArrayIndex(index)
+        return MyPoint(self._coords[i*3], self._coords[i*3+1], self._coords[i*3+2], self._types[i])
+
+    def replacePoint(self, index, newPoint):
+        self._setPoint(self._getArrayIndex(index-1), newPoint)
+
+    def addPoint(self, newPoint, addToEnd):
+        if addToEnd:
+            if self._last == len(self._types):
+                self._grow()
+            self._last += 1
+            self._setPoint(self._last - 1, newPoint)
+        else:
+            if self._first == 0:
+                self._grow()
+            self._first -= 1
+            self._setPoint(self._first, newPoint)
+            
+    def removePoint(self, index):
+        if index < self.pointCount():
+            i = self._getArrayIndex(index)
+
+            # Close the gap by moving the points on the shorter side of it.
+            if i - self._first < self._last - i:
+                self._coords[(self._first+1)*3:(i+1)*3] = self._coords[self._first*3:i*3]
+                self._types[self._first+1:i+1] = self._types[self._first:i]
+                self._first += 1
+            else:
+                self._coords[i*3:(self._last-1)*3] = self._coords[(i+1)*3:self._last*3]
+                self._types[i:self._last-1] = self._types[i+1:self._last]
+                self._last -= 1
+
+    # Removes the points at the indices in a single pass over the points, instead
+    # of moving the points after each one that's removed.  The indices can be in any
+    # order.
+    def removePoints(self, indices):
+        isRemoved = bytearray(self.pointCount())
+        for index in indices:
+            isRemoved[index] = 1
+
+        # Move each run of points that are kept down over the removed points.
+        coords = self._coords
+        types = self._types
+        newLast = self._first
+        runStart = isRemoved.find(0)
+        while runStart >= 0:
+            runEnd = isRemoved.find(1, runStart)
+            if runEnd < 0:
+                runEnd = len(isRemoved)
+
+            start = self._first + runStart
+            if start != newLast:
+                coords[newLast*3:(newLast+runEnd-runStart)*3] = coords[start*3:(self._first+runEnd)*3]
+                types[newLast:newLast+runEnd-runStart] = types[start:self._first+runEnd]
+            newLast += runEnd - runStart
+            runStart = isRemoved.find(0, runEnd)
+
+        self._last = newLast
+
+    # Returns an array with the x, y, and z coordinates of each point of the loop.
+    def coordinates(self):
+        return self._coords[self._first*3:self._last*3]
+
+    # Returns an array with the x, y, and z coordinates of the points of a polygon that
+    # follows the loop, where the mid point of each arc is replaced by points along
+    # the arc, so no line of the polygon spans more than maxAngle of an arc.
+    def polygonCoordinates(self, maxAngle = math.pi / 36):
+        arcs = {mid: (start, end) for start, mid, end in self._getArcs()}
+        if not arcs:
+            return self.coordinates()
+
+        coords = self._coords
+        polygon = array.array('d')
+        for i in range(self._first, self._last):
+            arc = None
+            if i in arcs:
+                arc = _getArc(coords, arcs[i][0], i, arcs[i][1])
+            if arc is None:
+                polygon.extend(coords[i*3:i*3+3])
+                continue
+
+            centerX, centerY, radius, sweep = arc
+            start = arcs[i][0]
+            startAngle = math.atan2(coords[start*3+1] - centerY, coords[start*3] - centerX)
+            stepCount = max(int(math.ceil(abs(sweep) / maxAngle)), 2)
+            for step in range(1, stepCount):
+                angle = startAngle + sweep * step / stepCount
+                polygon.extend((centerX + radius * math.cos(angle), centerY + radius * math.sin(angle), coords[i*3+2]))
+        return polygon
+
+    # Returns a tuple with the minimum x, y, and z and the maximum x, y, and z of the
+    # loop, including the parts of its arcs that bulge past their points, or None if
+    # the loop doesn't have any points.
+    def boundingBox(self):
+        if self._last == self._first:
+            return None
+
+        coords = self._coords
+        points = self.coordinates()
+        minX, minY, minZ = min(points[0::3]), min(points[1::3]), min(points[2::3])
+        maxX, maxY, maxZ = max(points[0::3]), max(points[1::3]), max(points[2::3])
+
+        # Add the points where each arc crosses the axes through its center.
+        for start, mid, end in self._getArcs():
+            arc = _getArc(coords, start, mid, end)
+            if arc:
+                centerX, centerY, radius, sweep = arc
+                startAngle = math.atan2(coords[start*3+1] - centerY, coords[start*3] - centerX)
+                for quarter in range(0, 4):
+                    angle = quarter * math.pi / 2
+                    if sweep > 0:
+                        isOnArc = (angle - startAngle) % (2 * math.pi) <= sweep
+                    else:
+                        isOnArc = (startAngle - angle) % (2 * math.pi) <= -sweep
+                    if isOnArc:
+                        x = centerX + radius * math.cos(angle)
+                        y = centerY + radius * math.sin(angle)
+                        minX, minY, maxX, maxY = min(minX, x), min(minY, y), max(maxX, x), max(maxY, y)
+        return (minX, minY, minZ, maxX, maxY, maxZ)
+
+    # Reverses the order of the points, which changes the direction of the loop.  The
+    # first point of a closed loop stays first, so the mid point of an arc is never
+    # moved to the start of the loop.
+    def reverse(self):
+        first = self._first
+        if self.isClosed:
+            first += 1
+        coords = self._coords[first*3:self._last*3]
+        for i in range(0, self._last - first):
+            j = (self._last - 1 - i) * 3
+            self._coords[j:j+3] = coords[i*3:i*3+3]
+        types = self._types[first:self._last]
+        types.reverse()
+        self._types[first:self._last] = types
+
+    # Returns a new loop with the same points and properties.  The nesting of the loop
+    # isn't copied.
+    def copy(self):
+        newLoop = SectionLoop()
+        newLoop.isClosed = self.isClosed
+        newLoop.isConnected = self.isConnected
+        newLoop.bodyId = self.bodyId
+        newLoop._coords = array.array('d', self._coords)
+        newLoop._types = array.array('b', self._types)
+        newLoop._first = self._first
+        newLoop._last = self._last
+        return newLoop
+
+    # Multiply all of the points by the matrix.
+    def transformBy(self, matrix):
+        m11, m21, m31, m41 = matrix.getCell(1, 1), matrix.getCell(2, 1), matrix.getCell(3, 1), matrix.getCell(4, 1)
+        m12, m22, m32, m42 = matrix.getCell(1, 2), matrix.getCell(2, 2), matrix.getCell(3, 2), matrix.getCell(4, 2)
+        m13, m23, m33, m43 = matrix.getCell(1, 3), matrix.getCell(2, 3), matrix.getCell(3, 3), matrix.getCell(4, 3)
+        coords = self._coords
+        for i in range(self._first*3, self._last*3, 3):
+            x = coords[i]
+            y = coords[i+1]
+            z = coords[i+2]
+            coords[i] = x * m11 + y * m21 + z * m31 + m41
+            coords[i+1] = x * m12 + y * m22 + z * m32 + m42
+            coords[i+2] = x * m13 + y * m23 + z * m33 + m43
+
+    # Returns the area enclosed by the loop projected onto the x-y plane, which is
+    # positive when the loop is counterclockwise.  The loop is treated as closed.  The
+    # area of each arc is that of the circle between its ends, rather than that of
+    # the lines through its mid point.
+    def area(self):
+        coords = self._coords
+        area = 0
+        lastX = coords[self._last*3-3]
+        lastY = coords[self._last*3-2]
+        for i in range(self._first*3, self._last*3, 3):
+            area += lastX * coords[i+1] - coords[i] * lastY
+            lastX = coords[i]
+            lastY = coords[i+1]
+        area /= 2
+
+        # Replace the triangle of the ends and mid point of each arc by the part of
+        # the circle between the arc and the line between its ends.
+        for start, mid, end in self._getArcs():
+            arc = _getArc(coords, start, mid, end)
+            if arc:
+                centerX, centerY, radius, sweep = arc
+                triangle = ((coords[mid*3] - coords[start*3]) * (coords[end*3+1] - coords[start*3+1]) -
+                            (coords[mid*3+1] - coords[start*3+1]) * (coords[end*3] - coords[start*3])) / 2
+                area += radius * radius * (sweep - math.sin(sweep)) / 2 - triangle
+        return area
+
+    # Returns the total length of the lines and arcs of the loop, including the curve
+    # from the last point back to the first for a closed loop.
+    def length(self):
+        coords = self._coords
+        length = 0
+        for i in range(self._first*3 + 3, self._last*3, 3):
+            length += math.sqrt((coords[i] - coords[i-3]) ** 2 + (coords[i+1] - coords[i-2]) ** 2 + (coords[i+2] - coords[i-1]) ** 2)
+        if self.isClosed and self._last > self._first:
+            i = self._first*3
+            j = self._last*3-3
+            length += math.sqrt((coords[i] - coords[j]) ** 2 + (coords[i+1] - coords[j+1]) ** 2 + (coords[i+2] - coords[j+2]) ** 2)
+
+        # Replace the lines through the mid point of each arc by the length of the arc.
+        for start, mid, end in self._getArcs():
+            arc = _getArc(coords, start, mid, end)
+            if arc:
+                length += arc[2] * abs(arc[3]) - _getDistance(coords, start, mid) - _getDistance(coords, mid, end)
+        return length
+
+    # Removes the points between colinear lines and returns the number of points removed.
+    def optimizeLines(self):
+        pointCount = self.pointCount()
+        coords = self._coords
+        types = self._types
+        first = self._first
+
+        # Declare a list to store the point indices that will be removed.
+        extraPoints = []
+
+        # Initialize the start and mid points.  These are indices into the arrays.
+        startCheckPoint = first
+        midCheckPoint = first + 1
+        endCheckPoint = None
+
+        # Iterate over the points in the loop.  This overshoots
+        # the length of the list so it will overlap to the beginning
+        # so that the connecting points can be checked for colinearity.
+        for i in range(2, pointCount + 2):
+            # Special case when the index is the length plus 1 or 2
+            # so that the start points are also considered.
+            if i == pointCount:
+                endCheckPoint = first
+            elif i == pointCount + 1:
+                endCheckPoint = first + 1
+            else:
+                endCheckPoint = first + i
+
+            # Calculate the angle defined by the three points.  If it's within a tolerance
+            # of pi then they're colinear.
+            midX = coords[midCheckPoint*3]
+            midY = coords[midCheckPoint*3+1]
+            midZ = coords[midCheckPoint*3+2]
+            vector1 = MyVector(coords[startCheckPoint*3] - midX, coords[startCheckPoint*3+1] - midY, coords[startCheckPoint*3+2] - midZ)
+            vector1.normalize()
+            vector2 = MyVector(coords[endCheckPoint*3] - midX, coords[endCheckPoint*3+1] - midY, coords[endCheckPoint*3+2] - midZ)
+            vector2.normalize()
+            angle = vector1.angleTo(vector2)
+ 
+            # Check to see if the angle is within tolerance to 180 degrees.
+            if math.fabs(math.pi - angle) < 0.0001:
+                # The mid point of the last check is the first point again, which
+                # is past the end of the points and isn't removed.
+                if i - 1 < pointCount:
+                    extraPoints.append(i-1)
+
+                if types[startCheckPoint] == PointType.lineEnd:
+                    types[startCheckPoint] = PointType.lineStartAndEnd
+                else:
+                    types[startCheckPoint] = PointType.lineStart
+
+                if types[endCheckPoint] == PointType.lineStart:
+                    types[endCheckPoint] = PointType.lineStartAndEnd
+                else:                    
+                    types[endCheckPoint] = PointType.lineEnd
+
+                midCheckPoint = endCheckPoint
+            else:
+                startCheckPoint = midCheckPoint
+                midCheckPoint = endCheckPoint
+
+        self.removePoints(extraPoints)
+        return pointCount - self.pointCount()
+
+    # Removes the points that are within the tolerance of the line between the points
+    # on either side of them that are kept, using the Douglas-Peucker algorithm, and
+    # returns the number of points removed.  Unlike optimizeLines, points on noisy
+    # lines are removed, but no point that's removed is further than the tolerance
+    # from the simplified loop.  A closed loop is split at its first point and the
+    # point furthest from it, which are always kept.
+    def simplify(self, tolerance):
+        pointCount = self.pointCount()
+        if pointCount < 3:
+            return 0
+
+        # Get the points, with the first point repeated at the end of a closed loop so
+        # the line back to it is simplified too.
+        coords = self._coords[self._first*3:self._last*3]
+        if numpy:
+            points = numpy.frombuffer(coords, dtype = numpy.float64).reshape(-1, 3)
+            if self.isClosed:
+                points = numpy.concatenate((points, points[:1]))
+        else:
+            points = [coords[i:i+3] for i in range(0, len(coords), 3)]
+            if self.isClosed:
+                points.append(points[0])
+
+        if self.isClosed:
+            if numpy:
+                furthest = int(numpy.argmax(((points[:pointCount] - points[0]) ** 2).sum(axis = 1)))
+            else:
+                furthest = max(range(0, pointCount), key = lambda i: _getSegmentDistance(points[i], points[0], points[0]))
+            spans = [(0, furthest), (furthest, pointCount)]
+        else:
+            spans = [(0, pointCount - 1)]
+
+        if numpy:
+            isKept = _simplifySpansVectorized(points, spans, tolerance)
+        else:
+            isKept = _simplifySpans(points, spans, tolerance)
+
+        self.removePoints([i for i in range(0, pointCount) if not isKept[i]])
+        return pointCount - self.pointCount()
+        
+        
+    # Replaces the points of runs of lines that lie on a circle with arcs and returns
+    # the number of points removed.  A run of at least minArcPoints points that are all
+    # within the tolerance of the circle fitted to them, and aren't all within the
+    # tolerance of the line between its ends, becomes an arc.  Each arc keeps its end
+    # points, which are shared with the curves next to it, and the point in the middle,
+    # which is moved onto the circle.  The points are passed to the debug sink, if
+    # there is one, before they're changed.
+    def optimizeArcs(self, debugSink = None, tolerance = 0.001, minArcPoints = 6):
+        if debugSink:
+            debugSink.dumpPoints(self.points)
+        pointCount = self.pointCount()
+        minArcPoints = max(minArcPoints, 3)
+
+        # Get the x and y of the points, with the first point repeated at the end of a
+        # closed loop so an arc can end at it.
+        xs = self._coords[self._first*3:self._last*3:3]
+        ys = self._coords[self._first*3+1:self._last*3:3]
+        if self.isClosed:
+            xs.append(xs[0])
+            ys.append(ys[0])
+
+        # Find the longest run from each start point that fits a circle.  The next run
+        # starts where the arc ends, and a start point without an arc only costs the
+        # fit of a few points, so the time grows with the number of points.
+        arcs = []
+        start = 0
+        while start + minArcPoints <= len(xs):
+            end, circle = _fitArc(xs, ys, start, len(xs), tolerance, minArcPoints)
+            if end - start + 1 < minArcPoints:
+                start += 1
+            elif _isOnLine(xs, ys, start, end, tolerance):
+                start = end
+            elif start == 0 and end == len(xs) - 1 and self.isClosed:
+                # An arc can't end where it starts, so a loop that's a circle is
+                # split into two arcs.
+                arcs.append((0, int(end / 2), circle))
+                arcs.append((int(end / 2), end, circle))
+                start = end
+            else:
+                arcs.append((start, end, circle))
+                start = end
+
+        removedIndices = []
+        for start, end, circle in arcs:
+            midIndex = int((start + end) / 2)
+            removedIndices.extend(range(start + 1, midIndex))
+            removedIndices.extend(range(midIndex + 1, end))
+
+            centerX, centerY, radius = circle
+            i = self._first + midIndex
+            offsetX = self._coords[i*3] - centerX
+            offsetY = self._coords[i*3+1] - centerY
+            scale = radius / math.sqrt(offsetX * offsetX + offsetY * offsetY)
+            self._coords[i*3] = centerX + offsetX * scale
+            self._coords[i*3+1] = centerY + offsetY * scale
+            self._types[i] = PointType.arcMid
+
+        self.removePoints(removedIndices)
+        return pointCount - self.pointCount()
+
+    # Returns a list with a tuple of the indices in the arrays of the start, mid, and
+    # end point of each arc, the same arcs that sketching.planLoops draws.  An arc is a
+    # point whose type is arcMid and the points on either side of it, and the arc of
+    # the last point of a closed loop ends at the first point.
+    def _getArcs(self):
+        arcs = []
+        if not self.isConnected or PointType.arcMid not in self._types[self._first:self._last]:
+            return arcs
+
+        types = self._types
+        i = self._first + 1
+        while i < self._last:
+            if types[i] == PointType.arcMid:
+                if i + 1 < self._last:
+                    arcs.append((i - 1, i, i + 1))
+                elif self.isClosed and self._last - self._first > 2:
+                    arcs.append((i - 1, i, self._first))
+                i += 2
+            else:
+                i += 1
+        return arcs
+
+    # Returns the index in the arrays of the point at the index.
+    def _getArrayIndex(self, index):
+        if index < 0:
+            index += self.pointCount()
+        if index < 0 or index >= self.pointCount():
+            raise IndexError('Section loop point index out of range.')
+        return self._first + index
+
+    def _setPoint(self, i, point):
+        self._coords[i*3] = point.x
+        self._coords[i*3+1] = point.y
+        self._coords[i*3+2] = point.z
+        self._types[i] = point.pointType
+
+    # Doubles the size of the arrays and puts the points in the middle so there's
+    # room to add points at either end.
+    def _grow(self):
+        pointCount = self.pointCount()
+        capacity = len(self._types) * 2
+        first = int((capacity - pointCount) / 2)
+
+        coords = array.array('d', bytes(24 * capacity))
+        coords[first*3:(first+pointCount)*3] = self._coords[self._first*3:self._last*3]
+        types = array.array('b', bytes(capacity))
+        types[first:first+pointCount] = self._types[self._first:self._last]
+
+        self._coords = coords
+        self._types = types
+        self._first = first
+        self._last = first + pointCount
+
+
+# Returns a tuple of the center x and y, the radius, and the angle from the start to
+# the end, which is positive when it's counterclockwise, of the arc in the x-y plane
+# through the points at the start, mid, and end index of the flat array of x, y, and
+# z coordinates, or None if the points are on a line.
+def _getArc(coords, start, mid, end):
+    startX, startY = coords[start*3], coords[start*3+1]
+    midX, midY = coords[mid*3], coords[mid*3+1]
+    endX, endY = coords[end*3], coords[end*3+1]
+
+    # The center is where the perpendicular bisectors of the two chords meet.
+    ax = midX - startX
+    ay = midY - startY
+    bx = endX - startX
+    by = endY - startY
+    cross = ax * by - ay * bx
+    if abs(cross) <= _pointTol * _pointTol:
+        return None
+    aa = ax * ax + ay * ay
+    bb = bx * bx + by * by
+    centerX = startX + (by * aa - ay * bb) / (2 * cross)
+    centerY = startY + (ax * bb - bx * aa) / (2 * cross)
+    radius = math.sqrt((startX - centerX) ** 2 + (startY - centerY) ** 2)
+
+    # The mid point is counterclockwise from the start when the cross product is positive.
+    sweep = math.atan2(endY - centerY, endX - centerX) - math.atan2(startY - centerY, startX - centerX)
+    if cross > 0:
+        sweep %= 2 * math.pi
+    else:
+        sweep = -(-sweep % (2 * math.pi))
+    return centerX, centerY, radius, sweep
+
+
+# Returns the distance between the points at two indices of a flat array of x, y,
+# and z coordinates.
+def _getDistance(coords, first, second):
+    return math.sqrt((coords[first*3] - coords[second*3]) ** 2 + (coords[first*3+1] - coords[second*3+1]) ** 2 +
+                     (coords[first*3+2] - coords[second*3+2]) ** 2)
+
+
+# Running sums of the points added to an algebraic (Kasa) least squares fit of a
+# circle in the x-y plane, so a point can be added and the circle found again in
+# constant time.  The sums are of the points relative to the origin, which should be
+# near them so the sums stay accurate.
+class _CircleFit:
+    def __init__(self, originX, originY):
+        self.originX = originX
+        self.originY = originY
+        self.count = 0
+        self.sumX = 0.0
+        self.sumY = 0.0
+        self.sumXX = 0.0
+        self.sumXY = 0.0
+        self.sumYY = 0.0
+        self.sumXR = 0.0
+        self.sumYR = 0.0
+        self.sumR = 0.0
+
+    def addPoint(self, x, y):
+        x -= self.originX
+        y -= self.originY
+        r = x * x + y * y
+        self.count += 1
+        self.sumX += x
+        self.sumY += y
+        self.sumXX += x * x
+        self.sumXY += x * y
+        self.sumYY += y * y
+        self.sumXR += x * r
+        self.sumYR += y * r
+        self.sumR += r
+
+    # Returns the x and y of the center and the radius of the circle that best fits
+    # the points, or None if they're colinear.  The circle is x^2 + y^2 + Dx + Ey + F = 0
+    # with the D, E, and F that minimize the sum of its squared value at the points.
+    def getCircle(self):
+        a, b, c = self.sumXX, self.sumXY, self.sumX
+        d, e, f = self.sumYY, self.sumY, self.count
+        cofactor1 = d * f - e * e
+        cofactor2 = c * e - b * f
+        cofactor3 = b * e - c * d
+        det = a * cofactor1 + b * cofactor2 + c * cofactor3
+        scale = a + d
+        if abs(det) <= 1e-12 * scale * scale * f:
+            return None
+
+        rx, ry, rr = -self.sumXR, -self.sumYR, -self.sumR
+        D = (rx * cofactor1 + ry * cofactor2 + rr * cofactor3) / det
+        E = (rx * cofactor2 + ry * (a * f - c * c) + rr * (b * c - a * e)) / det
+        F = (rx * cofactor3 + ry * (b * c - a * e) + rr * (a * d - b * b)) / det
+        centerX = -D / 2
+        centerY = -E / 2
+        radiusSquared = centerX * centerX + centerY * centerY - F
+        if radiusSquared <= 0:
+            return None
+        return (centerX + self.originX, centerY + self.originY, math.sqrt(radiusSquared))
+
+
+# Fits a circle to the points from the start and returns the index of the last point
+# of the longest run whose points are all within the tolerance of the circle fitted
+# to them, and the circle, which is None if fewer than three points fit.  Points are
+# added until the next one isn't within the tolerance of the circle fitted to the
+# points up to it, or the stop index is reached.  The whole run is checked when its
+# length reaches minPoints and each time it doubles after that, and the last end
+# point whose whole run fits is then found by a binary search between the longest
+# run that was checked and the point where the fit broke, so the time is close to
+# linear in the length of the run.
+def _fitArc(xs, ys, start, stop, tolerance, minPoints = 3):
+    fit = _CircleFit(xs[start], ys[start])
+    fit.addPoint(xs[start], ys[start])
+    fit.addPoint(xs[start+1], ys[start+1])
+    # The circle fitted to the points from the start to the start + i.
+    circles = [None, None]
+    fitEnd = start + 1
+    brokenEnd = stop
+    checkEnd = start + max(minPoints, 3) - 1
+    for i in range(start + 2, stop):
+        x = xs[i]
+        y = ys[i]
+        fit.addPoint(x, y)
+        circle = fit.getCircle()
+        circles.append(circle)
+        if circle is None or abs(math.hypot(x - circle[0], y - circle[1]) - circle[2]) > tolerance:
+            brokenEnd = i
+            break
+
+        if i == checkEnd or i == stop - 1:
+            if _getFirstPointOffCircle(xs, ys, start, i, circle, tolerance) is not None:
+                brokenEnd = i
+                break
+            fitEnd = i
+            checkEnd = start + 2 * (i - start)
+
+    while brokenEnd - fitEnd > 1:
+        end = int((fitEnd + brokenEnd) / 2)
+        circle = circles[end - start]
+        if circle is not None and _getFirstPointOffCircle(xs, ys, start, end, circle, tolerance) is None:
+            fitEnd = end
+        else:
+            brokenEnd = end
+
+    return fitEnd, circles[fitEnd - start]
+
+
+# Returns the index of the first point from the start to the end index that's
+# further than the tolerance from the circle, or None if they're all within it.
+def _getFirstPointOffCircle(xs, ys, start, end, circle, tolerance):
+    centerX, centerY, radius = circle
+    for i in range(start, end + 1):
+        if abs(math.hypot(xs[i] - centerX, ys[i] - centerY) - radius) > tolerance:
+            return i
+    return None
+
+
+# Returns True if the points from the start to the end index are all within the
+# tolerance of the line through the start and end points.
+def _isOnLine(xs, ys, start, end, tolerance):
+    directionX = xs[end] - xs[start]
+    directionY = ys[end] - ys[start]
+    length = math.hypot(directionX, directionY)
+    if length <= _pointTol:
+        return False
+
+    for i in range(start + 1, end):
+        if abs((xs[i] - xs[start]) * directionY - (ys[i] - ys[start]) * directionX) > tolerance * length:
+            return False
+    return True
+
+
+# Returns a list with a flag for each of the points that's true if the point is kept
+# when the spans of the points are simplified to within the tolerance.  Each span is
+# a tuple of the index of the points at its ends, which are always kept.  The point
+# furthest from the line between the ends of a span is kept, when it's outside the
+# tolerance, and the span is split there.
+def _simplifySpans(points, spans, tolerance):
+    isKept = [False] * len(points)
+    for start, end in spans:
+        isKept[start] = True
+        isKept[end] = True
+
+    spans = list(spans)
+    while spans:
+        start, end = spans.pop()
+        if end - start < 2:
+            continue
+
+        furthest = None
+        distance = -1
+        for i in range(start + 1, end):
+            pointDistance = _getSegmentDistance(points[i], points[start], points[end])
+            if pointDistance > distance:
+                furthest = i
+                distance = pointDistance
+
+        if distance > tolerance:
+            isKept[furthest] = True
+            spans.append((start, furthest))
+            spans.append((furthest, end))
+
+    return isKept
+
+
+# Vectorized version of _simplifySpans for an (n, 3) array of points that returns
+# an array of flags.  All of the spans are split at once, so the number of passes
+# is the depth of the splitting instead of the number of spans.
+def _simplifySpansVectorized(points, spans, tolerance):
+    starts = numpy.array([span[0] for span in spans], dtype = numpy.int64)
+    ends = numpy.array([span[1] for span in spans], dtype = numpy.int64)
+    isKept = numpy.zeros(len(points), dtype = bool)
+    isKept[starts] = True
+    isKept[ends] = True
+
+    while True:
+        # Only the spans with points between their ends need to be checked.
+        hasPoints = ends - starts > 1
+        starts = starts[hasPoints]
+        ends = ends[hasPoints]
+        if len(starts) == 0:
+            break
+
+        # Get the index of every point between the ends of a span and the span it's in.
+        counts = ends - starts - 1
+        firsts = numpy.cumsum(counts) - counts
+        spanIndex = numpy.repeat(numpy.arange(len(starts)), counts)
+        pointIndex = numpy.arange(len(spanIndex)) - firsts[spanIndex] + starts[spanIndex] + 1
+        distances = _getSegmentDistances(points[pointIndex], points[starts[spanIndex]], points[ends[spanIndex]])
+
+        # Find the first of the points furthest from the line of each span.
+        maxDistances = numpy.maximum.reduceat(distances, firsts)
+        candidates = numpy.flatnonzero(distances == maxDistances[spanIndex])
+        candidates = candidates[numpy.unique(spanIndex[candidates], return_index = True)[1]]
+
+        isSplit = maxDistances > tolerance
+        splits = pointIndex[candidates[isSplit]]
+        isKept[splits] = True
+        starts, ends = numpy.concatenate((starts[isSplit], splits)), numpy.concatenate((splits, ends[isSplit]))
+
+    return isKept
+
+
+# Returns the distance of each point of an (n, 3) array of points from the line
+# segment between the start and end point in the same row of two more arrays.
+def _getSegmentDistances(points, startPoints, endPoints):
+    directions = endPoints - startPoints
+    offsets = points - startPoints
+    lengthsSquared = (directions * directions).sum(axis = 1)
+    factors = (offsets * directions).sum(axis = 1) / numpy.where(lengthsSquared > 0, lengthsSquared, 1)
+    factors = numpy.clip(factors, 0, 1)
+    return numpy.sqrt(((offsets - factors[:, None] * directions) ** 2).sum(axis = 1))
+
+
+# Returns the distance of a point from the line segment between the start and end
+# points, where each point is a sequence of three coordinates.
+def _getSegmentDistance(point, startPoint, endPoint):
+    direction = [endPoint[0] - startPoint[0], endPoint[1] - startPoint[1], endPoint[2] - startPoint[2]]
+    offset = [point[0] - startPoint[0], point[1] - startPoint[1], point[2] - startPoint[2]]
+    lengthSquared = direction[0] * direction[0] + direction[1] * direction[1] + direction[2] * direction[2]
+    factor = 0
+    if lengthSquared > 0:
+        factor = (offset[0] * direction[0] + offset[1] * direction[1] + offset[2] * direction[2]) / lengthSquared
+        factor = min(max(factor, 0), 1)
+
+    return math.sqrt((offset[0] - factor * direction[0]) ** 2 + (offset[1] - factor * direction[1]) ** 2 +
+                     (offset[2] - factor * direction[2]) ** 2)
+
+
+def dumpPoints(points, filename):
+    f = open(filename,'w')
+
+    pointCnt = 0
+    for point in points:
+        if point.pointType == PointType.lineStart:
+            pntType = 'lineStart'
+        elif point.pointType == PointType.lineEnd:
+            pntType = 'lineEnd'
+        elif point.pointType == PointType.lineStartAndEnd:
+            pntType = 'lineStartAndEnd'
+        elif point.pointType == PointType.arcMid:
+            pntType = 'arcMid'
+        elif point.pointType == PointType.unknown:
+            pntType = 'unknown'
+            
+        f.write(str(pointCnt) + '. ' + pntType + ', ' + str(point.x) + ', ' + str(point.y) + ', ' + str(point.z) + '\n' )
+        pointCnt += 1
+    f.close()
+
+
+def dumpLoops(loops, filename):
+    f = open(filename,'w')
+
+    loopCnt = 0
+    for loop in loops:
+        loopCnt += 1
+        f.write('Loop ' + str(loopCnt) + ', isClosed: ' + str(loop.isClosed) + '\n')
+        
+        pointCnt = 0
+        for point in loop.points:
+            if point.pointType == PointType.lineStart:
+                pntType = 'lineStart'
+            elif point.pointType == PointType.lineEnd:
+                pntType = 'lineEnd'
+            elif point.pointType == PointType.lineStartAndEnd:
+                pntType = 'lineStartAndEnd'
+            elif point.pointType == PointType.arcMid:
+                pntType = 'arcMid'
+            elif point.pointType == PointType.unknown:
+                pntType = 'unknown'
+                
+            f.write('    ' + str(pointCnt) + '. ' + pntType + ', ' + str(point.x) + ', ' + str(point.y) + ', ' + str(point.z) + '\n' )
+            pointCnt += 1
+
+    f.close()
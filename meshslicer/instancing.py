@@ -0,0 +1,116 @@
+# Functions to reuse the sections of a mesh that's placed several times, like the
+# occurrences of a component, instead of computing the same sections for each
+# instance, and to skip the instances that the planes don't reach.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .slicing import _getStackPlaneRange
+
+
+# Tolerance used to decide if the planes of two instances are the same, and that
+# the bounding box of a mesh is padded by so rounding can't make a plane miss it.
+_planeTol = 0.000001
+
+
+# The sections of the instances of meshes, where an instance is a mesh and a matrix
+# that transforms it so the planes are parallel to the x-y plane, like the matrix
+# passed to slicing.calculateSections.  When the z axis of the matrices of two
+# instances of a mesh is the same, each plane crosses both instances at the same
+# place on the mesh, so the sections of one instance are the sections of the other
+# moved within the plane.  The sections added are kept until the object is released,
+# so it should only be used for sections computed with the same options.
+class InstanceSections:
+    def __init__(self):
+        self._sections = {}
+
+    # Returns the key of the sections of the mesh with the stack of planes, which is
+    # the same for all of the instances that can share the sections.  The mesh can be
+    # any value that identifies the mesh data.
+    def getKey(self, mesh, matrix, spacing, count):
+        planeKey = tuple(int(round(matrix.getCell(column, 3) / _planeTol)) for column in range(1, 5))
+        return (mesh, planeKey, spacing, count)
+
+    # Saves the sections computed for the instance with the matrix.  The loops are
+    # copied so the sections can be changed, like when they're drawn.
+    def add(self, key, matrix, stackLoops):
+        self._sections[key] = (matrix.copy(), copyStackLoops(stackLoops))
+
+    # Returns a copy of the sections of another instance with the key, moved to the
+    # instance with the matrix, or None if there aren't any.
+    def get(self, key, matrix):
+        sections = self._sections.get(key)
+        if sections is None:
+            return None
+
+        sourceMatrix, stackLoops = sections
+        sourceToInstance = sourceMatrix.copy()
+        sourceToInstance.invert()
+        sourceToInstance.transformBy(matrix)
+
+        stackLoops = copyStackLoops(stackLoops)
+        for loops in stackLoops:
+            for loop in loops or []:
+                loop.transformBy(sourceToInstance)
+        return stackLoops
+
+
+# Returns a list with a copy of the loops of each plane of a stack, or None for a
+# plane without loops.
+def copyStackLoops(stackLoops):
+    return [None if loops is None else [loop.copy() for loop in loops] for loops in stackLoops]
+
+
+# Returns a tuple with the minimum x, y, and z and the maximum x, y, and z of the
+# coordinates, or None if there aren't any.
+def getBoundingBox(nodeCoords):
+    if len(nodeCoords) == 0:
+        return None
+
+    if numpy:
+        coords = numpy.asarray(nodeCoords, dtype = numpy.float64).reshape(-1, 3)
+        return tuple(float(value) for value in coords.min(axis = 0)) + tuple(float(value) for value in coords.max(axis = 0))
+    else:
+        return (min(nodeCoords[0::3]), min(nodeCoords[1::3]), min(nodeCoords[2::3]),
+                max(nodeCoords[0::3]), max(nodeCoords[1::3]), max(nodeCoords[2::3]))
+
+
+# Returns whether none of a stack of planes, the same as for slicing.calculateSections,
+# can cross a mesh with the bounding box after it's transformed by the matrix, so the
+# sections of the mesh don't need to be computed.
+def isStackMissed(box, matrix, spacing, count):
+    if box is None:
+        return True
+
+    minZ = None
+    maxZ = None
+    for x in (box[0], box[3]):
+        for y in (box[1], box[4]):
+            for z in (box[2], box[5]):
+                height = x * matrix.getCell(1, 3) + y * matrix.getCell(2, 3) + z * matrix.getCell(3, 3) + matrix.getCell(4, 3)
+                if minZ is None or height < minZ:
+                    minZ = height
+                if maxZ is None or height > maxZ:
+                    maxZ = height
+    minZ -= _planeTol
+    maxZ += _planeTol
+
+    firstPlane, lastPlane = _getStackPlaneRange(minZ, maxZ, spacing, count)
+    for planeIndex in range(firstPlane, lastPlane + 1):
+        height = spacing * planeIndex
+        if maxZ >= height and minZ < height:
+            return False
+    return True
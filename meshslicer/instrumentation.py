@@ -0,0 +1,192 @@
+# Classes used to measure the work done while computing sections, to report their
+# progress and cancel them, and to write debug information.  None of them are used
+# unless they're passed to the functions that compute the sections, so nothing is
+# measured or written by default.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import os
+import contextlib
+import time
+
+from .geometry import dumpLoops, dumpPoints
+
+
+# Statistics of one or more section calculations.  The time of each stage is in
+# seconds and doesn't include the time of any stages that were timed within it, so
+# the times of all of the stages add up to the total time.  A triangle is counted as
+# tested each time it's checked against a plane.
+class SectionStats:
+    def __init__(self):
+        self.stageSeconds = {}
+        self.trianglesTested = 0
+        self.trianglesCrossing = 0
+        self.segments = 0
+        self.loopsClosed = 0
+        self.loopsOpen = 0
+        self.pointsRemovedByOptimizeLines = 0
+        self.pointsRemovedByOptimizeArcs = 0
+        self._childSeconds = []
+
+    # Context manager that adds the time spent within it to the stage.
+    @contextlib.contextmanager
+    def timeStage(self, name):
+        self._childSeconds.append(0)
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - startTime
+            childSeconds = self._childSeconds.pop()
+            self.stageSeconds[name] = self.stageSeconds.get(name, 0) + seconds - childSeconds
+            if self._childSeconds:
+                self._childSeconds[-1] += seconds
+
+    # Adds the statistics of another calculation, like one done in another process,
+    # to these.
+    def add(self, other):
+        for name, seconds in other.stageSeconds.items():
+            self.stageSeconds[name] = self.stageSeconds.get(name, 0) + seconds
+        self.trianglesTested += other.trianglesTested
+        self.trianglesCrossing += other.trianglesCrossing
+        self.segments += other.segments
+        self.loopsClosed += other.loopsClosed
+        self.loopsOpen += other.loopsOpen
+        self.pointsRemovedByOptimizeLines += other.pointsRemovedByOptimizeLines
+        self.pointsRemovedByOptimizeArcs += other.pointsRemovedByOptimizeArcs
+
+    def totalSeconds(self):
+        return sum(self.stageSeconds.values())
+
+    def asDict(self):
+        return {'stageSeconds': dict(self.stageSeconds),
+                'trianglesTested': self.trianglesTested,
+                'trianglesCrossing': self.trianglesCrossing,
+                'segments': self.segments,
+                'loopsClosed': self.loopsClosed,
+                'loopsOpen': self.loopsOpen,
+                'pointsRemovedByOptimizeLines': self.pointsRemovedByOptimizeLines,
+                'pointsRemovedByOptimizeArcs': self.pointsRemovedByOptimizeArcs}
+
+    def asString(self):
+        result = ''
+        for name, seconds in self.stageSeconds.items():
+            result += name + ': ' + '{:.3f}'.format(seconds) + ' s\n'
+        result += 'Triangles tested: ' + str(self.trianglesTested) + ', crossing: ' + str(self.trianglesCrossing) + '\n'
+        result += 'Segments: ' + str(self.segments) + '\n'
+        result += 'Loops closed: ' + str(self.loopsClosed) + ', open: ' + str(self.loopsOpen) + '\n'
+        result += 'Points removed by optimizeLines: ' + str(self.pointsRemovedByOptimizeLines) + ', optimizeArcs: ' + str(self.pointsRemovedByOptimizeArcs)
+        return result
+
+
+# Returns a context manager that times the stage when there are stats, and does
+# nothing when the stats are None.
+def timeStage(stats, name):
+    if stats is None:
+        return contextlib.nullcontext()
+    else:
+        return stats.timeStage(name)
+
+
+# Raised at a checkpoint of a SectionProgress when the calculation is cancelled or
+# its time budget is used up.  The functions that compute the sections of a stack of
+# planes save the loops of the planes they finished in stackLoops, with None for the
+# others, so the partial results can still be used.
+class SectionCancelled(Exception):
+    def __init__(self, message, isOverBudget = False):
+        super().__init__(message)
+        self.isOverBudget = isOverBudget
+        self.stackLoops = None
+
+
+# Progress of a section calculation.  The functions that compute sections do their
+# work in chunks and call checkpoint after each one, which reports the progress to
+# the callback at most once every interval seconds.  The callback is passed the
+# fraction of the work that's done and returns True to cancel the calculation, and
+# it's where an application can process its events so it stays responsive.  When
+# there's a time budget, in seconds, the calculation is stopped once it's used up.
+class SectionProgress:
+    def __init__(self, callback = None, timeBudget = None, interval = 0.1):
+        self.callback = callback
+        self.timeBudget = timeBudget
+        self.interval = interval
+        self.fraction = 0
+        self.isCancelled = False
+        self.isOverBudget = False
+        self._startTime = time.perf_counter()
+        self._callTime = self._startTime
+        self._parts = [(0.0, 1.0)]
+
+    # Context manager for a part of the work that goes from the start to the end
+    # fraction of the part it's within, so the checkpoints within it report the
+    # progress of the whole calculation.
+    @contextlib.contextmanager
+    def part(self, start, end):
+        outerStart, outerEnd = self._parts[-1]
+        self._parts.append((outerStart + (outerEnd - outerStart) * start, outerStart + (outerEnd - outerStart) * end))
+        try:
+            yield
+        finally:
+            self._parts.pop()
+
+    # Records that done out of total items of the current part are finished.  Raises
+    # SectionCancelled if the calculation has been cancelled or is over its budget.
+    def checkpoint(self, done, total):
+        partStart, partEnd = self._parts[-1]
+        if total > 0:
+            self.fraction = partStart + (partEnd - partStart) * min(done / total, 1)
+
+        now = time.perf_counter()
+        if self.callback and now - self._callTime >= self.interval:
+            self._callTime = now
+            if self.callback(self.fraction):
+                self.isCancelled = True
+        if self.timeBudget is not None and now - self._startTime > self.timeBudget:
+            self.isOverBudget = True
+
+        if self.isCancelled:
+            raise SectionCancelled('The section calculation was cancelled.')
+        elif self.isOverBudget:
+            raise SectionCancelled('The time budget of the section calculation was used up.', True)
+
+
+# Calls checkpoint when there's a progress, and does nothing when it's None.
+def checkpoint(progress, done, total):
+    if progress is not None:
+        progress.checkpoint(done, total)
+
+
+# Returns a context manager for a part of the work when there's a progress, and one
+# that does nothing when it's None.
+def progressPart(progress, start, end):
+    if progress is None:
+        return contextlib.nullcontext()
+    else:
+        return progress.part(start, end)
+
+
+# Debug sink that writes the points of each loop before its arcs are found, and the
+# loops of each section, to numbered files in a folder.  Any object with dumpPoints
+# and dumpLoops methods can be used as a debug sink.
+class FileDebugSink:
+    def __init__(self, folder):
+        self.folder = folder
+        self._pointsCount = 0
+        self._loopsCount = 0
+
+    def dumpPoints(self, points):
+        self._pointsCount += 1
+        dumpPoints(points, os.path.join(self.folder, 'PointsDump' + str(self._pointsCount) + '.txt'))
+
+    def dumpLoops(self, loops):
+        self._loopsCount += 1
+        dumpLoops(loops, os.path.join(self.folder, 'LoopDump' + str(self._loopsCount) + '.txt'))
@@ -0,0 +1,149 @@
+# Index of the height range of each triangle of a mesh, used to quickly find the
+# triangles that cross planes parallel to the x-y plane.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import bisect
+import heapq
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# The triangles are sorted by the lower bound of their height range.  A triangle
+# crosses the plane at a height when its minimum is below the height and its
+# maximum is at or above it, which is the same test used when slicing.  Because no
+# triangle spans more than the largest span, only the triangles whose minimum is
+# within that span below the height need to be checked.  The order of the triangles
+# can be given when it's already known, like when it was saved in a MeshDiskCache,
+# so they don't need to be sorted again.  A given order that doesn't sort the
+# triangles, like one from heights that are offset and differ by rounding, is
+# sorted again.
+class HeightIntervalIndex:
+    def __init__(self, minHeights, maxHeights, order = None):
+        if numpy:
+            minHeights = numpy.asarray(minHeights, dtype = numpy.float64)
+            maxHeights = numpy.asarray(maxHeights, dtype = numpy.float64)
+            if order is None:
+                self.order = numpy.argsort(minHeights, kind = 'stable')
+            else:
+                self.order = numpy.asarray(order, dtype = numpy.int64)
+                if numpy.any(minHeights[self.order[1:]] < minHeights[self.order[:-1]]):
+                    self.order = self.order[numpy.argsort(minHeights[self.order], kind = 'stable')]
+            self.sortedMin = minHeights[self.order]
+            self.sortedMax = maxHeights[self.order]
+            maxSpan = float((maxHeights - minHeights).max(initial = 0))
+        else:
+            if order is None:
+                self.order = sorted(range(0, len(minHeights)), key = minHeights.__getitem__)
+            else:
+                self.order = list(order)
+                if any(minHeights[self.order[i+1]] < minHeights[self.order[i]] for i in range(0, len(self.order) - 1)):
+                    self.order.sort(key = minHeights.__getitem__)
+            self.sortedMin = [minHeights[i] for i in self.order]
+            self.sortedMax = [maxHeights[i] for i in self.order]
+            maxSpan = 0
+            for i in range(0, len(minHeights)):
+                maxSpan = max(maxSpan, maxHeights[i] - minHeights[i])
+
+        # The span is padded so rounding can't exclude a triangle from a query.
+        self.maxSpan = maxSpan * 1.000001 + 0.000000001
+
+    def __len__(self):
+        return len(self.order)
+
+    # Returns the approximate number of bytes used by the index.
+    def byteSize(self):
+        if numpy:
+            return self.order.nbytes + self.sortedMin.nbytes + self.sortedMax.nbytes
+        else:
+            # A list stores a pointer to each Python number, which is at least 24 bytes.
+            return len(self.order) * 3 * 32
+
+    # Returns the indices of the triangles that cross the plane at the height.
+    def query(self, height):
+        if numpy:
+            first = numpy.searchsorted(self.sortedMin, height - self.maxSpan, side = 'left')
+            last = numpy.searchsorted(self.sortedMin, height, side = 'left')
+            isCrossing = self.sortedMax[first:last] >= height
+            return self.order[first:last][isCrossing]
+        else:
+            first = bisect.bisect_left(self.sortedMin, height - self.maxSpan)
+            last = bisect.bisect_left(self.sortedMin, height)
+            triangles = []
+            for i in range(first, last):
+                if self.sortedMax[i] >= height:
+                    triangles.append(self.order[i])
+            return triangles
+
+    # Generator that returns a tuple for each of the heights with the position of the
+    # height in the input list and the indices of the triangles that cross the plane at
+    # that height.  The heights are processed from lowest to highest, keeping a set of
+    # active triangles where triangles are added as the heights pass their minimum and
+    # retired as they pass their maximum, so the work for each height depends on the
+    # triangles that cross it and the planes before it rather than the largest span.
+    def sweep(self, heights):
+        heightOrder = sorted(range(0, len(heights)), key = heights.__getitem__)
+
+        if numpy:
+            # The active triangles are kept as their positions in the sorted arrays, and
+            # the triangles added for a height come after them, so the triangles are in
+            # the same order as those returned by query.
+            active = numpy.zeros(0, dtype = numpy.int64)
+            nextTriangle = 0
+            for heightIndex in heightOrder:
+                height = heights[heightIndex]
+                lastTriangle = int(numpy.searchsorted(self.sortedMin, height, side = 'left'))
+                added = numpy.arange(nextTriangle, lastTriangle, dtype = numpy.int64)
+                nextTriangle = max(nextTriangle, lastTriangle)
+
+                active = numpy.concatenate((active, added))
+                active = active[self.sortedMax[active] >= height]
+                yield heightIndex, self.order[active]
+            return
+
+        active = []
+        nextTriangle = 0
+        for heightIndex in heightOrder:
+            height = heights[heightIndex]
+
+            # Add the triangles whose minimum is below the height.
+            while nextTriangle < len(self.order) and self.sortedMin[nextTriangle] < height:
+                heapq.heappush(active, (self.sortedMax[nextTriangle], self.order[nextTriangle]))
+                nextTriangle += 1
+
+            # Retire the triangles whose maximum is below the height.
+            while active and active[0][0] < height:
+                heapq.heappop(active)
+
+            yield heightIndex, [triangle for maxHeight, triangle in active]
+
+
+# Builds the index for the triangles of a mesh from the height of each node, like
+# the distances of the nodes from a plane returned by calculatePlaneDistances.
+def buildDistanceIntervalIndex(distances, nodeIndices, order = None):
+    if numpy:
+        indices = numpy.asarray(nodeIndices, dtype = numpy.int64).reshape(-1, 3)
+        z = numpy.asarray(distances, dtype = numpy.float64)[indices]
+        return HeightIntervalIndex(z.min(axis = 1), z.max(axis = 1), order)
+    else:
+        minHeights = []
+        maxHeights = []
+        for i in range(0, int(len(nodeIndices)/3)):
+            z1 = distances[nodeIndices[i*3]]
+            z2 = distances[nodeIndices[i*3+1]]
+            z3 = distances[nodeIndices[i*3+2]]
+            minHeights.append(min(z1, z2, z3))
+            maxHeights.append(max(z1, z2, z3))
+        return HeightIntervalIndex(minHeights, maxHeights, order)
@@ -0,0 +1,329 @@
+# Functions to read triangle meshes from STL, OBJ, and PLY files.  The meshes are
+# returned as flat arrays of coordinates and indices in the same layout as the
+# nodeCoordinatesAsDouble and nodeIndices properties of a Fusion mesh.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import os
+import mmap
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Reads the mesh in the file, using the extension of the file to determine its format,
+# and returns a tuple with the node coordinates and node indices.
+def readMesh(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.stl':
+        return readStl(filename)
+    elif extension == '.obj':
+        return readObj(filename)
+    elif extension == '.ply':
+        return readPly(filename)
+    else:
+        raise ValueError('Unsupported mesh file type "' + extension + '".')
+
+
+# Reads a binary or ASCII STL file.  STL files store the corners of each triangle
+# separately so the corners at the same location are merged into a single node.
+def readStl(filename):
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    # A binary file can also begin with "solid", so the size of the file is checked
+    # against the triangle count in the header to determine if it's binary.
+    isBinary = False
+    if len(data) >= 84:
+        triangleCount = struct.unpack_from('<I', data, 80)[0]
+        isBinary = len(data) == 84 + triangleCount * 50
+    if not isBinary and not data.lstrip().startswith(b'solid'):
+        raise ValueError('"' + filename + '" is not a valid STL file.')
+
+    if isBinary:
+        if numpy:
+            records = numpy.frombuffer(data, dtype = _stlRecordType, count = triangleCount, offset = 84)
+            cornerCoords = records['corners'].astype(numpy.float64).reshape(-1)
+        else:
+            cornerCoords = []
+            for record in struct.iter_unpack('<12fH', data[84:]):
+                cornerCoords.extend(record[3:12])
+    else:
+        cornerCoords = []
+        for line in data.decode('ascii', 'replace').splitlines():
+            words = line.split()
+            if len(words) == 4 and words[0] == 'vertex':
+                cornerCoords.extend((float(words[1]), float(words[2]), float(words[3])))
+
+    return mergeNodes(cornerCoords)
+
+
+# Generator that memory maps a binary STL file and returns the triangles in chunks of
+# up to chunkSize triangles.  With numpy each chunk is an (n, 3, 3) float32 array that
+# is a view of the corners in the 50 byte records of the file, so nothing is read
+# until the chunk is used.  Otherwise each chunk is a flat list of nine coordinates
+# per triangle.  The corners aren't merged, so the chunks can be passed directly to
+# slicing.calculateStreamedSections.
+def readStlChunks(filename, chunkSize = 65536):
+    with open(filename, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        triangleCount = 0
+        if size >= 84:
+            triangleCount = struct.unpack('<I', f.read(84)[80:84])[0]
+        if size < 84 or size != 84 + triangleCount * 50:
+            raise ValueError('"' + filename + '" is not a binary STL file.')
+        if triangleCount == 0:
+            return
+
+        # The map stays open after the file is closed.  It isn't closed here because
+        # the chunks still refer to it and it's released when the last one is.
+        data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+    if numpy:
+        corners = numpy.frombuffer(data, dtype = _stlRecordType, count = triangleCount, offset = 84)['corners']
+        for start in range(0, triangleCount, chunkSize):
+            yield corners[start:start + chunkSize]
+    else:
+        for start in range(0, triangleCount, chunkSize):
+            end = min(start + chunkSize, triangleCount)
+            chunk = []
+            for record in struct.iter_unpack('<12fH', data[84 + start * 50:84 + end * 50]):
+                chunk.extend(record[3:12])
+            yield chunk
+
+
+# Reads the vertices and faces of an OBJ file.  Faces with more than three sides are
+# split into a fan of triangles.
+def readObj(filename):
+    nodeCoords = []
+    nodeIndices = []
+    with open(filename, 'r', errors = 'replace') as f:
+        for line in f:
+            words = line.split()
+            if len(words) == 0:
+                continue
+            elif words[0] == 'v':
+                nodeCoords.extend((float(words[1]), float(words[2]), float(words[3])))
+            elif words[0] == 'f':
+                # Each corner is "v", "v/vt", "v//vn" or "v/vt/vn" and the indices are
+                # one based, or relative to the end of the list when negative.
+                nodeCount = int(len(nodeCoords)/3)
+                corners = []
+                for word in words[1:]:
+                    index = int(word.split('/')[0])
+                    if index < 0:
+                        corners.append(nodeCount + index)
+                    else:
+                        corners.append(index - 1)
+
+                for i in range(1, len(corners) - 1):
+                    nodeIndices.extend((corners[0], corners[i], corners[i+1]))
+
+    return _asArrays(nodeCoords, nodeIndices)
+
+
+# Reads the vertices and faces of an ASCII or binary PLY file.  Faces with more than
+# three sides are split into a fan of triangles.
+def readPly(filename):
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    # Read the header, which describes each element and its properties.
+    headerEnd = data.find(b'end_header')
+    if not data.startswith(b'ply') or headerEnd < 0:
+        raise ValueError('"' + filename + '" is not a valid PLY file.')
+    bodyStart = data.index(b'\n', headerEnd) + 1
+
+    fileFormat = None
+    elements = []
+    for line in data[:headerEnd].decode('ascii', 'replace').splitlines():
+        words = line.split()
+        if len(words) == 0:
+            continue
+        elif words[0] == 'format':
+            fileFormat = words[1]
+        elif words[0] == 'element':
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == 'property' and elements:
+            if words[1] == 'list':
+                # A list property has the type of its length and the type of its values.
+                elements[-1][2].append((words[4], (words[2], words[3])))
+            else:
+                elements[-1][2].append((words[2], words[1]))
+
+    if fileFormat == 'ascii':
+        reader = _PlyAsciiReader(data[bodyStart:])
+    elif fileFormat == 'binary_little_endian':
+        reader = _PlyBinaryReader(data, bodyStart, '<')
+    elif fileFormat == 'binary_big_endian':
+        reader = _PlyBinaryReader(data, bodyStart, '>')
+    else:
+        raise ValueError('Unsupported PLY format "' + str(fileFormat) + '".')
+
+    nodeCoords = []
+    nodeIndices = []
+    for name, count, properties in elements:
+        propertyNames = [propertyName for propertyName, propertyType in properties]
+        for i in range(0, count):
+            values = reader.readElement(properties)
+            if name == 'vertex':
+                nodeCoords.extend((values[propertyNames.index('x')],
+                                   values[propertyNames.index('y')],
+                                   values[propertyNames.index('z')]))
+            elif name == 'face':
+                if 'vertex_indices' in propertyNames:
+                    corners = values[propertyNames.index('vertex_indices')]
+                else:
+                    corners = values[propertyNames.index('vertex_index')]
+
+                for j in range(1, len(corners) - 1):
+                    nodeIndices.extend((corners[0], corners[j], corners[j+1]))
+
+    return _asArrays(nodeCoords, nodeIndices)
+
+
+# Merges the corners of a triangle soup that are at the same location and returns a
+# tuple with the node coordinates and node indices.
+def mergeNodes(cornerCoords):
+    if numpy:
+        corners = numpy.asarray(cornerCoords, dtype = numpy.float64).reshape(-1, 3)
+        nodes, nodeIndices = numpy.unique(corners, axis = 0, return_inverse = True)
+        return nodes.reshape(-1), nodeIndices.reshape(-1).astype(numpy.int64)
+    else:
+        nodeCoords = []
+        nodeIndices = []
+        nodes = {}
+        for i in range(0, int(len(cornerCoords)/3)):
+            key = (cornerCoords[i*3], cornerCoords[i*3+1], cornerCoords[i*3+2])
+            index = nodes.get(key)
+            if index is None:
+                index = len(nodes)
+                nodes[key] = index
+                nodeCoords.extend(key)
+            nodeIndices.append(index)
+        return nodeCoords, nodeIndices
+
+
+# Merges the nodes of a mesh that are at the same location, like the nodes that are
+# repeated along the sharp edges of a display mesh so each face can have its own
+# normals, and returns a tuple with the welded node coordinates and node indices.
+# The triangles of the welded mesh share the edges between them, so the adjacency of
+# the triangles can be found from their node indices.
+def weldNodes(nodeCoords, nodeIndices):
+    weldedCoords, nodeMap = mergeNodes(nodeCoords)
+    if numpy:
+        return weldedCoords, nodeMap[numpy.asarray(nodeIndices, dtype = numpy.int64)]
+    else:
+        return weldedCoords, [nodeMap[i] for i in nodeIndices]
+
+
+# Combines several meshes into one so they can be sectioned together, and returns a
+# tuple with the node coordinates, the node indices, and the index in the list of the
+# mesh each triangle is from.  Each mesh is a tuple of its node coordinates and node
+# indices.  The nodes of the meshes aren't welded to each other, so the triangles of
+# different meshes never share an edge.
+def mergeMeshes(meshes):
+    if numpy:
+        nodeCoords = [numpy.zeros(0)]
+        nodeIndices = [numpy.zeros(0, dtype = numpy.int64)]
+        triangleBodies = [numpy.zeros(0, dtype = numpy.int64)]
+        nodeCount = 0
+        for bodyId in range(0, len(meshes)):
+            coords = numpy.asarray(meshes[bodyId][0], dtype = numpy.float64)
+            indices = numpy.asarray(meshes[bodyId][1], dtype = numpy.int64)
+            nodeCoords.append(coords)
+            nodeIndices.append(indices + nodeCount)
+            triangleBodies.append(numpy.full(int(len(indices)/3), bodyId, dtype = numpy.int64))
+            nodeCount += int(len(coords)/3)
+        return numpy.concatenate(nodeCoords), numpy.concatenate(nodeIndices), numpy.concatenate(triangleBodies)
+    else:
+        nodeCoords = []
+        nodeIndices = []
+        triangleBodies = []
+        for bodyId in range(0, len(meshes)):
+            coords, indices = meshes[bodyId]
+            nodeCount = int(len(nodeCoords)/3)
+            nodeCoords.extend(coords)
+            nodeIndices.extend(index + nodeCount for index in indices)
+            triangleBodies.extend([bodyId] * int(len(indices)/3))
+        return nodeCoords, nodeIndices, triangleBodies
+
+
+# The layout of a triangle in a binary STL file.
+if numpy:
+    _stlRecordType = numpy.dtype([('normal', '<f4', (3,)), ('corners', '<f4', (3, 3)), ('attributes', '<u2')])
+
+
+# The struct formats of the PLY property types.
+_plyTypes = {'char': 'b', 'int8': 'b', 'uchar': 'B', 'uint8': 'B',
+             'short': 'h', 'int16': 'h', 'ushort': 'H', 'uint16': 'H',
+             'int': 'i', 'int32': 'i', 'uint': 'I', 'uint32': 'I',
+             'float': 'f', 'float32': 'f', 'double': 'd', 'float64': 'd'}
+
+
+# Reads the values of the elements in the body of an ASCII PLY file.
+class _PlyAsciiReader:
+    def __init__(self, body):
+        self._words = iter(body.split())
+
+    def readElement(self, properties):
+        values = []
+        for propertyName, propertyType in properties:
+            if isinstance(propertyType, tuple):
+                count = int(next(self._words))
+                values.append([self._readValue(propertyType[1]) for i in range(0, count)])
+            else:
+                values.append(self._readValue(propertyType))
+        return values
+
+    def _readValue(self, propertyType):
+        word = next(self._words)
+        if _plyTypes[propertyType] in 'fd':
+            return float(word)
+        else:
+            return int(word)
+
+
+# Reads the values of the elements in the body of a binary PLY file.
+class _PlyBinaryReader:
+    def __init__(self, data, offset, byteOrder):
+        self._data = data
+        self._offset = offset
+        self._byteOrder = byteOrder
+
+    def readElement(self, properties):
+        values = []
+        for propertyName, propertyType in properties:
+            if isinstance(propertyType, tuple):
+                count = self._readValues(propertyType[0], 1)[0]
+                values.append(list(self._readValues(propertyType[1], count)))
+            else:
+                values.append(self._readValues(propertyType, 1)[0])
+        return values
+
+    def _readValues(self, propertyType, count):
+        valueFormat = self._byteOrder + str(count) + _plyTypes[propertyType]
+        values = struct.unpack_from(valueFormat, self._data, self._offset)
+        self._offset += struct.calcsize(valueFormat)
+        return values
+
+
+# Returns the coordinates and indices as numpy arrays, when numpy is available, so
+# they're in the same form as the data of a cached mesh.
+def _asArrays(nodeCoords, nodeIndices):
+    if numpy:
+        return numpy.asarray(nodeCoords, dtype = numpy.float64), numpy.asarray(nodeIndices, dtype = numpy.int64)
+    else:
+        return nodeCoords, nodeIndices
@@ -0,0 +1,168 @@
+# Functions to find which of the closed loops of a section are inside which, so the
+# outer boundaries of the section can be told from its holes and the islands within
+# the holes.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import bisect
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .instrumentation import timeStage
+
+
+# Sets the parent, children, and depth of the loops of a section, seen from above the
+# x-y plane, and returns a list of the loops that aren't inside another loop.  The
+# parent of a closed loop is the smallest closed loop that contains it.  Loops that
+# aren't closed aren't nested, so their depth is None.  When orient is True the
+# loops are reversed as needed so the loops at an even depth, the outer boundaries
+# and the islands in the holes, are counterclockwise and the holes are clockwise.
+#
+# The loops a loop can be within are found with a grid of the bounding boxes of the
+# loops, and only the loops whose bounding box contains the loop's bounding box and
+# that have a larger area are tested.  The tests of all of the loops that can be
+# within a loop are done together by sorting their points by y, so each edge of the
+# loop is only checked against the points level with it.  The areas and bounding
+# boxes of the loops include their arcs, and each arc is tested as lines along it.
+def nestLoops(loops, orient = False, stats = None):
+    with timeStage(stats, 'nestLoops'):
+        closedLoops = []
+        for loop in loops:
+            loop.parent = None
+            loop.children = []
+            loop.depth = None
+            if loop.isClosed and loop.pointCount() > 2:
+                closedLoops.append(loop)
+
+        areas = [loop.area() for loop in closedLoops]
+        boxes = [loop.boundingBox() for loop in closedLoops]
+
+        # Test the first point of each loop against each loop it can be within.
+        candidates = _getCandidates(areas, boxes)
+        parents = [-1] * len(closedLoops)
+        for outer, inners in candidates.items():
+            points = [closedLoops[inner].getPoint(0) for inner in inners]
+            isInside = _arePointsInside(closedLoops[outer].polygonCoordinates(), [point.x for point in points],
+                                        [point.y for point in points])
+            for i in range(0, len(inners)):
+                inner = inners[i]
+                if isInside[i] and (parents[inner] < 0 or abs(areas[outer]) < abs(areas[parents[inner]])):
+                    parents[inner] = outer
+
+        # A parent has a larger area than its children, so it has its depth before them.
+        roots = []
+        for i in sorted(range(0, len(closedLoops)), key = lambda i: -abs(areas[i])):
+            loop = closedLoops[i]
+            if parents[i] < 0:
+                loop.depth = 0
+                roots.append(loop)
+            else:
+                loop.parent = closedLoops[parents[i]]
+                loop.parent.children.append(loop)
+                loop.depth = loop.parent.depth + 1
+
+            if orient and (areas[i] > 0) != (loop.depth % 2 == 0):
+                loop.reverse()
+
+    return roots
+
+
+# Returns a dictionary from the index of each loop to a list of the indices of the
+# loops that can be within it.  The bounding boxes of the loops are added to the cells
+# of a grid they cover, and the loops a loop can be within are in the cell of its
+# first corner.
+def _getCandidates(areas, boxes):
+    candidates = {}
+    if len(boxes) < 2:
+        return candidates
+
+    minX = min(box[0] for box in boxes)
+    minY = min(box[1] for box in boxes)
+    maxX = max(box[3] for box in boxes)
+    maxY = max(box[4] for box in boxes)
+    cellCount = int(math.ceil(math.sqrt(len(boxes))))
+    cellWidth = (maxX - minX) / cellCount or 1
+    cellHeight = (maxY - minY) / cellCount or 1
+
+    def getCell(x, y):
+        return (min(int((x - minX) / cellWidth), cellCount - 1), min(int((y - minY) / cellHeight), cellCount - 1))
+
+    cells = {}
+    for i in range(0, len(boxes)):
+        firstColumn, firstRow = getCell(boxes[i][0], boxes[i][1])
+        lastColumn, lastRow = getCell(boxes[i][3], boxes[i][4])
+        for column in range(firstColumn, lastColumn + 1):
+            for row in range(firstRow, lastRow + 1):
+                cells.setdefault((column, row), []).append(i)
+
+    for i in range(0, len(boxes)):
+        box = boxes[i]
+        for j in cells[getCell(box[0], box[1])]:
+            other = boxes[j]
+            if (abs(areas[j]) > abs(areas[i]) and other[0] <= box[0] and other[1] <= box[1] and
+                    other[3] >= box[3] and other[4] >= box[4]):
+                candidates.setdefault(j, []).append(i)
+
+    return candidates
+
+
+# Returns a list of whether each of the points is inside the polygon whose points are
+# the flat array of x, y, and z coordinates, by counting the edges of the polygon
+# that a line from the point in the x direction crosses.  The points are sorted by y
+# so the points level with each edge are found with a binary search.
+def _arePointsInside(coords, pointsX, pointsY):
+    if numpy:
+        polygon = numpy.asarray(coords, dtype = numpy.float64).reshape(-1, 3)
+        startX = polygon[:, 0]
+        startY = polygon[:, 1]
+        endX = numpy.roll(startX, -1)
+        endY = numpy.roll(startY, -1)
+
+        pointsX = numpy.asarray(pointsX, dtype = numpy.float64)
+        pointsY = numpy.asarray(pointsY, dtype = numpy.float64)
+        order = numpy.argsort(pointsY, kind = 'stable')
+        sortedY = pointsY[order]
+
+        # Pair each edge with the points at or above its lower end and below its upper end.
+        first = numpy.searchsorted(sortedY, numpy.minimum(startY, endY), side = 'left')
+        last = numpy.searchsorted(sortedY, numpy.maximum(startY, endY), side = 'left')
+        pairCounts = last - first
+        pairEdges = numpy.repeat(numpy.arange(len(startX)), pairCounts)
+        pairPoints = order[numpy.arange(pairCounts.sum()) - numpy.repeat(numpy.cumsum(pairCounts) - pairCounts - first, pairCounts)]
+
+        edgeStartX = startX[pairEdges]
+        edgeStartY = startY[pairEdges]
+        crossingX = edgeStartX + (pointsY[pairPoints] - edgeStartY) * (endX[pairEdges] - edgeStartX) / (endY[pairEdges] - edgeStartY)
+        crossings = numpy.bincount(pairPoints[pointsX[pairPoints] < crossingX], minlength = len(pointsX))
+        return (crossings % 2 == 1).tolist()
+    else:
+        order = sorted(range(0, len(pointsY)), key = pointsY.__getitem__)
+        sortedY = [pointsY[i] for i in order]
+        crossings = [0] * len(pointsX)
+        pointCount = int(len(coords)/3)
+        for i in range(0, pointCount):
+            j = (i + 1) % pointCount
+            startX = coords[i*3]
+            startY = coords[i*3+1]
+            endX = coords[j*3]
+            endY = coords[j*3+1]
+            first = bisect.bisect_left(sortedY, min(startY, endY))
+            last = bisect.bisect_left(sortedY, max(startY, endY))
+            for k in range(first, last):
+                point = order[k]
+                if pointsX[point] < startX + (pointsY[point] - startY) * (endX - startX) / (endY - startY):
+                    crossings[point] += 1
+        return [count % 2 == 1 for count in crossings]
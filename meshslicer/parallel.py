@@ -0,0 +1,294 @@
+# Computes sections in a pool of processes.  The data of each mesh is published once
+# to shared memory and each job only sends the plane definition to a worker process
+# and gets the resulting section loops back.  When the adjacency of the triangles of
+# a mesh is published with it, the loops are traced across the edges of the
+# triangles, the same as in the process that creates the pool.  The jobs check an
+# event shared with the workers as they work, so they can be cancelled.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import os, sys
+import array
+import concurrent.futures
+import multiprocessing
+from multiprocessing import shared_memory
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .geometry import MyMatrix
+from .instrumentation import SectionCancelled, SectionProgress, SectionStats, timeStage
+from .intervals import buildDistanceIntervalIndex
+from . import slicing, tracing
+
+
+# Pool of processes that compute the sections of meshes.  The pool should be closed,
+# or used in a with statement, so the processes are stopped and the shared memory
+# is released.
+class SectionJobPool:
+    def __init__(self, workerCount = None):
+        executable = findPythonExecutable()
+        if not executable:
+            raise RuntimeError('The Python executable used to run the worker processes was not found.')
+
+        # Worker processes are always started as new Python processes, rather than forked,
+        # because the process that creates the pool can be a host application.
+        context = multiprocessing.get_context('spawn')
+        context.set_executable(executable)
+
+        if not workerCount:
+            workerCount = os.cpu_count() or 1
+        self.workerCount = workerCount
+
+        # The event is passed to each worker process when it starts, so it's shared by
+        # all of the jobs.
+        self._cancelEvent = context.Event()
+        self._executor = concurrent.futures.ProcessPoolExecutor(workerCount, mp_context = context, initializer = _initWorker,
+                                                                initargs = (self._cancelEvent,))
+        self._sharedMeshes = {}
+        self._sharedArrays = {}
+        self._sharedMemory = []
+        self._futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        self.close()
+
+    # Copies the mesh data to shared memory so it can be used by the worker processes and
+    # returns a SharedMesh that identifies it.  The key is used so the same mesh is only
+    # published once.  The adjacency of the triangles, from
+    # slicing.buildTriangleAdjacency, is needed for the loops to be traced, and the
+    # index of the body each triangle is from sets the bodyId of the traced loops of
+    # combined meshes.
+    def publishMesh(self, key, nodeCoords, nodeIndices, adjacency = None, triangleBodies = None):
+        sharedMesh = self._sharedMeshes.get(key)
+        if sharedMesh:
+            return sharedMesh[0]
+
+        sharedMesh = SharedMesh(self.publishArray((key, 'nodeCoords'), nodeCoords, 'd'),
+                                self.publishArray((key, 'nodeIndices'), nodeIndices, 'q'))
+        if adjacency is not None:
+            sharedMesh.adjacency = self.publishArray((key, 'adjacency'), adjacency, 'q')
+        if triangleBodies is not None:
+            sharedMesh.triangleBodies = self.publishArray((key, 'triangleBodies'), triangleBodies, 'q')
+
+        # Keep a reference to the key so it stays unique while the pool is in use.
+        self._sharedMeshes[key] = (sharedMesh, key)
+        return sharedMesh
+
+    # Copies the values to shared memory as 8 byte floats ('d') or integers ('q') and
+    # returns a SharedArray that identifies them.  The key is used so the same values
+    # are only published once.
+    def publishArray(self, key, values, typeCode):
+        sharedArray = self._sharedArrays.get(key)
+        if sharedArray:
+            return sharedArray[0]
+
+        memory = _createSharedArray(values, typeCode)
+        self._sharedMemory.append(memory)
+        sharedArray = SharedArray(memory.name, len(values), typeCode)
+
+        # Keep a reference to the key so it stays unique while the pool is in use.
+        self._sharedArrays[key] = (sharedArray, key)
+        return sharedArray
+
+    # Submits a job to compute the sections of a published mesh and returns a Future
+    # whose result is a tuple of a list with the loops, or None, for each plane and
+    # the SectionStats of the job.  The matrix
+    # transforms the mesh so the first plane is the x-y plane.  When the count is
+    # greater than 1 the sections of a stack of planes with the spacing are computed.
+    # The other arguments are the same as for slicing.calculateSections.  When the
+    # mesh was published with its adjacency and connectLoops is True, the loops are
+    # traced with tracing.calculateTracedSections instead, and distanceOrder can be a
+    # published array with the order of the triangles of the HeightIntervalIndex of
+    # the distances from the plane, so the workers don't sort the triangles again.
+    # Once the pool is cancelled the result of a job that's still running is a
+    # SectionCancelled with the loops of the planes the job finished.
+    def submit(self, sharedMesh, matrix, spacing, count, connectLoops, optimizeLines, optimizeArcs, simplifyTolerance = 0,
+               distanceOrder = None):
+        future = self._executor.submit(runSectionJob, sharedMesh, list(matrix._data), spacing, count,
+                                       connectLoops, optimizeLines, optimizeArcs, simplifyTolerance, distanceOrder)
+        self._futures.append(future)
+        return future
+
+    # Stops the jobs that are running at their next checkpoint and cancels the jobs
+    # that haven't been started.  The jobs that are done keep their results.
+    def cancel(self):
+        self._cancelEvent.set()
+        for future in self._futures:
+            future.cancel()
+
+    # Stops the worker processes, without waiting for the jobs that are running, and
+    # releases the shared memory.  Any jobs that haven't finished are cancelled.
+    def close(self):
+        self._cancelEvent.set()
+        processes = list((getattr(self._executor, '_processes', None) or {}).values())
+        self._executor.shutdown(wait = False, cancel_futures = True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+        for memory in self._sharedMemory:
+            memory.close()
+            memory.unlink()
+        self._sharedMemory = []
+        self._sharedMeshes = {}
+        self._sharedArrays = {}
+        self._futures = []
+
+
+# Identifies mesh data that has been published to shared memory.  This is what's
+# sent to the worker processes instead of the mesh data.  The adjacency and the body
+# of each triangle are None when they weren't published.
+class SharedMesh:
+    def __init__(self, nodeCoords, nodeIndices):
+        self.nodeCoords = nodeCoords
+        self.nodeIndices = nodeIndices
+        self.adjacency = None
+        self.triangleBodies = None
+
+
+# Identifies an array of values that has been published to shared memory.
+class SharedArray:
+    def __init__(self, name, count, typeCode):
+        self.name = name
+        self.count = count
+        self.typeCode = typeCode
+
+
+# Returns the path to a Python executable that can be used to start worker processes
+# or None if one wasn't found.  When Python is embedded in another application,
+# sys.executable is the application itself so the folders Python was installed in
+# are searched.
+def findPythonExecutable():
+    candidates = [sys.executable]
+    for folder in (sys.exec_prefix, sys.prefix):
+        candidates.append(os.path.join(folder, 'python.exe'))
+        candidates.append(os.path.join(folder, 'Python', 'python.exe'))
+        candidates.append(os.path.join(folder, 'bin', 'python3'))
+        candidates.append(os.path.join(folder, 'bin', 'python'))
+
+    for candidate in candidates:
+        if candidate and os.path.basename(candidate).lower().startswith('python') and os.path.isfile(candidate):
+            return candidate
+
+    return None
+
+
+# The event that's set when the pool of the worker process is cancelled.
+_cancelEvent = None
+
+
+# Saves the cancel event of the pool when a worker process starts.
+def _initWorker(cancelEvent):
+    global _cancelEvent
+    _cancelEvent = cancelEvent
+
+
+# Computes the sections of a published mesh.  This is what runs in the worker processes.
+# The progress of the job checks the cancel event of the pool, and a SectionCancelled
+# is raised, with the loops of the planes that were finished, when it's set.
+def runSectionJob(sharedMesh, matrixData, spacing, count, connectLoops, optimizeLines, optimizeArcs, simplifyTolerance,
+                  distanceOrder = None):
+    nodeCoords = _attachArray(sharedMesh.nodeCoords)
+    nodeIndices = _attachArray(sharedMesh.nodeIndices)
+
+    matrix = MyMatrix()
+    matrix.setWithArray(matrixData)
+
+    stats = SectionStats()
+    progress = None
+    if _cancelEvent is not None:
+        if _cancelEvent.is_set():
+            raise SectionCancelled('The section calculation was cancelled.')
+        progress = SectionProgress(lambda fraction: _cancelEvent.is_set())
+    if connectLoops and sharedMesh.adjacency is not None:
+        with timeStage(stats, 'transform'):
+            if numpy:
+                distances = slicing.calculatePlaneDistancesVectorized(nodeCoords.reshape(-1, 3), matrix)
+            else:
+                distances = slicing.calculatePlaneDistances(nodeCoords, matrix)
+            heightIndex = None
+            if count > 1:
+                order = None
+                if distanceOrder is not None:
+                    order = _attachArray(distanceOrder)
+                heightIndex = buildDistanceIntervalIndex(distances, nodeIndices, order)
+
+        triangleBodies = None
+        if sharedMesh.triangleBodies is not None:
+            triangleBodies = _attachArray(sharedMesh.triangleBodies)
+        stackLoops = tracing.calculateTracedSections(nodeCoords, nodeIndices, _attachArray(sharedMesh.adjacency), matrix, spacing,
+                                                     count, optimizeLines, optimizeArcs, distances, heightIndex, stats,
+                                                     simplifyTolerance = simplifyTolerance, progress = progress,
+                                                     triangleBodies = triangleBodies)
+    else:
+        stackLoops = slicing.calculateSections(nodeCoords, nodeIndices, matrix, spacing, count, connectLoops, optimizeLines,
+                                               optimizeArcs, stats, simplifyTolerance = simplifyTolerance, progress = progress)
+    return stackLoops, stats
+
+
+# The shared memory each worker process has attached to, so it's only attached once
+# for all of the jobs that use the same array.
+_attachedArrays = {}
+
+
+# Returns the values of a published array as an array that uses the shared memory
+# directly.
+def _attachArray(sharedArray):
+    attached = _attachedArrays.get(sharedArray.name)
+    if not attached:
+        memory = _attachSharedMemory(sharedArray.name)
+
+        if numpy:
+            if sharedArray.typeCode == 'd':
+                dtype = numpy.float64
+            else:
+                dtype = numpy.int64
+            values = numpy.ndarray((sharedArray.count,), dtype = dtype, buffer = memory.buf)
+        else:
+            values = memory.buf[:sharedArray.count * 8].cast(sharedArray.typeCode)
+
+        attached = (values, memory)
+        _attachedArrays[sharedArray.name] = attached
+
+    return attached[0]
+
+
+# Attaches to existing shared memory.  The shared memory is owned by the process that
+# created it, so it isn't tracked here when the version of Python supports that.
+def _attachSharedMemory(name):
+    try:
+        return shared_memory.SharedMemory(name = name, track = False)
+    except TypeError:
+        return shared_memory.SharedMemory(name = name)
+
+
+# Creates shared memory that contains the values as 8 byte floats ('d') or integers ('q').
+def _createSharedArray(values, typeCode):
+    memory = shared_memory.SharedMemory(create = True, size = max(len(values) * 8, 8))
+    if numpy:
+        if typeCode == 'd':
+            dtype = numpy.float64
+        else:
+            dtype = numpy.int64
+        sharedValues = numpy.ndarray((len(values),), dtype = dtype, buffer = memory.buf)
+        sharedValues[:] = values
+        del sharedValues
+    else:
+        memory.buf[:len(values) * 8] = array.array(typeCode, values).tobytes()
+
+    return memory
@@ -0,0 +1,146 @@
+# Functions to create sketch geometry from section loops.  They only use the parts of
+# the Fusion sketch API needed to add lines and arcs, so they can also be used with
+# other objects that provide the same methods.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import array
+
+from .geometry import PointType
+
+
+# Enum of the types of sketch operation.
+class SketchOperationType():
+    line = 1
+    arc = 2
+
+
+# The sketch operations that draw a set of loops, in the order they're done.  The
+# points the curves are drawn through are vertices that are numbered in the order
+# they're added, and a vertex at the end of more than one curve is only created once
+# so the sketch point of the first curve is used by the others.  Each operation is a
+# tuple of its type, the start, mid, and end vertex, where the mid vertex of a line
+# is -1, and whether the sketch will swap the ends of the curve.
+class SketchPlan:
+    def __init__(self):
+        self.coords = array.array('d')
+        self.useCounts = array.array('i')
+        self.operations = []
+
+    def vertexCount(self):
+        return len(self.useCounts)
+
+    def getVertex(self, index):
+        return self.coords[index*3], self.coords[index*3+1], self.coords[index*3+2]
+
+    def addVertex(self, point):
+        self.coords.extend((point.x, point.y, point.z))
+        self.useCounts.append(0)
+        return len(self.useCounts) - 1
+
+    def addLine(self, startIndex, endIndex):
+        self.operations.append((SketchOperationType.line, startIndex, -1, endIndex, False))
+        self.useCounts[startIndex] += 1
+        self.useCounts[endIndex] += 1
+
+    # Sketch arcs are counter-clockwise around the z axis of the sketch, so the ends
+    # of an arc whose points are clockwise are swapped.
+    def addArc(self, startIndex, midIndex, endIndex):
+        startX, startY, startZ = self.getVertex(startIndex)
+        midX, midY, midZ = self.getVertex(midIndex)
+        endX, endY, endZ = self.getVertex(endIndex)
+        isReversed = (midX - startX) * (endY - startY) - (midY - startY) * (endX - startX) < 0
+        self.operations.append((SketchOperationType.arc, startIndex, midIndex, endIndex, isReversed))
+        self.useCounts[startIndex] += 1
+        self.useCounts[midIndex] += 1
+        self.useCounts[endIndex] += 1
+
+    def curveCount(self, operationType):
+        return sum(1 for operation in self.operations if operation[0] == operationType)
+
+
+# Returns the plan to draw the loops.  The points of a connected loop are drawn as
+# lines, except a point whose type is arcMid and the point after it, which make an
+# arc from the point before it.  A closed loop is closed with a curve back to its
+# first point.  Each pair of points of a loop that isn't connected is a line.
+def planLoops(loops):
+    plan = SketchPlan()
+    for loop in loops:
+        points = loop.points
+        if loop.isConnected:
+            if len(points) < 2:
+                continue
+
+            firstIndex = plan.addVertex(points[0])
+            lastIndex = firstIndex
+            midPoint = None
+            for point in points[1:]:
+                if point.pointType == PointType.arcMid and not midPoint:
+                    midPoint = point
+                    continue
+
+                pointIndex = plan.addVertex(point)
+                if midPoint:
+                    plan.addArc(lastIndex, plan.addVertex(midPoint), pointIndex)
+                    midPoint = None
+                else:
+                    plan.addLine(lastIndex, pointIndex)
+                lastIndex = pointIndex
+
+            if loop.isClosed and len(points) > 2:
+                if midPoint:
+                    plan.addArc(lastIndex, plan.addVertex(midPoint), firstIndex)
+                else:
+                    plan.addLine(lastIndex, firstIndex)
+        else:
+            for i in range(0, len(points) - 1, 2):
+                plan.addLine(plan.addVertex(points[i]), plan.addVertex(points[i+1]))
+
+    return plan
+
+
+# Draws the loops in the sketch.  The createPoint function takes an x, y, and z and
+# returns a point that can be passed to the sketch, like adsk.core.Point3D.create.
+def drawLoops(sketch, loops, createPoint):
+    drawPlan(sketch, planLoops(loops), createPoint)
+
+
+# Draws the operations of the plan in the sketch.  A point is created for the first
+# curve at a vertex, and the sketch point at that end of the curve is only read when
+# there's another curve at the vertex, since each call to the sketch is slow.
+def drawPlan(sketch, plan, createPoint):
+    sketch.isComputeDeferred = True
+    lines = sketch.sketchCurves.sketchLines
+    arcs = sketch.sketchCurves.sketchArcs
+    useCounts = array.array('i', plan.useCounts)
+    sketchPoints = [None] * plan.vertexCount()
+    for operationType, startIndex, midIndex, endIndex, isReversed in plan.operations:
+        startPoint = sketchPoints[startIndex]
+        if startPoint is None:
+            startPoint = createPoint(*plan.getVertex(startIndex))
+        endPoint = sketchPoints[endIndex]
+        if endPoint is None:
+            endPoint = createPoint(*plan.getVertex(endIndex))
+
+        if operationType == SketchOperationType.line:
+            curve = lines.addByTwoPoints(startPoint, endPoint)
+        else:
+            curve = arcs.addByThreePoints(startPoint, createPoint(*plan.getVertex(midIndex)), endPoint)
+
+        useCounts[startIndex] -= 1
+        if useCounts[startIndex] > 0 and sketchPoints[startIndex] is None:
+            sketchPoints[startIndex] = curve.endSketchPoint if isReversed else curve.startSketchPoint
+        useCounts[endIndex] -= 1
+        if useCounts[endIndex] > 0 and sketchPoints[endIndex] is None:
+            sketchPoints[endIndex] = curve.startSketchPoint if isReversed else curve.endSketchPoint
+
+    sketch.isComputeDeferred = False
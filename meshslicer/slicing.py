@@ -0,0 +1,880 @@
+# Functions to intersect triangle meshes with planes and to connect the resulting
+# lines into section loops.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form 
+# for any purpose and without fee is hereby granted, provided that the above copyright 
+# notice appears in all copies and that both that copyright notice and the limited  
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY 
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE. 
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE 
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import array
+import math
+
+# numpy isn't available in every Python environment the add-in runs in, so
+# the vectorized intersection is only used when it can be imported.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .geometry import MyLine, MyPoint, SectionLoop, _pointTol
+from .instrumentation import SectionCancelled, checkpoint, progressPart, timeStage
+
+
+# The number of triangles the vectorized kernels slice at a time, and the number of
+# triangles or lines the pure-Python functions process between checkpoints, when
+# there's a SectionProgress.
+_vectorizedChunkSize = 262144
+_checkpointInterval = 4096
+
+
+def pntFromArray(array, index):
+    return [array[index*3], array[index*3+1], array[index*3+2]]
+
+
+def transformPointArray(coords, matrix):
+    # Create a copy of the array.
+    newCoords = list(coords)
+    
+    # Transform each of the points.
+    for i in range(0, int(len(newCoords)/3)):
+        # Load the point coordinates into an array.
+        pnt = MyPoint(newCoords[i*3], newCoords[i*3+1], newCoords[i*3+2])
+
+        # Mulitply the point by the matrix.
+        pnt.transformBy(matrix)
+
+        # Save the results back into the original array.
+        newCoords[i*3] = pnt.x
+        newCoords[i*3+1] = pnt.y
+        newCoords[i*3+2] = pnt.z
+
+    return newCoords
+
+
+# Vectorized version of transformPointArray for an (n, 3) array of points.  The
+# terms are summed in the same order as MyPoint.transformBy.
+def transformPointArrayVectorized(coords, matrix):
+    x = coords[:, 0]
+    y = coords[:, 1]
+    z = coords[:, 2]
+
+    newCoords = numpy.empty_like(coords)
+    for row in range(1, 4):
+        newCoords[:, row-1] = x * matrix.getCell(1, row) + y * matrix.getCell(2, row) + z * matrix.getCell(3, row) + matrix.getCell(4, row)
+
+    return newCoords
+
+
+# Converts the array of segments into a list of section loops.  Returns None if there
+# aren't any segments.  An array of segments is an array('d') with six values for each
+# line, the x, y, and z of its start point followed by those of its end point, which
+# takes a fraction of the memory of MyLine objects for a large section.  When the
+# simplify tolerance is greater than 0 the lines are combined with SectionLoop.simplify
+# instead of SectionLoop.optimizeLines.  The work done is added to the stats, the loops
+# are passed to the debug sink, and the progress is checked as the loops are created,
+# when they're given.
+def createLoopsFromSegments(segments, connectLoops, optimizeLines, optimizeArcs, stats = None, debugSink = None,
+                            simplifyTolerance = 0, progress = None):
+    if stats is not None:
+        stats.segments += int(len(segments)/6)
+
+    if len(segments) == 0:
+        return None
+    elif connectLoops:
+        # Process the lines so they're in a nice connected order and grouped
+        # by loops.
+        with timeStage(stats, 'createLoops'):
+            intersectionLoops = createSectionLoopsFromSegments(segments, optimizeLines, optimizeArcs, stats, debugSink,
+                                                               simplifyTolerance, progress)
+    else:
+        loop = SectionLoop()
+        loop.isConnected = False
+        
+        for i in range(0, int(len(segments)/3)):
+            loop.addPoint(MyPoint(segments[i*3], segments[i*3+1], segments[i*3+2]), True)
+        
+        intersectionLoops = []
+        intersectionLoops.append(loop)
+
+    reportLoops(intersectionLoops, stats, debugSink)
+    return intersectionLoops
+
+
+# Counts the open and closed loops in the stats and passes the loops to the debug
+# sink, when they're given.
+def reportLoops(intersectionLoops, stats = None, debugSink = None):
+    if stats is not None:
+        for loop in intersectionLoops:
+            if loop.isClosed:
+                stats.loopsClosed += 1
+            else:
+                stats.loopsOpen += 1
+
+    if debugSink:
+        debugSink.dumpLoops(intersectionLoops)
+
+
+# Returns a list of MyLine objects for the array of segments.
+def getSegmentLines(segments):
+    intersectionLines = []
+    for i in range(0, int(len(segments)/6)):
+        intersectionLines.append(MyLine(MyPoint(segments[i*6], segments[i*6+1], segments[i*6+2]),
+                                        MyPoint(segments[i*6+3], segments[i*6+4], segments[i*6+5])))
+    return intersectionLines
+
+
+# Returns three arrays with the triangle, plane index, and plane height of every
+# (triangle, plane) pair where a triangle crosses a plane of the stack, given the
+# minimum and maximum height of each triangle.  A stack of one plane can have a
+# spacing of 0, and a ValueError is raised for a larger stack that does.
+def _getStackCrossingPairs(minZ, maxZ, spacing, count, stats):
+    _checkStackSpacing(spacing, count)
+    if count == 1:
+        pairTriangles = numpy.nonzero((maxZ >= 0) & (minZ < 0))[0]
+        if stats is not None:
+            stats.trianglesTested += len(minZ)
+            stats.trianglesCrossing += len(pairTriangles)
+        return pairTriangles, numpy.zeros(len(pairTriangles), dtype = numpy.int64), numpy.zeros(len(pairTriangles))
+
+    # Get the range of planes each triangle might span.
+    low = numpy.minimum(minZ / spacing, maxZ / spacing)
+    high = numpy.maximum(minZ / spacing, maxZ / spacing)
+    firstPlane = numpy.maximum(numpy.floor(low), 0).astype(numpy.int64)
+    lastPlane = numpy.minimum(numpy.ceil(high), count - 1).astype(numpy.int64)
+    spans = numpy.maximum(lastPlane - firstPlane + 1, 0)
+
+    # Expand the ranges into a (triangle, plane) pair for every plane each triangle spans.
+    pairTriangles = numpy.repeat(numpy.arange(len(minZ)), spans)
+    pairOffsets = numpy.arange(len(pairTriangles)) - numpy.repeat(numpy.cumsum(spans) - spans, spans)
+    pairPlanes = firstPlane[pairTriangles] + pairOffsets
+    pairHeights = spacing * pairPlanes
+
+    # Only keep the pairs where the triangle intersects the plane.
+    isCrossing = (maxZ[pairTriangles] >= pairHeights) & (minZ[pairTriangles] < pairHeights)
+    if stats is not None:
+        stats.trianglesTested += len(pairTriangles)
+        stats.trianglesCrossing += int(numpy.count_nonzero(isCrossing))
+    return pairTriangles[isCrossing], pairPlanes[isCrossing], pairHeights[isCrossing]
+
+
+# Intersects the (k, 3, 3) array of the corners of the triangle of each pair returned
+# by _getStackCrossingPairs with its plane and adds the lines to the end of the array
+# of segments of each plane in the stack segments.  The corners are changed.
+def _addStackPairSegments(stackSegments, pairCorners, pairPlanes, pairHeights):
+    # Move each triangle so its plane is the x-y plane, intersect them, and then move
+    # the intersection points back up to the plane.
+    pairCorners[:, :, 2] -= pairHeights[:, None]
+    startPoints, endPoints, pairIndex = sliceTriangleArray(pairCorners)
+    startPoints[:, 2] += pairHeights[pairIndex]
+    endPoints[:, 2] += pairHeights[pairIndex]
+
+    # Group the lines by plane.
+    linePlanes = pairPlanes[pairIndex]
+    order = numpy.argsort(linePlanes, kind = 'stable')
+    planeCounts = numpy.bincount(linePlanes, minlength = len(stackSegments))
+    planeEnds = numpy.cumsum(planeCounts)
+    segments = numpy.concatenate((startPoints, endPoints), axis = 1)[order]
+
+    for planeIndex in numpy.flatnonzero(planeCounts).tolist():
+        stackSegments[planeIndex].frombytes(segments[planeEnds[planeIndex] - planeCounts[planeIndex]:planeEnds[planeIndex]].tobytes())
+
+
+# Returns a list with an empty array of segments for each plane of a stack.
+def _createStackSegments(count):
+    return [array.array('d') for i in range(0, count)]
+
+
+# Returns the first and last index of the planes in a stack that a height range
+# might span.  The range is padded so the caller must still check each plane.  A
+# ValueError is raised for a stack of more than one plane with a spacing of 0.
+def _getStackPlaneRange(minZ, maxZ, spacing, count):
+    if count == 1:
+        return 0, 0
+    _checkStackSpacing(spacing, count)
+
+    low = minZ / spacing
+    high = maxZ / spacing
+    if low > high:
+        low, high = high, low
+
+    return max(int(math.floor(low)), 0), min(int(math.ceil(high)), count - 1)
+
+
+# Raises a ValueError if a stack of more than one plane has a spacing of 0, since
+# all of its planes would be the same plane.
+def _checkStackSpacing(spacing, count):
+    if count > 1 and spacing == 0:
+        raise ValueError('The spacing of a stack of more than one plane can\'t be 0.')
+
+
+# Intersects a triangle, given as three coordinate lists, with the plane parallel to
+# the x-y plane at the specified height.  Returns a MyLine or None if the result
+# is a zero length line.
+def _intersectTriangleAtHeight(point1, point2, point3, height):
+    corners = [MyPoint(point1[0], point1[1], point1[2] - height),
+               MyPoint(point2[0], point2[1], point2[2] - height),
+               MyPoint(point3[0], point3[1], point3[2] - height)]
+
+    # Find the single corner that's on the opposite side from the other two.
+    isAbove = [corners[0].z >= 0, corners[1].z >= 0, corners[2].z >= 0]
+    if isAbove.count(True) == 2:
+        loneIndex = isAbove.index(False)
+    else:
+        loneIndex = isAbove.index(True)
+
+    otherCorners = [corners[j] for j in range(0, 3) if j != loneIndex]
+    intResult1 = MyLine(otherCorners[0], corners[loneIndex]).intersectWithXYPlane()
+    intResult2 = MyLine(otherCorners[1], corners[loneIndex]).intersectWithXYPlane()
+
+    # Skip any zero length segments.
+    if intResult1.distanceTo(intResult2) <= 0.000001:
+        return None
+
+    intResult1.z += height
+    intResult2.z += height
+    return MyLine(intResult1, intResult2)
+
+
+# Returns a list with the distance of each node from the x-y plane of the matrix,
+# which is the z coordinate the node has after it's transformed by the matrix.  The
+# terms are summed in the same order as MyPoint.transformBy, so the triangles are
+# classified exactly the same as when all of the coordinates are transformed.
+def calculatePlaneDistances(nodeCoords, matrix):
+    m1, m2, m3, m4 = _getMatrixRow(matrix, 3)
+    distances = []
+    for i in range(0, int(len(nodeCoords)/3)):
+        distances.append(nodeCoords[i*3] * m1 + nodeCoords[i*3+1] * m2 + nodeCoords[i*3+2] * m3 + m4)
+    return distances
+
+
+# Vectorized version of calculatePlaneDistances for an (n, 3) array of points.
+def calculatePlaneDistancesVectorized(coords, matrix):
+    m1, m2, m3, m4 = _getMatrixRow(matrix, 3)
+    return coords[:, 0] * m1 + coords[:, 1] * m2 + coords[:, 2] * m3 + m4
+
+
+# Returns a list with an array of segments, as described by createLoopsFromSegments,
+# for each plane of a stack of planes at a height of spacing * i above the x-y plane
+# of the matrix.  The mesh isn't transformed.  Each plane is expressed in the coordinate
+# system of the mesh by the distance of the nodes from it, and only the corners of the
+# triangles that cross a plane are transformed, so the cost of the transform depends
+# on the size of the section instead of the size of the mesh.  The distances, from
+# calculatePlaneDistances, and an index built from them by buildDistanceIntervalIndex
+# can be passed in when they've already been computed.  Otherwise the distances of
+# the corners of each triangle are computed as it's sliced, so beyond the mesh itself
+# the memory used depends only on the size of the sections.  The progress is checked
+# as the triangles are sliced, when it's given.  This is the pure-Python reference
+# implementation.
+def calculatePlaneSegments(nodeCoords, nodeIndices, matrix, spacing, count, distances = None, intervalIndex = None,
+                           stats = None, progress = None):
+    stackSegments = _createStackSegments(count)
+
+    xRow = _getMatrixRow(matrix, 1)
+    yRow = _getMatrixRow(matrix, 2)
+    zRow = _getMatrixRow(matrix, 3)
+
+    testedCount = 0
+    crossingCount = 0
+
+    if intervalIndex:
+        heights = []
+        for i in range(0, count):
+            heights.append(spacing * i)
+
+        for planeIndex, triangles in intervalIndex.sweep(heights):
+            testedCount += len(triangles)
+            crossingCount += len(triangles)
+            for i in triangles:
+                points = [_getPlanePoint(nodeIndices[i*3+j], nodeCoords, distances[nodeIndices[i*3+j]], xRow, yRow) for j in range(0, 3)]
+
+                line = _intersectTriangleAtHeight(points[0], points[1], points[2], heights[planeIndex])
+                if line:
+                    _addLineSegment(stackSegments[planeIndex], line)
+            checkpoint(progress, planeIndex + 1, count)
+    else:
+        triangleCount = int(len(nodeIndices)/3)
+        for i in range(0, triangleCount):
+            if progress is not None and i % _checkpointInterval == 0:
+                progress.checkpoint(i, triangleCount)
+
+            nodes = nodeIndices[i*3:i*3+3]
+            if distances is None:
+                cornerDistances = [_getPlaneDistance(node, nodeCoords, zRow) for node in nodes]
+            else:
+                cornerDistances = [distances[node] for node in nodes]
+
+            minZ = min(cornerDistances)
+            maxZ = max(cornerDistances)
+
+            points = None
+            firstPlane, lastPlane = _getStackPlaneRange(minZ, maxZ, spacing, count)
+            for planeIndex in range(firstPlane, lastPlane + 1):
+                # Check to see if the triangle intersects the plane.
+                testedCount += 1
+                height = spacing * planeIndex
+                if maxZ >= height and minZ < height:
+                    crossingCount += 1
+
+                    # Transform the corners the first time the triangle crosses a plane.
+                    if not points:
+                        points = [_getPlanePoint(nodes[j], nodeCoords, cornerDistances[j], xRow, yRow) for j in range(0, 3)]
+
+                    line = _intersectTriangleAtHeight(points[0], points[1], points[2], height)
+                    if line:
+                        _addLineSegment(stackSegments[planeIndex], line)
+
+    if stats is not None:
+        stats.trianglesTested += testedCount
+        stats.trianglesCrossing += crossingCount
+
+    return stackSegments
+
+
+# Vectorized version of calculatePlaneSegments.  The triangles are sliced in chunks,
+# so the temporary arrays are limited to the size of a chunk, and there's a
+# checkpoint after each one.  The segments of each plane are in the same order as
+# when the triangles are sliced all at once.
+def calculatePlaneSegmentsVectorized(nodeCoords, nodeIndices, matrix, spacing, count, distances = None, intervalIndex = None,
+                                     stats = None, progress = None):
+    coords = numpy.asarray(nodeCoords, dtype = numpy.float64).reshape(-1, 3)
+    indices = numpy.asarray(nodeIndices, dtype = numpy.int64).reshape(-1, 3)
+    stackSegments = _createStackSegments(count)
+
+    if intervalIndex:
+        pairTriangles = [numpy.zeros(0, dtype = numpy.int64)]
+        pairPlanes = [numpy.zeros(0, dtype = numpy.int64)]
+        for planeIndex, triangles in intervalIndex.sweep([spacing * i for i in range(0, count)]):
+            pairTriangles.append(numpy.asarray(triangles, dtype = numpy.int64))
+            pairPlanes.append(numpy.full(len(triangles), planeIndex, dtype = numpy.int64))
+            checkpoint(progress, planeIndex + 1, count)
+        pairTriangles = numpy.concatenate(pairTriangles)
+        pairPlanes = numpy.concatenate(pairPlanes)
+        pairHeights = spacing * pairPlanes
+        if stats is not None:
+            stats.trianglesTested += len(pairTriangles)
+            stats.trianglesCrossing += len(pairTriangles)
+
+        pairNodes = indices[pairTriangles]
+        _addPlanePairSegments(stackSegments, coords, distances[pairNodes], matrix, pairNodes, pairPlanes, pairHeights)
+        return stackSegments
+
+    for chunkStart in range(0, len(indices), _vectorizedChunkSize):
+        chunkIndices = indices[chunkStart:chunkStart + _vectorizedChunkSize]
+        if distances is None:
+            chunkDistances = calculatePlaneDistancesVectorized(coords[chunkIndices.reshape(-1)], matrix).reshape(-1, 3)
+        else:
+            chunkDistances = distances[chunkIndices]
+        minZ = chunkDistances.min(axis = 1)
+        maxZ = chunkDistances.max(axis = 1)
+        pairTriangles, pairPlanes, pairHeights = _getStackCrossingPairs(minZ, maxZ, spacing, count, stats)
+
+        _addPlanePairSegments(stackSegments, coords, chunkDistances[pairTriangles], matrix, chunkIndices[pairTriangles], pairPlanes,
+                              pairHeights)
+        checkpoint(progress, chunkStart + len(chunkIndices), len(indices))
+
+    return stackSegments
+
+
+# Transforms the x and y of the corners of the triangles of the (k, 3) array of node
+# indices of each (triangle, plane) pair, uses their (k, 3) array of distances from
+# the base plane as the z, and adds the segments where they cross their plane to the
+# stack segments.
+def _addPlanePairSegments(stackSegments, coords, pairDistances, matrix, pairNodes, pairPlanes, pairHeights):
+    pairCoords = coords[pairNodes]
+    pairCorners = numpy.empty_like(pairCoords)
+    for row in range(1, 3):
+        m1, m2, m3, m4 = _getMatrixRow(matrix, row)
+        pairCorners[:, :, row-1] = pairCoords[:, :, 0] * m1 + pairCoords[:, :, 1] * m2 + pairCoords[:, :, 2] * m3 + m4
+    pairCorners[:, :, 2] = pairDistances
+
+    _addStackPairSegments(stackSegments, pairCorners, pairPlanes, pairHeights)
+
+
+# Adds the start and end points of the line to the end of the array of segments.
+def _addLineSegment(segments, line):
+    segments.extend((line.startPoint.x, line.startPoint.y, line.startPoint.z, line.endPoint.x, line.endPoint.y, line.endPoint.z))
+
+
+# Returns the distance of a node from the x-y plane of the matrix, the same as
+# calculatePlaneDistances, using the row of the matrix from _getMatrixRow.
+def _getPlaneDistance(node, nodeCoords, zRow):
+    return nodeCoords[node*3] * zRow[0] + nodeCoords[node*3+1] * zRow[1] + nodeCoords[node*3+2] * zRow[2] + zRow[3]
+
+
+# Returns the x, y, and z coordinate of a node after it's transformed by the matrix,
+# where the z is its distance from calculatePlaneDistances and only the x and y are
+# computed, using the rows of the matrix from _getMatrixRow.
+def _getPlanePoint(node, nodeCoords, distance, xRow, yRow):
+    x = nodeCoords[node*3]
+    y = nodeCoords[node*3+1]
+    z = nodeCoords[node*3+2]
+    return [x * xRow[0] + y * xRow[1] + z * xRow[2] + xRow[3],
+            x * yRow[0] + y * yRow[1] + z * yRow[2] + yRow[3],
+            distance]
+
+
+# Returns the four values of the matrix that compute the coordinate of a transformed
+# point for the row, 1 for x through 3 for z.  If the matrix is None the coordinates
+# have already been transformed, so the row is the row of the identity matrix.
+def _getMatrixRow(matrix, row):
+    if matrix:
+        return matrix.getCell(1, row), matrix.getCell(2, row), matrix.getCell(3, row), matrix.getCell(4, row)
+    else:
+        return tuple(1.0 if column == row else 0.0 for column in range(1, 5))
+
+
+# Computes the section loops of the mesh with the x-y plane after the mesh has been
+# transformed by the matrix or, when the count is greater than 1, with a stack of
+# planes at a height of spacing * i.  The mesh itself isn't transformed, only the
+# points of the sections are, and the lines of the sections are kept as arrays of
+# segments, so the memory used beyond the mesh depends on the size of the sections
+# instead of the size of the mesh.  Returns a list with the loops, or None if the
+# plane doesn't intersect the mesh, for each plane.  The simplify tolerance is used
+# the same way as by createLoopsFromSegments.  The work done is added to the stats and
+# the loops are passed to the debug sink, when they're given.  When a progress is
+# given it's checked as the work is done, and the loops of the planes that were
+# finished are saved in the SectionCancelled that's raised if the calculation is
+# stopped.
+def calculateSections(nodeCoords, nodeIndices, matrix, spacing, count, connectLoops, optimizeLines, optimizeArcs,
+                      stats = None, debugSink = None, simplifyTolerance = 0, progress = None):
+    with timeStage(stats, 'intersect'), progressPart(progress, 0, 0.5):
+        if numpy:
+            stackSegments = calculatePlaneSegmentsVectorized(nodeCoords, nodeIndices, matrix, spacing, count, stats = stats,
+                                                             progress = progress)
+        else:
+            stackSegments = calculatePlaneSegments(nodeCoords, nodeIndices, matrix, spacing, count, stats = stats,
+                                                   progress = progress)
+
+    with progressPart(progress, 0.5, 1):
+        return createStackLoops(stackSegments, connectLoops, optimizeLines, optimizeArcs, stats, debugSink, simplifyTolerance,
+                                progress)
+
+
+# Returns a list with the loops created from the array of segments of each plane of a
+# stack by createLoopsFromSegments, or None for a plane without any segments.  If the
+# progress stops the calculation, the loops of the planes that were finished are
+# saved in the SectionCancelled that's raised.
+def createStackLoops(stackSegments, connectLoops, optimizeLines, optimizeArcs, stats = None, debugSink = None,
+                     simplifyTolerance = 0, progress = None):
+    stackLoops = []
+    try:
+        for i in range(0, len(stackSegments)):
+            with progressPart(progress, i / len(stackSegments), (i + 1) / len(stackSegments)):
+                stackLoops.append(createLoopsFromSegments(stackSegments[i], connectLoops, optimizeLines, optimizeArcs, stats,
+                                                          debugSink, simplifyTolerance, progress))
+                checkpoint(progress, 1, 1)
+    except SectionCancelled as err:
+        err.stackLoops = stackLoops + [None] * (len(stackSegments) - len(stackLoops))
+        raise
+
+    return stackLoops
+
+
+# Computes the section loops the same way as calculateSections for a mesh that's
+# read in chunks of triangles, like those returned by meshio.readStlChunks, so
+# the whole mesh never has to be in memory.  With numpy each chunk is an (n, 3, 3)
+# array of triangle corners, otherwise it's a flat list of nine coordinates per
+# triangle.
+def calculateStreamedSections(triangleChunks, matrix, spacing, count, connectLoops, optimizeLines, optimizeArcs,
+                              stats = None, debugSink = None, simplifyTolerance = 0):
+    stackSegments = _createStackSegments(count)
+
+    for chunk in triangleChunks:
+        with timeStage(stats, 'intersect'):
+            chunkSegments = _calculateChunkSegments(chunk, matrix, spacing, count, stats)
+
+        for i in range(0, count):
+            stackSegments[i].extend(chunkSegments[i])
+
+    return createStackLoops(stackSegments, connectLoops, optimizeLines, optimizeArcs, stats, debugSink, simplifyTolerance)
+
+
+# Returns a list with the array of segments of each plane for a chunk of triangles
+# streamed to calculateStreamedSections.
+def _calculateChunkSegments(chunk, matrix, spacing, count, stats):
+    # The corners of the triangles aren't shared, so the indices just count up.
+    if numpy:
+        # The chunk is copied to doubles, so the size of a chunk is the most memory
+        # used at one time beyond the segments that are kept.
+        corners = numpy.asarray(chunk, dtype = numpy.float64).reshape(-1, 3)
+        return calculatePlaneSegmentsVectorized(corners, numpy.arange(len(corners)), matrix, spacing, count, stats = stats)
+    else:
+        chunkIndices = range(0, int(len(chunk)/3))
+        return calculatePlaneSegments(chunk, chunkIndices, matrix, spacing, count, stats = stats)
+
+
+# Intersects an (n, 3, 3) array of triangle corners with the x-y plane and returns
+# two (k, 3) arrays with the start and end points of the crossing segments and a
+# (k,) array with the index of the triangle each segment came from.  A corner with
+# a z of 0 is considered to be above the plane.  The number of triangles tested and
+# crossing the plane are added to the stats when they're given.
+def sliceTriangleArray(triangles, stats = None):
+    above = triangles[:, :, 2] >= 0
+    aboveCount = above.sum(axis = 1)
+
+    # Only keep the triangles that have corners on both sides of the plane.
+    crossing = (aboveCount == 1) | (aboveCount == 2)
+    triangleIndex = numpy.nonzero(crossing)[0]
+    if stats is not None:
+        stats.trianglesTested += len(triangles)
+        stats.trianglesCrossing += len(triangleIndex)
+    triangles = triangles[crossing]
+    above = above[crossing]
+    aboveCount = aboveCount[crossing]
+
+    # Find the single corner that's on the opposite side from the other two.
+    loneMask = numpy.where((aboveCount == 2)[:, None], ~above, above)
+    loneIndex = numpy.argmax(loneMask, axis = 1)
+
+    # The other two corners, kept in their original order.
+    pairIndex1 = numpy.where(loneIndex == 0, 1, 0)
+    pairIndex2 = numpy.where(loneIndex == 2, 1, 2)
+
+    rows = numpy.arange(len(triangles))
+    lonePoints = triangles[rows, loneIndex]
+    startPoints = _intersectEdgesWithXYPlane(triangles[rows, pairIndex1], lonePoints)
+    endPoints = _intersectEdgesWithXYPlane(triangles[rows, pairIndex2], lonePoints)
+
+    # Skip any zero length segments.
+    delta = endPoints - startPoints
+    lengths = numpy.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2 + delta[:, 2] ** 2)
+    keep = lengths > 0.000001
+
+    return startPoints[keep], endPoints[keep], triangleIndex[keep]
+
+
+# Vectorized version of MyLine.intersectWithXYPlane for arrays of edges.
+def _intersectEdgesWithXYPlane(startPoints, endPoints):
+    startZ = numpy.abs(startPoints[:, 2])
+    factor = startZ / (startZ + numpy.abs(endPoints[:, 2]))
+    return startPoints + ((endPoints - startPoints) * factor[:, None])
+
+
+# Returns a flat array with three entries for each triangle that are the index of
+# the triangle across the edge from the first to the second, the second to the
+# third, and the third to the first corner, or -1 if the edge is open.  An edge shared
+# by more than two triangles, where sheets of the mesh meet, is open for all of them,
+# since there's no way to tell which of the triangles a section continues into.
+def buildTriangleAdjacency(nodeIndices):
+    triangleCount = int(len(nodeIndices)/3)
+
+    if numpy:
+        indices = numpy.asarray(nodeIndices, dtype = numpy.int64).reshape(-1, 3)
+
+        # Create a key for each edge that's the same regardless of its direction.
+        edgeStart = indices.reshape(-1)
+        edgeEnd = indices[:, [1, 2, 0]].reshape(-1)
+        edgeKeys = numpy.minimum(edgeStart, edgeEnd) * (int(edgeStart.max(initial = 0)) + 1) + numpy.maximum(edgeStart, edgeEnd)
+
+        # Sort the edges so shared edges are next to each other and pair them up.
+        order = numpy.argsort(edgeKeys, kind = 'stable')
+        sortedKeys = edgeKeys[order]
+        isPair = sortedKeys[1:] == sortedKeys[:-1]
+        # Only pair the edges that aren't the same as the edges before and after them.
+        isOnlyPair = isPair.copy()
+        isOnlyPair[1:] &= ~isPair[:-1]
+        isOnlyPair[:-1] &= ~isPair[1:]
+        first = order[:-1][isOnlyPair]
+        second = order[1:][isOnlyPair]
+
+        adjacency = numpy.full(triangleCount * 3, -1, dtype = numpy.int64)
+        adjacency[first] = second // 3
+        adjacency[second] = first // 3
+        return adjacency
+    else:
+        adjacency = [-1] * (triangleCount * 3)
+        openEdges = {}
+        pairedEdges = {}
+        for i in range(0, triangleCount * 3):
+            start = nodeIndices[i]
+            if i % 3 == 2:
+                end = nodeIndices[i - 2]
+            else:
+                end = nodeIndices[i + 1]
+            key = (min(start, end), max(start, end))
+
+            # A third triangle on an edge leaves the edge open for the first two.
+            pair = pairedEdges.get(key)
+            if pair is not None:
+                adjacency[pair[0]] = -1
+                adjacency[pair[1]] = -1
+                continue
+
+            other = openEdges.pop(key, None)
+            if other is None:
+                openEdges[key] = i
+            else:
+                adjacency[i] = other // 3
+                adjacency[other] = i // 3
+                pairedEdges[key] = (other, i)
+        return adjacency
+
+
+# Given a list of lines that represent the intersection this cleans them up so they're
+# in head-to-tail connected loops.  It returns a list of sectionLoop objects.
+def createSectionLoops(intersectionLines, optimizeLines, optimizeArcs):
+    # Initialize the list that will contain the section loops.
+    sectionLoops = []
+    
+    currentLoop = SectionLoop()
+
+    # Initialize the loop with the points from the first line.
+    currentLoop.addPoint(intersectionLines[0].startPoint, True)
+    currentLoop.addPoint(intersectionLines[0].endPoint, True)
+    
+    # Set this line to Empty indicating it's been processed.
+    intersectionLines[0] = None
+    
+    # Begin processing the lines.
+    for i in range(0, len(intersectionLines)):
+        foundPoint = False
+        for j in range(1, len(intersectionLines)):
+            currentLine = intersectionLines[j]
+            newPoint = None
+            isAtEnd = True
+
+            if currentLine != None:
+                # Check to see if the end points of the current line match the check line.
+                if currentLine.startPoint.isEqualTo(currentLoop.startPoint):
+                    newPoint = currentLine.endPoint
+                    isAtEnd = False
+                    intersectionLines[j] = None
+                elif currentLine.startPoint.isEqualTo(currentLoop.endPoint):
+                    newPoint = currentLine.endPoint
+                    isAtEnd = True
+                    intersectionLines[j] = None
+                elif currentLine.endPoint.isEqualTo(currentLoop.startPoint):
+                    newPoint = currentLine.startPoint
+                    isAtEnd = False
+                    intersectionLines[j] = None
+                elif currentLine.endPoint.isEqualTo(currentLoop.endPoint):
+                    newPoint = currentLine.startPoint
+                    isAtEnd = True
+                    intersectionLines[j] = None
+
+                # If a point was found, check to see if this point closes the loop.
+                if newPoint != None:
+                    foundPoint = True
+
+                    if (isAtEnd and newPoint.isEqualTo(currentLoop.startPoint)) or (not isAtEnd and newPoint.isEqualTo(currentLoop.endPoint)):
+                        currentLoop.isClosed = True
+
+                        # Clean this loop of colinear lines.
+                        if optimizeLines:
+                            currentLoop.optimizeLines()
+                            
+                            if optimizeArcs:
+                                currentLoop.optimizeArcs()
+                            
+                        # Save this loop and start a new loop.
+                        sectionLoops.append(currentLoop)
+                        currentLoop = SectionLoop()
+
+                        # Find the next unused line and use it to start the next loop.
+                        for k in range(0, len(intersectionLines)):
+                            if intersectionLines[k] != None:
+                                # Add the two points to the end of the loop.
+                                currentLoop.addPoint(intersectionLines[k].startPoint, True)
+                                currentLoop.addPoint(intersectionLines[k].endPoint, True)
+                                intersectionLines[k] = None
+                                break
+                    else:
+                        # Check that the new point is far enough away from the previous point for a line to be valid.
+                        if isAtEnd:
+                            if newPoint.distanceTo(currentLoop.endPoint) > 0.000001:
+                                # Add the point to the end of the loop.
+                                currentLoop.addPoint(newPoint, True)
+                        elif not isAtEnd:
+                            if newPoint.distanceTo(currentLoop.startPoint) > 0.000001:
+                                # Add the point to the start of the loop.
+                                currentLoop.addPoint(newPoint, False)
+
+                    break
+
+        noMoreLines = False
+        if not foundPoint:
+            if currentLoop.pointCount() > 0:
+                # Clean this loop of colinear lines.
+                if optimizeLines:
+                    currentLoop.optimizeLines()
+                    
+                    if optimizeArcs:
+                        currentLoop.optimizeArcs()
+
+                # Save this loop and start a new loop.
+                sectionLoops.append(currentLoop)
+
+            noMoreLines = True
+            currentLoop = SectionLoop()
+            for k in range(0, len(intersectionLines)):
+                if intersectionLines[k] != None:
+                    noMoreLines = False
+
+                    # Add the two points to the end of the loop.
+                    currentLoop.addPoint(intersectionLines[k].startPoint, True)
+                    currentLoop.addPoint(intersectionLines[k].endPoint, True)
+                    intersectionLines[k] = None
+                    break
+
+        if noMoreLines:
+            break
+
+    # Save the current loop.
+    if currentLoop.pointCount() > 0:
+        # Clean this loop of colinear lines.
+        if optimizeLines:
+            currentLoop.optimizeLines()
+
+        if optimizeArcs:
+            currentLoop.optimizeArcs()
+            
+        # Add this loop to the collection.
+        sectionLoops.append(currentLoop)
+
+    return sectionLoops
+
+
+# Does the same thing as createSectionLoops for an array of segments but uses a spatial
+# hash of the end points to find the connecting segment, so each segment is chained in
+# near constant time instead of scanning all of the remaining lines.  When the simplify
+# tolerance is greater than 0 the loops are simplified to within it instead of only
+# combining colinear lines.  When a progress is given it's checked as the segments are
+# chained.  The end points are numbered so end point j is the start of segment j // 2 when j is even
+# and its end when j is odd, and only those numbers are kept in the spatial hash, so
+# no objects are created for the segments while they're chained.
+def createSectionLoopsFromSegments(segments, optimizeLines, optimizeArcs, stats = None, debugSink = None,
+                                   simplifyTolerance = 0, progress = None):
+    sectionLoops = []
+    segmentCount = int(len(segments)/6)
+
+    # Add the end points of every segment to the grid.
+    grid = EndpointGrid(segments, _pointTol)
+    isUsed = bytearray(segmentCount)
+    usedCount = 0
+
+    for i in range(0, segmentCount):
+        if isUsed[i]:
+            continue
+
+        # Start a new loop with the points from the first unused segment.
+        startX, startY, startZ, endX, endY, endZ = segments[i*6:i*6+6]
+        currentLoop = SectionLoop()
+        currentLoop.addPoint(MyPoint(startX, startY, startZ), True)
+        currentLoop.addPoint(MyPoint(endX, endY, endZ), True)
+        isUsed[i] = True
+        usedCount += 1
+
+        while True:
+            if progress is not None and usedCount % _checkpointInterval == 0:
+                progress.checkpoint(usedCount, segmentCount)
+
+            # Look for a segment connected to the end of the loop and then to the start.
+            isAtEnd = True
+            endpoint = grid.find(endX, endY, endZ, isUsed)
+            if endpoint < 0:
+                isAtEnd = False
+                endpoint = grid.find(startX, startY, startZ, isUsed)
+                if endpoint < 0:
+                    # Nothing connects to this loop so it's open.
+                    break
+
+            # Get the point at the other end of the connected segment.
+            isUsed[endpoint // 2] = True
+            usedCount += 1
+            otherEnd = (endpoint ^ 1) * 3
+            newX, newY, newZ = segments[otherEnd:otherEnd+3]
+
+            # Check to see if this point closes the loop.
+            if isAtEnd:
+                if _isSamePoint(newX, newY, newZ, startX, startY, startZ):
+                    currentLoop.isClosed = True
+                    break
+            elif _isSamePoint(newX, newY, newZ, endX, endY, endZ):
+                currentLoop.isClosed = True
+                break
+
+            # Check that the new point is far enough away from the previous point for a line to be valid.
+            if isAtEnd:
+                if not _isSamePoint(newX, newY, newZ, endX, endY, endZ):
+                    currentLoop.addPoint(MyPoint(newX, newY, newZ), True)
+                    endX, endY, endZ = newX, newY, newZ
+            else:
+                if not _isSamePoint(newX, newY, newZ, startX, startY, startZ):
+                    currentLoop.addPoint(MyPoint(newX, newY, newZ), False)
+                    startX, startY, startZ = newX, newY, newZ
+
+        optimizeLoop(currentLoop, optimizeLines, optimizeArcs, stats, debugSink, simplifyTolerance)
+        sectionLoops.append(currentLoop)
+
+    return sectionLoops
+
+
+# Cleans the loop of colinear lines, or simplifies it when the simplify tolerance is
+# greater than 0, and then replaces lines with arcs, the same way for each of the
+# functions that create loops.
+def optimizeLoop(currentLoop, optimizeLines, optimizeArcs, stats = None, debugSink = None, simplifyTolerance = 0):
+    if optimizeLines and currentLoop.pointCount() > 2:
+        with timeStage(stats, 'optimizeLines'):
+            if simplifyTolerance > 0:
+                removedCount = currentLoop.simplify(simplifyTolerance)
+            else:
+                removedCount = currentLoop.optimizeLines()
+        if stats is not None:
+            stats.pointsRemovedByOptimizeLines += removedCount
+
+        if optimizeArcs and currentLoop.pointCount() > 2:
+            with timeStage(stats, 'optimizeArcs'):
+                removedCount = currentLoop.optimizeArcs(debugSink)
+            if stats is not None:
+                stats.pointsRemovedByOptimizeArcs += removedCount
+
+
+# Returns whether two points are within the point tolerance of each other, the same
+# as MyPoint.isEqualTo.
+def _isSamePoint(x1, y1, z1, x2, y2, z2):
+    return math.sqrt(((x2 - x1) ** 2) + ((y2 - y1) ** 2) + ((z2 - z1) ** 2)) <= _pointTol
+
+
+# Spatial hash of the end points of an array of segments where the cell size is the
+# point tolerance.  A point within tolerance of a query point is either in the same
+# cell as the query point or in one of the neighboring cells.  The end points are
+# numbered the same way as by createSectionLoopsFromSegments.
+class EndpointGrid:
+    def __init__(self, segments, tolerance):
+        self.segments = segments
+        self.tolerance = tolerance
+        self._cells = {}
+
+        for endpoint in range(0, int(len(segments)/3)):
+            key = self._cellKey(segments[endpoint*3], segments[endpoint*3+1], segments[endpoint*3+2])
+            cell = self._cells.get(key)
+            if cell is None:
+                self._cells[key] = [endpoint]
+            else:
+                cell.append(endpoint)
+
+    def _cellKey(self, x, y, z):
+        return (math.floor(x / self.tolerance), math.floor(y / self.tolerance), math.floor(z / self.tolerance))
+
+    # Returns the number of an end point that's within tolerance of the point, or -1
+    # if there isn't one.  The end points of the segments that are set in isUsed are
+    # skipped.
+    def find(self, x, y, z, isUsed):
+        segments = self.segments
+        cellX, cellY, cellZ = self._cellKey(x, y, z)
+        for i in (cellX, cellX - 1, cellX + 1):
+            for j in (cellY, cellY - 1, cellY + 1):
+                for k in (cellZ, cellZ - 1, cellZ + 1):
+                    cell = self._cells.get((i, j, k))
+                    if cell:
+                        for endpoint in cell:
+                            if not isUsed[endpoint // 2] and _isSamePoint(segments[endpoint*3], segments[endpoint*3+1],
+                                                                          segments[endpoint*3+2], x, y, z):
+                                return endpoint
+        return -1
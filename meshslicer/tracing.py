@@ -0,0 +1,355 @@
+# Functions to trace section loops from triangle to triangle across the edges that
+# neighboring triangles share, so the loops are connected by the topology of the mesh
+# instead of by matching the end points of the lines.
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .geometry import MyPoint, SectionLoop
+from .instrumentation import SectionCancelled, checkpoint, progressPart, timeStage
+from .slicing import (_checkpointInterval, _getMatrixRow, _getPlanePoint, _getStackCrossingPairs, _getStackPlaneRange,
+                      _isSamePoint, _vectorizedChunkSize, calculatePlaneDistances, calculatePlaneDistancesVectorized,
+                      createSectionLoopsFromSegments, optimizeLoop, reportLoops)
+
+
+# Computes the section loops of the mesh with a stack of planes the same way as
+# slicing.calculateSections, but traces each loop across the edges of the triangles,
+# using the adjacency returned by slicing.buildTriangleAdjacency.  The point where a
+# plane crosses an edge is computed once and shared by the two triangles of the edge,
+# so the loops are connected exactly, whatever the size of the mesh, and in time
+# that's linear in the size of the section.  The parts of loops that reach an edge
+# that doesn't have two triangles are connected by matching their end points, the
+# same as calculateSections does.  When the mesh is several meshes combined by
+# meshio.mergeMeshes, the list of the mesh of each triangle can be passed in so the
+# bodyId of each loop is set.  The distances, from calculatePlaneDistances, and
+# an index built from them by buildDistanceIntervalIndex can be passed in when
+# they've already been computed.  The other arguments and the result are the same as
+# for calculateSections with connected loops.
+def calculateTracedSections(nodeCoords, nodeIndices, adjacency, matrix, spacing, count, optimizeLines, optimizeArcs,
+                            distances = None, intervalIndex = None, stats = None, debugSink = None, simplifyTolerance = 0,
+                            progress = None, triangleBodies = None):
+    if numpy:
+        # Convert the arrays once instead of for each plane.
+        nodeCoords = numpy.asarray(nodeCoords, dtype = numpy.float64)
+        nodeIndices = numpy.asarray(nodeIndices, dtype = numpy.int64)
+        adjacency = numpy.asarray(adjacency, dtype = numpy.int64)
+        if distances is not None:
+            distances = numpy.asarray(distances, dtype = numpy.float64)
+
+    if distances is None:
+        with timeStage(stats, 'transform'):
+            if numpy:
+                distances = calculatePlaneDistancesVectorized(nodeCoords.reshape(-1, 3), matrix)
+            else:
+                distances = calculatePlaneDistances(nodeCoords, matrix)
+
+    with timeStage(stats, 'intersect'), progressPart(progress, 0, 0.5):
+        stackTriangles = getStackCrossingTriangles(nodeIndices, distances, spacing, count, intervalIndex, stats, progress)
+
+    stackLoops = []
+    try:
+        with progressPart(progress, 0.5, 1):
+            for i in range(0, count):
+                with progressPart(progress, i / count, (i + 1) / count):
+                    if len(stackTriangles[i]) == 0:
+                        stackLoops.append(None)
+                        continue
+
+                    if stats is not None:
+                        stats.segments += len(stackTriangles[i])
+                    with timeStage(stats, 'createLoops'):
+                        loops = traceSectionLoops(nodeCoords, nodeIndices, adjacency, matrix, distances, spacing * i,
+                                                  stackTriangles[i], progress, triangleBodies)
+                        for loop in loops:
+                            optimizeLoop(loop, optimizeLines, optimizeArcs, stats, debugSink, simplifyTolerance)
+
+                    reportLoops(loops, stats, debugSink)
+                    stackLoops.append(loops)
+                    checkpoint(progress, 1, 1)
+    except SectionCancelled as err:
+        err.stackLoops = stackLoops + [None] * (count - len(stackLoops))
+        raise
+
+    return stackLoops
+
+
+# Returns a list with the indices of the triangles that cross each plane of a stack
+# of planes at a height of spacing * i, given the distance of each node from the
+# base plane.  A triangle crosses a plane when it has corners on both sides of it,
+# the same test used when slicing.
+def getStackCrossingTriangles(nodeIndices, distances, spacing, count, intervalIndex = None, stats = None, progress = None):
+    stackTriangles = []
+    for i in range(0, count):
+        stackTriangles.append([])
+
+    if intervalIndex:
+        for planeIndex, triangles in intervalIndex.sweep([spacing * i for i in range(0, count)]):
+            stackTriangles[planeIndex] = triangles
+            if stats is not None:
+                stats.trianglesTested += len(triangles)
+                stats.trianglesCrossing += len(triangles)
+            checkpoint(progress, planeIndex + 1, count)
+    elif numpy:
+        indices = numpy.asarray(nodeIndices, dtype = numpy.int64).reshape(-1, 3)
+        pairTriangles = [numpy.zeros(0, dtype = numpy.int64)]
+        pairPlanes = [numpy.zeros(0, dtype = numpy.int64)]
+        for chunkStart in range(0, len(indices), _vectorizedChunkSize):
+            chunkDistances = distances[indices[chunkStart:chunkStart + _vectorizedChunkSize]]
+            chunkTriangles, chunkPlanes, chunkHeights = _getStackCrossingPairs(chunkDistances.min(axis = 1), chunkDistances.max(axis = 1),
+                                                                               spacing, count, stats)
+            pairTriangles.append(chunkTriangles + chunkStart)
+            pairPlanes.append(chunkPlanes)
+            checkpoint(progress, chunkStart + len(chunkDistances), len(indices))
+
+        # Group the triangles by plane, keeping them in order within each plane.
+        pairPlanes = numpy.concatenate(pairPlanes)
+        order = numpy.argsort(pairPlanes, kind = 'stable')
+        planeEnds = numpy.cumsum(numpy.bincount(pairPlanes, minlength = count))
+        stackTriangles = numpy.split(numpy.concatenate(pairTriangles)[order], planeEnds[:-1])
+    else:
+        testedCount = 0
+        crossingCount = 0
+        triangleCount = int(len(nodeIndices)/3)
+        for i in range(0, triangleCount):
+            if progress is not None and i % _checkpointInterval == 0:
+                progress.checkpoint(i, triangleCount)
+
+            distance1 = distances[nodeIndices[i*3]]
+            distance2 = distances[nodeIndices[i*3+1]]
+            distance3 = distances[nodeIndices[i*3+2]]
+            minZ = min(distance1, distance2, distance3)
+            maxZ = max(distance1, distance2, distance3)
+
+            firstPlane, lastPlane = _getStackPlaneRange(minZ, maxZ, spacing, count)
+            for planeIndex in range(firstPlane, lastPlane + 1):
+                testedCount += 1
+                height = spacing * planeIndex
+                if maxZ >= height and minZ < height:
+                    crossingCount += 1
+                    stackTriangles[planeIndex].append(i)
+
+        if stats is not None:
+            stats.trianglesTested += testedCount
+            stats.trianglesCrossing += crossingCount
+
+    return stackTriangles
+
+
+# Returns a list of the loops where the plane at the height above the x-y plane of
+# the matrix crosses the triangles, which must be all of the triangles that cross
+# it.  Each loop is traced from a triangle through the edge where the plane leaves
+# it to the triangle on the other side of that edge, until it gets back to the
+# triangle it started from or to an open edge.  An open loop is then also traced
+# the other way from its first triangle.  A triangle is left where its corners go
+# from below the plane to above it, so on a closed mesh whose triangles are wound
+# counterclockwise seen from outside, the outside of each section goes counterclockwise
+# and its holes go clockwise, seen from above the plane.  Points that are
+# within the point tolerance of the previous point aren't added to a loop.  The
+# bodyId of each loop is set from the list of the mesh of each triangle, if it's given.
+# The open loops are then connected where their ends meet by _joinOpenLoops, since
+# an open edge can also be where nodes that weren't welded meet, or where more than
+# two triangles share an edge.
+def traceSectionLoops(nodeCoords, nodeIndices, adjacency, matrix, distances, height, triangles, progress = None,
+                      triangleBodies = None):
+    triangles, triangleNodes, cornerX, cornerY, cornerZ, neighbors = _getTraceData(nodeCoords, nodeIndices, adjacency, matrix,
+                                                                                   distances, height, triangles)
+    positions = {}
+    for i in range(0, len(triangles)):
+        positions[triangles[i]] = i
+
+    # Returns the position of the triangle on the other side of an edge and the edge
+    # of that triangle, or None if there's no crossing triangle there.
+    def getNeighbor(position, edge):
+        neighbor = positions.get(neighbors[position][edge], -1)
+        if neighbor < 0:
+            return None
+
+        nodes = triangleNodes[position]
+        edgeNodes = (nodes[edge], nodes[(edge + 1) % 3])
+        neighborNodes = triangleNodes[neighbor]
+        for neighborEdge in range(0, 3):
+            if (neighbors[neighbor][neighborEdge] == triangles[position] and
+                    (neighborNodes[neighborEdge], neighborNodes[(neighborEdge + 1) % 3]) in (edgeNodes, edgeNodes[::-1])):
+                return neighbor, neighborEdge
+        return None
+
+    # Returns the point where the plane crosses an edge.  It's computed from the
+    # corner with the lower node index so it's the same for both of the triangles.
+    def getEdgePoint(position, edge):
+        nodes = triangleNodes[position]
+        start = edge
+        end = (edge + 1) % 3
+        if nodes[start] > nodes[end]:
+            start, end = end, start
+
+        startZ = cornerZ[position][start]
+        endZ = cornerZ[position][end]
+        factor = abs(startZ) / (abs(startZ) + abs(endZ))
+        startX = cornerX[position][start]
+        startY = cornerY[position][start]
+        return (startX + (cornerX[position][end] - startX) * factor,
+                startY + (cornerY[position][end] - startY) * factor,
+                startZ + (endZ - startZ) * factor + height)
+
+    sectionLoops = []
+    isVisited = bytearray(len(triangles))
+    visitedCount = 0
+
+    for first in range(0, len(triangles)):
+        if isVisited[first]:
+            continue
+
+        isVisited[first] = True
+        visitedCount += 1
+        entryEdge, exitEdge = _getCrossingEdges(cornerZ[first])
+
+        currentLoop = SectionLoop()
+        if triangleBodies is not None:
+            currentLoop.bodyId = int(triangleBodies[triangles[first]])
+        startPoint = getEdgePoint(first, entryEdge)
+        currentLoop.addPoint(MyPoint(*startPoint), True)
+        endPoint = startPoint
+
+        # Trace the loop forward until it's closed or reaches an open edge.
+        position = first
+        edge = exitEdge
+        while True:
+            if progress is not None and visitedCount % _checkpointInterval == 0:
+                progress.checkpoint(visitedCount, len(triangles))
+
+            neighbor = getNeighbor(position, edge)
+            if neighbor == (first, entryEdge):
+                currentLoop.isClosed = True
+                break
+
+            point = getEdgePoint(position, edge)
+            if not _isSamePoint(*point, *endPoint):
+                currentLoop.addPoint(MyPoint(*point), True)
+                endPoint = point
+
+            if not neighbor or isVisited[neighbor[0]]:
+                break
+            position, edge = _passThrough(neighbor, cornerZ)
+            isVisited[position] = True
+            visitedCount += 1
+
+        # Trace an open loop backward from its first triangle.
+        if not currentLoop.isClosed:
+            position = first
+            edge = entryEdge
+            while True:
+                neighbor = getNeighbor(position, edge)
+                if not neighbor or isVisited[neighbor[0]]:
+                    break
+                position, edge = _passThrough(neighbor, cornerZ)
+                isVisited[position] = True
+                visitedCount += 1
+
+                point = getEdgePoint(position, edge)
+                if not _isSamePoint(*point, *startPoint):
+                    currentLoop.addPoint(MyPoint(*point), False)
+                    startPoint = point
+
+        sectionLoops.append(currentLoop)
+
+    return _joinOpenLoops(sectionLoops)
+
+
+# Returns the loops with the open loops of each body replaced by the loops found by
+# matching the end points of their lines, like createSectionLoopsFromSegments does for
+# the lines of a section.  The closed loops are kept as they are, and the open loops
+# with a single point, from triangles that only touch the plane, are left out.
+def _joinOpenLoops(loops):
+    bodyLoops = {}
+    joinedLoops = []
+    for loop in loops:
+        if loop.isClosed:
+            joinedLoops.append(loop)
+        elif loop.pointCount() > 1:
+            bodyLoops.setdefault(loop.bodyId, []).append(loop)
+
+    for bodyId, openLoops in bodyLoops.items():
+        segments = array.array('d')
+        for loop in openLoops:
+            coords = loop.coordinates()
+            for i in range(0, loop.pointCount() - 1):
+                segments.extend(coords[i*3:i*3+6])
+        for loop in createSectionLoopsFromSegments(segments, False, False):
+            loop.bodyId = bodyId
+            joinedLoops.append(loop)
+    return joinedLoops
+
+
+# Returns the triangle indices, and lists of the nodes, the x, y, and z of the
+# corners, and the neighbors of each triangle crossing the plane at the height, with
+# the corners transformed by the matrix and the height subtracted from the z.  Only
+# the triangles that cross the plane are transformed.
+def _getTraceData(nodeCoords, nodeIndices, adjacency, matrix, distances, height, triangles):
+    xRow = _getMatrixRow(matrix, 1)
+    yRow = _getMatrixRow(matrix, 2)
+
+    if numpy:
+        triangles = numpy.asarray(triangles, dtype = numpy.int64)
+        triangleNodes = numpy.asarray(nodeIndices, dtype = numpy.int64).reshape(-1, 3)[triangles]
+        corners = numpy.asarray(nodeCoords, dtype = numpy.float64).reshape(-1, 3)[triangleNodes]
+        cornerX = corners[:, :, 0] * xRow[0] + corners[:, :, 1] * xRow[1] + corners[:, :, 2] * xRow[2] + xRow[3]
+        cornerY = corners[:, :, 0] * yRow[0] + corners[:, :, 1] * yRow[1] + corners[:, :, 2] * yRow[2] + yRow[3]
+        cornerZ = distances[triangleNodes] - height
+        neighbors = numpy.asarray(adjacency, dtype = numpy.int64).reshape(-1, 3)[triangles]
+        return (triangles.tolist(), triangleNodes.tolist(), cornerX.tolist(), cornerY.tolist(), cornerZ.tolist(),
+                neighbors.tolist())
+    else:
+        triangleNodes = []
+        cornerX = []
+        cornerY = []
+        cornerZ = []
+        neighbors = []
+        for i in triangles:
+            nodes = [nodeIndices[i*3], nodeIndices[i*3+1], nodeIndices[i*3+2]]
+            points = [_getPlanePoint(node, nodeCoords, distances[node] - height, xRow, yRow) for node in nodes]
+            triangleNodes.append(nodes)
+            cornerX.append([point[0] for point in points])
+            cornerY.append([point[1] for point in points])
+            cornerZ.append([point[2] for point in points])
+            neighbors.append([adjacency[i*3], adjacency[i*3+1], adjacency[i*3+2]])
+        return list(triangles), triangleNodes, cornerX, cornerY, cornerZ, neighbors
+
+
+# Returns the two edges of a triangle that cross the plane, given the z of its
+# corners, as a tuple with the edge that goes from above the plane to below it and
+# then the edge that goes from below it to above it.  Edge i goes from corner i to
+# the next corner.
+def _getCrossingEdges(cornerZ):
+    isAbove = [z >= 0 for z in cornerZ]
+    for edge in range(0, 3):
+        if isAbove[edge] and not isAbove[(edge + 1) % 3]:
+            entryEdge = edge
+        elif not isAbove[edge] and isAbove[(edge + 1) % 3]:
+            exitEdge = edge
+    return entryEdge, exitEdge
+
+
+# Returns the position of the triangle a loop enters through the edge of the
+# neighbor, as returned by getNeighbor, and the other crossing edge it leaves it by.
+def _passThrough(neighbor, cornerZ):
+    position, enteredEdge = neighbor
+    entryEdge, exitEdge = _getCrossingEdges(cornerZ[position])
+    if enteredEdge == exitEdge:
+        return position, entryEdge
+    else:
+        return position, exitEdge
@@ -0,0 +1,236 @@
+# Tests that the different ways of computing the sections of the generated benchmark
+# meshes give the same loops: the pure-Python reference kernels, the numpy kernels,
+# the streamed chunks of triangles, the traced loops, and the pool of processes.  The
+# command line arguments and the mesh readers are checked too.
+#
+#   python -m pytest tests
+#
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import os, sys
+import json
+import struct
+
+import pytest
+
+# The benchmark meshes are generated with numpy.
+numpy = pytest.importorskip('numpy')
+
+# Make the meshslicer package and the benchmark meshes importable when the tests are
+# run from any folder.
+_rootPath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _rootPath)
+sys.path.insert(0, os.path.join(_rootPath, 'benchmarks'))
+
+import meshes
+from meshslicer import intervals, slicing, tracing
+from meshslicer.__main__ import main
+from meshslicer.geometry import getWorldToPlaneMatrix
+from meshslicer.meshio import readObj, readPly, readStl
+
+
+# The number of triangles of the generated meshes, and the spacing and number of the
+# planes of the stack they're sectioned with.
+_triangleCount = 4000
+_spacing = 0.7
+_count = 3
+
+
+# Returns a sorted list for each plane of a stack with a tuple for each loop of
+# whether it's closed, its number of points, and its absolute area and length, so
+# loops that only differ by where they start and their direction compare equal.
+def getStackSignature(stackLoops):
+    signature = []
+    for loops in stackLoops:
+        signature.append(sorted((loop.isClosed, loop.pointCount(), round(abs(loop.area()), 6), round(loop.length(), 6))
+                                for loop in loops or []))
+    return signature
+
+
+# Returns the generated mesh and the matrix from world coordinates to its plane.
+def getMesh(name):
+    mesh = meshes.generators[name](_triangleCount)
+    return mesh, getWorldToPlaneMatrix(mesh.origin, mesh.normal)
+
+
+# Returns the loops of each plane of the stack computed with the numpy kernels.
+def calculateVectorizedSections(mesh, matrix):
+    return slicing.calculateSections(mesh.nodeCoords, mesh.nodeIndices, matrix, _spacing, _count, True, False, False)
+
+
+@pytest.mark.parametrize('name', sorted(meshes.generators))
+def test_reference_loops_match_vectorized(name):
+    mesh, matrix = getMesh(name)
+    nodeCoords = mesh.nodeCoords.tolist()
+    nodeIndices = mesh.nodeIndices.tolist()
+    referenceLoops = []
+    for segments in slicing.calculatePlaneSegments(nodeCoords, nodeIndices, matrix, _spacing, _count):
+        if len(segments) == 0:
+            referenceLoops.append(None)
+        else:
+            referenceLoops.append(slicing.createSectionLoops(slicing.getSegmentLines(segments), False, False))
+
+    assert getStackSignature(referenceLoops) == getStackSignature(calculateVectorizedSections(mesh, matrix))
+
+
+@pytest.mark.parametrize('name', sorted(meshes.generators))
+def test_pure_python_matches_vectorized(name, monkeypatch):
+    mesh, matrix = getMesh(name)
+    vectorizedLoops = calculateVectorizedSections(mesh, matrix)
+
+    for module in (slicing, intervals):
+        monkeypatch.setattr(module, 'numpy', None)
+    pureLoops = slicing.calculateSections(mesh.nodeCoords.tolist(), mesh.nodeIndices.tolist(), matrix, _spacing, _count,
+                                          True, False, False)
+    assert getStackSignature(pureLoops) == getStackSignature(vectorizedLoops)
+
+
+@pytest.mark.parametrize('name', sorted(meshes.generators))
+def test_streamed_matches_vectorized(name):
+    mesh, matrix = getMesh(name)
+    corners = mesh.nodeCoords.reshape(-1, 3)[mesh.nodeIndices.reshape(-1, 3)]
+    chunks = [corners[start:start + 1000] for start in range(0, len(corners), 1000)]
+    streamedLoops = slicing.calculateStreamedSections(chunks, matrix, _spacing, _count, True, False, False)
+    assert getStackSignature(streamedLoops) == getStackSignature(calculateVectorizedSections(mesh, matrix))
+
+
+@pytest.mark.parametrize('name', sorted(meshes.generators))
+def test_traced_matches_vectorized(name):
+    mesh, matrix = getMesh(name)
+    adjacency = slicing.buildTriangleAdjacency(mesh.nodeIndices)
+    tracedLoops = tracing.calculateTracedSections(mesh.nodeCoords, mesh.nodeIndices, adjacency, matrix, _spacing, _count,
+                                                  False, False)
+    assert getStackSignature(tracedLoops) == getStackSignature(calculateVectorizedSections(mesh, matrix))
+
+
+def test_pool_matches_in_process():
+    from meshslicer.parallel import SectionJobPool
+
+    mesh, matrix = getMesh('torus')
+    adjacency = slicing.buildTriangleAdjacency(mesh.nodeIndices)
+    with SectionJobPool(2) as pool:
+        tracedMesh = pool.publishMesh('traced', mesh.nodeCoords, mesh.nodeIndices, adjacency)
+        unconnectedMesh = pool.publishMesh('matched', mesh.nodeCoords, mesh.nodeIndices)
+        tracedFuture = pool.submit(tracedMesh, matrix, _spacing, _count, True, False, False)
+        matchedFuture = pool.submit(unconnectedMesh, matrix, _spacing, _count, True, False, False)
+        tracedLoops, tracedStats = tracedFuture.result()
+        matchedLoops, matchedStats = matchedFuture.result()
+
+    expectedLoops = tracing.calculateTracedSections(mesh.nodeCoords, mesh.nodeIndices, adjacency, matrix, _spacing, _count,
+                                                    False, False)
+    assert getStackSignature(tracedLoops) == getStackSignature(expectedLoops)
+    assert getStackSignature(matchedLoops) == getStackSignature(calculateVectorizedSections(mesh, matrix))
+
+
+@pytest.mark.parametrize('arguments', [
+    [],
+    ['--stack', '0', '0', '0', '0', '0', '1', '1', '0'],
+    ['--stack', '0', '0', '0', '0', '0', '1', '1', '2.5'],
+    ['--stack', '0', '0', '0', '0', '0', '1', '0', '2'],
+    ['--plane', '0', '0', '0', '0', '0', '1', '--simplify', '-1'],
+    ['--plane', '0', '0', '0', '0', '0', '1', '--stream', '--processes', '2'],
+    ['--plane', '0', '0', '0', '0', '0', '1', '--trace', '--stream'],
+    ['--plane', '0', '0', '0', '0', '0', '1', '--trace', '--unconnected'],
+    ['--plane', '0', '0', '0', '0', '0', '1', '--export', 'svg', '--processes', '2'],
+    ['--plane', '0', '0', '0', '0', '0', '1', '--export', 'svg', '--stats'],
+    ['--plane', '0', '0', '0', '0', '0', '1', '--nest', '--unconnected'],
+])
+def test_cli_rejects_invalid_arguments(arguments, tmp_path, capsys):
+    mesh = meshes.uvSphere(_triangleCount)
+    meshFile = writeObj(tmp_path / 'mesh.obj', mesh.nodeCoords, mesh.nodeIndices)
+    with pytest.raises(SystemExit) as error:
+        main([meshFile, '-o', str(tmp_path / 'out.json')] + arguments)
+    assert error.value.code == 2
+
+
+def test_cli_writes_the_sections(tmp_path):
+    mesh = meshes.uvSphere(_triangleCount)
+    meshFile = writeObj(tmp_path / 'mesh.obj', mesh.nodeCoords, mesh.nodeIndices)
+    outputFile = str(tmp_path / 'out.json')
+    stack = [str(value) for value in mesh.origin + mesh.normal + (_spacing, _count)]
+    assert main([meshFile, '-o', outputFile, '--trace', '--stack'] + stack) == 0
+    with open(outputFile) as f:
+        assert json.load(f)
+
+
+@pytest.mark.parametrize('name', sorted(meshes.generators))
+def test_mesh_files_round_trip(name, tmp_path):
+    mesh = meshes.generators[name](_triangleCount)
+    corners = mesh.nodeCoords.reshape(-1, 3)[mesh.nodeIndices.reshape(-1, 3)]
+
+    nodeCoords, nodeIndices = readObj(writeObj(tmp_path / 'mesh.obj', mesh.nodeCoords, mesh.nodeIndices))
+    assert numpy.array_equal(nodeCoords, mesh.nodeCoords)
+    assert numpy.array_equal(nodeIndices, mesh.nodeIndices)
+
+    for isBinary in (False, True):
+        nodeCoords, nodeIndices = readPly(writePly(tmp_path / 'mesh.ply', mesh.nodeCoords, mesh.nodeIndices, isBinary))
+        assert numpy.array_equal(nodeCoords, mesh.nodeCoords)
+        assert numpy.array_equal(nodeIndices, mesh.nodeIndices)
+
+    # The corners of each triangle are stored in an STL file, as floats in a binary one.
+    nodeCoords, nodeIndices = readStl(writeStl(tmp_path / 'mesh.stl', corners, False))
+    assert numpy.array_equal(nodeCoords.reshape(-1, 3)[nodeIndices.reshape(-1, 3)], corners)
+    nodeCoords, nodeIndices = readStl(writeStl(tmp_path / 'mesh.stl', corners, True))
+    assert numpy.array_equal(nodeCoords.reshape(-1, 3)[nodeIndices.reshape(-1, 3)], corners.astype(numpy.float32))
+
+
+# Writes the mesh to an OBJ file and returns its path.
+def writeObj(path, nodeCoords, nodeIndices):
+    with open(path, 'w') as f:
+        for x, y, z in nodeCoords.reshape(-1, 3).tolist():
+            f.write('v {!r} {!r} {!r}\n'.format(x, y, z))
+        for a, b, c in (nodeIndices.reshape(-1, 3) + 1).tolist():
+            f.write('f {} {} {}\n'.format(a, b, c))
+    return str(path)
+
+
+# Writes the mesh to an ASCII or binary little endian PLY file and returns its path.
+def writePly(path, nodeCoords, nodeIndices, isBinary):
+    points = nodeCoords.reshape(-1, 3).tolist()
+    triangles = nodeIndices.reshape(-1, 3).tolist()
+    header = ['ply', 'format ' + ('binary_little_endian' if isBinary else 'ascii') + ' 1.0',
+              'element vertex ' + str(len(points)), 'property double x', 'property double y', 'property double z',
+              'element face ' + str(len(triangles)), 'property list uchar int vertex_indices', 'end_header']
+    with open(path, 'wb') as f:
+        f.write(('\n'.join(header) + '\n').encode('ascii'))
+        for point in points:
+            if isBinary:
+                f.write(struct.pack('<3d', *point))
+            else:
+                f.write('{!r} {!r} {!r}\n'.format(*point).encode('ascii'))
+        for triangle in triangles:
+            if isBinary:
+                f.write(struct.pack('<B3i', 3, *triangle))
+            else:
+                f.write('3 {} {} {}\n'.format(*triangle).encode('ascii'))
+    return str(path)
+
+
+# Writes the (n, 3, 3) corners of the triangles to an ASCII or binary STL file and
+# returns its path.
+def writeStl(path, corners, isBinary):
+    with open(path, 'wb') as f:
+        if isBinary:
+            f.write(bytes(80))
+            f.write(struct.pack('<I', len(corners)))
+            for triangle in corners.tolist():
+                f.write(struct.pack('<12fH', 0, 0, 0, *triangle[0], *triangle[1], *triangle[2], 0))
+        else:
+            f.write(b'solid mesh\n')
+            for triangle in corners.tolist():
+                f.write(b'facet normal 0 0 0\nouter loop\n')
+                for point in triangle:
+                    f.write('vertex {!r} {!r} {!r}\n'.format(*point).encode('ascii'))
+                f.write(b'endloop\nendfacet\n')
+            f.write(b'endsolid mesh\n')
+    return str(path)
@@ -0,0 +1,62 @@
+# Tests of the section loops in meshslicer.geometry.
+#
+#   python -m pytest tests
+#
+# (C) Copyright 2016 by Autodesk, Inc.
+# Permission to use, copy, modify, and distribute this software in object code form
+# for any purpose and without fee is hereby granted, provided that the above copyright
+# notice appears in all copies and that both that copyright notice and the limited
+# warrantyand restricted rights notice below appear in all supporting documentation.
+
+# AUTODESK PROVIDES THIS PROGRAM "AS IS" AND WITH ALL FAULTS. AUTODESK SPECIFICALLY
+# DISCLAIMS ANY IMPLIED WARRANTY OF MERCHANTABILITY OR FITNESS FOR A PARTICULAR USE.
+# AUTODESK, INC. DOES NOT WARRANT THAT THE OPERATION OF THE PROGRAM WILL BE
+# UNINTERRUPTED OR ERROR FREE.
+
+
+import os, sys
+import math
+import time
+
+# Make the meshslicer package importable when the tests are run from any folder.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from meshslicer.geometry import MyPoint, PointType, SectionLoop
+
+
+# Returns a closed loop with the number of points evenly spaced by angle around an
+# ellipse with the radii.
+def createEllipseLoop(pointCount, radiusX = 10, radiusY = 3):
+    loop = SectionLoop()
+    for i in range(0, pointCount):
+        angle = 2 * math.pi * i / pointCount
+        loop.addPoint(MyPoint(radiusX * math.cos(angle), radiusY * math.sin(angle), 0), True)
+    loop.isClosed = True
+    return loop
+
+
+# Returns the time taken to fit the arcs of the loop and the number of arcs.
+def fitArcs(loop):
+    startTime = time.perf_counter()
+    loop.optimizeArcs()
+    seconds = time.perf_counter() - startTime
+    return seconds, sum(1 for point in loop.points if point.pointType == PointType.arcMid)
+
+
+def test_optimizeArcs_circle():
+    loop = createEllipseLoop(200, 5, 5)
+    seconds, arcCount = fitArcs(loop)
+    assert arcCount == 2
+    assert loop.pointCount() == 4
+    assert abs(loop.area() - math.pi * 25) < 0.001
+
+
+def test_optimizeArcs_is_flat_as_the_points_grow():
+    # The arcs that fit an ellipse depend on its shape and the tolerance, not on how
+    # densely it's sampled, and each point is only fitted a few times.
+    smallSeconds, smallArcs = fitArcs(createEllipseLoop(4000))
+    largeSeconds, largeArcs = fitArcs(createEllipseLoop(32000))
+    assert abs(largeArcs - smallArcs) <= max(2, smallArcs / 5)
+
+    # Linear time would be 8 times as long, and quadratic time 64 times.
+    assert largeSeconds < 24 * smallSeconds